@@ -1,5 +1,6 @@
 import os
 import re
+import atexit
 import json
 import uuid
 import time
@@ -15,22 +16,45 @@ from PyPDF2 import PdfReader
 from docx import Document
 from bs4 import BeautifulSoup
 from pptx import Presentation
-from flask import Flask, request, jsonify, render_template, g, session, redirect, url_for, flash
+from flask import Flask, request, jsonify, render_template, g, session, redirect, url_for, flash, has_request_context
+from flask import Response, stream_with_context, has_app_context
 from flask_cors import CORS
-from contextlib import closing
-from collections import defaultdict
+from contextlib import closing, nullcontext
+from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
 from flask_mail import Mail, Message
 from werkzeug.security import generate_password_hash, check_password_hash
-from config import DevelopmentConfig
+from config import config
+from chunking import split_text_into_chunks, estimate_tokens
+from extraction import map_reduce_extract
+from llm_cache import LLMCache, make_cache_key
+from llm_client import OpenAIClientManager
+from llm_gateway import LLMGateway
+from triple_stream import IncrementalTripleParser
+from progressive_graph import ProgressiveGraph
+from triple_repair import parse_triples
+from single_flight import SingleFlight
+from prompt_builder import compact_text, fit_document, describe_report, log_prompt_budget
+from compact_graph import CompactGraph
+from snippet_engine import SnippetEngine
+from entity_index import EntityIndex
+from db_pool import SQLitePool
+from migrations import run_migrations
+from blob_store import open_document, replace_blob
+from chat_fanout import ChatFanOut, collect_stream
+from semantic_cache import SemanticAnswerCache
+from job_store import JobStore, COMPLETED, ERROR, PROCESSING
+from doc_search import index_document, index_unindexed_documents, search_document, retrieve_passages, term_coverage, assemble_passages
 
 # 初始化Flask应用
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
-# 加载配置
-app.config.from_object(DevelopmentConfig)
+# 加载配置（通过环境变量 FLASK_CONFIG 选择，默认开发环境）
+active_config = config[os.environ.get('FLASK_CONFIG', 'default')]
+app.config.from_object(active_config)
 
 # 初始化配置
-DevelopmentConfig.init_app(app)
+active_config.init_app(app)
 
 # 初始化CORS
 CORS(app, resources={r"/*": {"origins": "*"}})
@@ -43,138 +67,106 @@ OPENAI_API_KEY = app.config['OPENAI_API_KEY']
 MAX_RETRIES = app.config['MAX_RETRIES']
 BACKOFF_FACTOR = app.config['BACKOFF_FACTOR']
 DATABASE = app.config['DATABASE']
+DB_POOL_SIZE = app.config['DB_POOL_SIZE']
+DB_POOL_TIMEOUT = app.config['DB_POOL_TIMEOUT']
+DB_BUSY_TIMEOUT_MS = app.config['DB_BUSY_TIMEOUT_MS']
+DB_CACHE_SIZE_KIB = app.config['DB_CACHE_SIZE_KIB']
+DB_MMAP_SIZE = app.config['DB_MMAP_SIZE']
 UPLOAD_FOLDER = app.config['UPLOAD_FOLDER']
+EXTRACTION_CHUNK_TOKENS = app.config['EXTRACTION_CHUNK_TOKENS']
+EXTRACTION_CHUNK_OVERLAP = app.config['EXTRACTION_CHUNK_OVERLAP']
+EXTRACTION_MAX_WORKERS = app.config['EXTRACTION_MAX_WORKERS']
+LLM_MODEL = app.config['LLM_MODEL']
+LLM_CONTEXT_TOKENS = app.config['LLM_CONTEXT_TOKENS']
+LLM_DOC_PROMPT_TOKENS = app.config['LLM_DOC_PROMPT_TOKENS']
+SEARCH_CHUNK_TOKENS = app.config['SEARCH_CHUNK_TOKENS']
+SEARCH_RESULT_LIMIT = app.config['SEARCH_RESULT_LIMIT']
+SEARCH_MAX_RESULTS = app.config['SEARCH_MAX_RESULTS']
+DOC_RETRIEVAL_TOP_K = app.config['DOC_RETRIEVAL_TOP_K']
+DOC_RETRIEVAL_MIN_COVERAGE = app.config['DOC_RETRIEVAL_MIN_COVERAGE']
+CHAT_DOC_TIMEOUT = app.config['CHAT_DOC_TIMEOUT']
+CHAT_WEB_TIMEOUT = app.config['CHAT_WEB_TIMEOUT']
+CHAT_RESOURCES_TIMEOUT = app.config['CHAT_RESOURCES_TIMEOUT']
+CHAT_SPECULATIVE_WEB = app.config['CHAT_SPECULATIVE_WEB']
 
 logger = logging.getLogger("KnowledgeGraphGenerator")
 
 # 存储验证码的字典，格式为 {邮箱: (验证码, 过期时间)}
 verification_codes = {}
 
-# 全局变量存储拓扑结果
-topology_results = {}
+# 文档处理任务状态（数据库 topology_jobs 表，各进程共享；读取经过进程内有界缓存）
+job_store = JobStore(
+    retention=app.config['JOB_RETENTION'],
+    stale_after=app.config['JOB_STALE_AFTER'],
+    cache_size=app.config['JOB_CACHE_SIZE'],
+    cache_ttl=app.config['JOB_CACHE_TTL'],
+    purge_interval=app.config['JOB_PURGE_INTERVAL']
+)
+
+# 三元组容错解析的累计修复统计
+json_repair_totals = Counter()
+json_repair_lock = threading.Lock()
+
+# 按数据库路径创建的连接池（路径在测试中可被替换）
+_db_pools = {}
+_db_pools_lock = threading.Lock()
+
+def get_db_pool():
+    """获取当前数据库的连接池（WAL、synchronous=NORMAL、忙等待超时，读写/只读连接各自有上限）"""
+    pool = _db_pools.get(DATABASE)
+    if pool is None:
+        with _db_pools_lock:
+            pool = _db_pools.get(DATABASE)
+            if pool is None:
+                pool = SQLitePool(
+                    DATABASE,
+                    max_connections=DB_POOL_SIZE,
+                    busy_timeout_ms=DB_BUSY_TIMEOUT_MS,
+                    cache_size_kib=DB_CACHE_SIZE_KIB,
+                    mmap_size=DB_MMAP_SIZE,
+                    acquire_timeout=DB_POOL_TIMEOUT
+                )
+                # 启动时（每个数据库第一次使用时）执行尚未执行的表结构迁移
+                with pool.connection() as db:
+                    executed = run_migrations(db)
+                    if executed:
+                        # 迁移之后为尚未建立全文索引的已有文档补建索引（索引规则属于应用代码，不在迁移中执行）
+                        with db:
+                            indexed = index_unindexed_documents(db)
+                        if indexed:
+                            logger.info(f"已为 {indexed} 个已有文档补建全文索引")
+                if executed:
+                    logger.info(f"数据库 {DATABASE} 已迁移到版本 {executed[-1]}")
+                _db_pools[DATABASE] = pool
+    return pool
 
 def get_db():
-    """获取数据库连接"""
+    """获取当前应用上下文的读写数据库连接（从连接池借出，上下文结束时归还）"""
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = g._database = get_db_pool().acquire()
+    return db
+
+def get_read_db():
+    """获取当前应用上下文的只读数据库连接，用于只读取数据的GET接口，不会被写入阻塞"""
+    db = getattr(g, '_read_database', None)
+    if db is None:
+        db = g._read_database = get_db_pool().acquire(readonly=True)
     return db
 
 def init_db():
-    """初始化数据库（包含问答会话表和用户表）"""
+    """初始化数据库：创建数据库目录，按版本执行尚未执行的表结构迁移（每个迁移只执行一次）"""
     logger.info("开始初始化数据库...")
-    with app.app_context():
-        db_path = os.path.abspath(DATABASE)
-        logger.info(f"数据库文件路径: {db_path}")
-        
-        # 确保数据库目录存在
-        db_dir = os.path.dirname(db_path)
-        if not os.path.exists(db_dir):
-            os.makedirs(db_dir)
-        
-        # 如果数据库已存在，跳过初始化
-        if os.path.exists(db_path):
-            logger.info("数据库已存在，跳过初始化")
-            return
-        
-        logger.info("数据库文件不存在，创建新数据库...")
-        with closing(get_db()) as db:
-            try:
-                # 检查并添加缺少的列
-                cursor = db.cursor()
-                cursor.execute("PRAGMA table_info(topologies)")
-                columns = [column[1] for column in cursor.fetchall()]
-                
-                if 'user_id' not in columns:
-                    cursor.execute('ALTER TABLE topologies ADD COLUMN user_id TEXT DEFAULT "anonymous"')
-                    logger.info("已添加 user_id 列到 topologies 表")
-                
-                schema = """
-                CREATE TABLE IF NOT EXISTS topologies (
-                    id TEXT PRIMARY KEY,
-                    content TEXT NOT NULL,
-                    max_nodes INTEGER DEFAULT 0,
-                    created_at TEXT,
-                    user_id TEXT DEFAULT 'anonymous'
-                );
-                
-                CREATE TABLE IF NOT EXISTS nodes (
-                    id TEXT PRIMARY KEY,
-                    topology_id TEXT,
-                    label TEXT NOT NULL,
-                    level INTEGER DEFAULT 0,
-                    value REAL DEFAULT 1,
-                    mastered INTEGER DEFAULT 0,
-                    mastery_score REAL DEFAULT 0,
-                    consecutive_correct INTEGER DEFAULT 0,
-                    content_snippet TEXT,
-                    PRIMARY KEY (topology_id, id),
-                    FOREIGN KEY (topology_id) REFERENCES topologies (id)
-                );
-                
-                CREATE TABLE IF NOT EXISTS edges (
-                    topology_id TEXT,
-                    from_node TEXT,
-                    to_node TEXT,
-                    label TEXT,
-                    PRIMARY KEY (topology_id, from_node, to_node),
-                    FOREIGN KEY (topology_id) REFERENCES topologies (id),
-                    FOREIGN KEY (from_node) REFERENCES nodes (id),
-                    FOREIGN KEY (to_node) REFERENCES nodes (id)
-                );
-                
-                CREATE TABLE IF NOT EXISTS users (
-                    id TEXT PRIMARY KEY,
-                    username TEXT NOT NULL UNIQUE,
-                    password TEXT NOT NULL,
-                    email TEXT,
-                    email_verified INTEGER DEFAULT 0,
-                    created_at TEXT
-                );
-                
-                -- 问答会话表
-                CREATE TABLE IF NOT EXISTS quiz_sessions (
-                    id TEXT PRIMARY KEY,
-                    topology_id TEXT,
-                    node_id TEXT,
-                    created_at TEXT,
-                    consecutive_correct INTEGER DEFAULT 0,
-                    mastered INTEGER DEFAULT 0,
-                    FOREIGN KEY (topology_id) REFERENCES topologies (id),
-                    FOREIGN KEY (node_id) REFERENCES nodes (id)
-                );
-                
-                CREATE TABLE IF NOT EXISTS questions (
-                    id TEXT PRIMARY KEY,
-                    topology_id TEXT,
-                    node_id TEXT,
-                    question TEXT,
-                    session_id TEXT,
-                    created_at TEXT,
-                    answered_at TEXT,
-                    answer TEXT,
-                    feedback TEXT,
-                    correctness INTEGER DEFAULT 0,
-                    FOREIGN KEY (topology_id) REFERENCES topologies (id),
-                    FOREIGN KEY (node_id) REFERENCES nodes (id),
-                    FOREIGN KEY (session_id) REFERENCES quiz_sessions (id)
-                );
-                
-                CREATE TABLE IF NOT EXISTS password_resets (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT,
-                    token TEXT,
-                    created_at TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                );
-                """
-                db.executescript(schema)
-                db.commit()
-                logger.info("数据库表创建成功")
-            except Exception as e:
-                logger.error(f"数据库初始化失败: {str(e)}", exc_info=True)
-                raise
+    db_path = os.path.abspath(DATABASE)
+    logger.info(f"数据库文件路径: {db_path}")
+    
+    # 确保数据库目录存在
+    db_dir = os.path.dirname(db_path)
+    if not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+    
+    # 创建连接池时执行迁移
+    get_db_pool()
 
 # 登录验证装饰器
 def login_required(f):
@@ -263,101 +255,61 @@ def clean_json_string(s: str) -> str:
     s = re.sub(r"```(?:json)?", "", s)
     return s.strip()
 
-# 增强JSON格式，处理各种复杂格式问题
-def enhance_json_format(json_str: str) -> str:
-    """增强JSON格式，处理各种复杂格式问题"""
-    import json
-    import re
-    
-    logger.info(f"原始JSON内容: {json_str[:200]}...")
-    
-    # 1. 移除可能的前导/尾随非JSON字符
-    json_str = re.sub(r'^.*?(\[.*\]).*$', r'\1', json_str, flags=re.DOTALL)
-    
-    # 2. 处理行首缩进和换行
-    json_str = re.sub(r'\n\s*', ' ', json_str)
+def extract_knowledge_from_text(text: str, max_nodes: int = 0, max_retries: int = MAX_RETRIES,
+                                progress_callback=None, user_id=None, on_triple=None) -> list:
+    """
+    调用DeepSeek API提取适合树形结构的知识点层级关系（长文档分块并发提取后合并去重）。
+    传入 on_triple 时以流式方式调用，每解析出一个三元组立即回调，用于渐进式构建图谱。
+    """
+    # 整篇文档压缩一次（页码、页眉页脚需要按页判断），分块边界和token数按压缩后的文本计算
+    original_tokens = estimate_tokens(text)
+    text = compact_text(text)
+    chunks = split_text_into_chunks(text, EXTRACTION_CHUNK_TOKENS, EXTRACTION_CHUNK_OVERLAP)
+    logger.info(f"文档压缩: {original_tokens} -> {estimate_tokens(text)} tokens，"
+                f"切分为{len(chunks)}个文本块，并发数: {EXTRACTION_MAX_WORKERS}")
     
-    # 3. 处理可能的单引号问题
-    json_str = re.sub(r"'", '"', json_str)
+    def extract_chunk(chunk):
+        part_hint = f"（文档第{chunk.index + 1}/{len(chunks)}部分）" if len(chunks) > 1 else ""
+        return extract_knowledge_from_chunk(chunk.text, max_nodes, max_retries, part_hint, user_id, on_triple)
     
-    # 4. 处理常见的格式错误（尝试修复）
-    try:
-        # 尝试直接解析
-        return json.loads(json_str)
-    except json.JSONDecodeError as e:
-        logger.error(f"初始解析失败: {e}")
-        
-        # 错误定位
-        error_pos = e.pos
-        logger.error(f"错误位置: {error_pos}, 附近内容: {json_str[error_pos-20:error_pos+20]}")
-        
-        # 5. 智能修复常见错误
-        # 5.1 处理缺少逗号的情况
-        if e.msg == "Expecting ',' delimiter":
-            logger.info("尝试修复缺少逗号的问题...")
-            json_list = list(json_str)
-            
-            # 在错误位置前查找可能缺少逗号的位置
-            search_start = max(0, error_pos - 100)
-            bracket_count = 0
-            for i in range(error_pos-1, search_start, -1):
-                if json_list[i] == ']':
-                    bracket_count += 1
-                elif json_list[i] == '[':
-                    bracket_count -= 1
-                
-                # 找到合适的位置插入逗号
-                if bracket_count == 0 and json_list[i] == ']':
-                    json_list.insert(i+1, ',')
-                    logger.info(f"在位置 {i+1} 插入逗号")
-                    break
-            
-            # 尝试再次解析
-            try:
-                return json.loads(''.join(json_list))
-            except json.JSONDecodeError as e2:
-                logger.error(f"修复后仍失败: {e2}")
-        
-        # 5.2 处理未闭合的引号
-        if e.msg.startswith('Expecting property name enclosed in double quotes'):
-            logger.info("尝试修复未闭合的引号...")
-            # 查找最近的未闭合引号并添加
-            unclosed_quote_pos = json_str.rfind('"', 0, error_pos)
-            if unclosed_quote_pos != -1:
-                json_list = list(json_str)
-                json_list.insert(error_pos, '"')
-                logger.info(f"在位置 {error_pos} 添加引号")
-                try:
-                    return json.loads(''.join(json_list))
-                except json.JSONDecodeError as e3:
-                    logger.error(f"修复后仍失败: {e3}")
-        
-        # 6. 使用更宽松的解析器（作为最后的手段）
-        try:
-            import ast
-            logger.info("尝试使用ast.literal_eval进行宽松解析...")
-            parsed = ast.literal_eval(json_str)
-            # 转换为标准JSON
-            return json.loads(json.dumps(parsed))
-        except Exception as e4:
-            logger.error(f"宽松解析失败: {e4}")
-            logger.error(f"无法修复的JSON内容: {json_str}")
-            raise RuntimeError("无法解析API返回的JSON格式") from e4
-
-def sanitize_text(text: str) -> str:
-    """清理文本中的特殊字符，防止破坏JSON解析"""
-    # 移除可能干扰JSON解析的字符
-    text = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', text)  # 移除控制字符
-    # 转义特殊字符
-    text = text.replace('\\', '\\\\')
-    text = text.replace('"', '\\"')
-    return text
-
-def extract_knowledge_from_text(text: str, max_nodes: int = 0, max_retries: int = MAX_RETRIES) -> list:
-    """调用DeepSeek API提取适合树形结构的知识点层级关系"""
+    return map_reduce_extract(
+        chunks,
+        extract_chunk,
+        max_workers=EXTRACTION_MAX_WORKERS,
+        max_nodes=max_nodes,
+        progress_callback=progress_callback
+    )
+
+def parse_knowledge_edges(raw: str) -> list:
+    """
+    容错解析模型返回的知识关系三元组数组：格式错误的元素被跳过，
+    只有一个三元组都无法恢复时才抛出异常（由网关重试）。
+    """
+    knowledge_edges, stats = parse_triples(raw)
+    record_repair_stats(stats)
+    if stats.repaired:
+        logger.info(f"模型输出已容错修复: {stats.as_dict()}")
+    if not knowledge_edges:
+        raise ValueError(f"API返回内容中没有可恢复的三元组，开头内容: {raw[:200]}")
+    return knowledge_edges
+
+def record_repair_stats(stats):
+    """累计三元组解析的修复统计，供 /api/llm/stats 查看"""
+    with json_repair_lock:
+        json_repair_totals["calls"] += 1
+        json_repair_totals["repaired_calls"] += int(stats.repaired)
+        json_repair_totals["elements"] += stats.elements
+        json_repair_totals["recovered"] += stats.recovered
+        json_repair_totals["skipped"] += stats.skipped
+        json_repair_totals.update(stats.repairs)
+
+def extract_knowledge_from_chunk(text: str, max_nodes: int = 0, max_retries: int = MAX_RETRIES,
+                                 part_hint: str = "", user_id=None, on_triple=None) -> list:
+    """调用DeepSeek API从单个文本块中提取知识点层级关系"""
     
-    # 清理文本
-    sanitized_text = sanitize_text(text)
+    # 文本块来自已压缩的文档，只需限制在单块token预算内（不做JSON转义）
+    compacted_text, report = fit_document(text, EXTRACTION_CHUNK_TOKENS, compact=False)
+    logger.info(f"知识提取{part_hint}: {describe_report(report)}")
     
     # 根据节点数量限制调整提示
     node_limit_prompt = ""
@@ -370,53 +322,52 @@ def extract_knowledge_from_text(text: str, max_nodes: int = 0, max_retries: int
 以JSON数组形式输出，每个元素格式为 [父知识点, 关系, 子知识点]。
 关系应体现层级结构，如"包含"、"属于"、"是子类"等。确保输出格式正确，仅返回JSON数组。
 {node_limit_prompt}"""},
-        {"role": "user", "content": f"请从下面文本中提取知识点及其层级关系，输出JSON数组，每个元素格式为 [父知识点, 关系, 子知识点]：\n{sanitized_text}"}
+        {"role": "user", "content": f"请从下面文本{part_hint}中提取知识点及其层级关系，输出JSON数组，每个元素格式为 [父知识点, 关系, 子知识点]：\n{compacted_text}"}
     ]
     
-    backoff = 2
-    for attempt in range(1, max_retries + 1):
+    if on_triple is not None:
         try:
-            logger.info(f"第{attempt}次尝试调用DeepSeek API...")
-            
-            # 使用OpenAI SDK调用API
-            client = get_openai_client()
-            response = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=messages,
-                max_tokens=1500
-            )
-            
-            raw = response.choices[0].message.content
-            cleaned = clean_json_string(raw or "")
-            logger.info(f"API返回知识关系: {cleaned[:200]}...")
-            
-            # 保存原始响应用于调试
-            # with open(f"api_response_{time.time()}.txt", "w", encoding="utf-8") as f:
-            #     f.write(cleaned)
-            
-            # 增强JSON解析
-            knowledge_edges = enhance_json_format(cleaned)
-            
-            # 验证输出格式
-            if not isinstance(knowledge_edges, list):
-                raise ValueError(f"API返回非数组格式: {type(knowledge_edges)}")
-            for idx, item in enumerate(knowledge_edges):
-                if not (isinstance(item, list) and len(item) == 3):
-                    raise ValueError(f"API返回元素格式错误，应为三元组，位置 {idx}: {item}")
-                    
-            logger.info(f"成功解析知识关系，共{len(knowledge_edges)}条")
+            knowledge_edges = stream_knowledge_edges(messages, on_triple, user_id)
+            logger.info(f"成功解析知识关系（流式），共{len(knowledge_edges)}条")
             return knowledge_edges
-                
         except Exception as e:
-            logger.error(f"API请求错误: {str(e)}", exc_info=True)
-            if attempt < max_retries:
-                logger.info(f"准备第{attempt+1}次重试...")
-                time.sleep(backoff)
-                backoff *= BACKOFF_FACTOR
-            else:
-                raise
+            # 已回调的三元组会在最终合并结果中再次出现，重复边由去重逻辑处理
+            logger.warning(f"流式提取失败，改用普通调用重试: {str(e)}")
+    
+    try:
+        # 通过LLM网关调用API：限流、退避重试（含解析失败）均在网关中完成，不阻塞当前线程休眠；
+        # 只有解析并校验通过的响应才会写入缓存
+        knowledge_edges = chat_completion(
+            messages, 1500, "extract_knowledge",
+            parse=parse_knowledge_edges,
+            user_id=user_id,
+            max_retries=max_retries,
+            retry_parse_errors=True
+        )
+    except Exception as e:
+        logger.error(f"API请求错误: {str(e)}", exc_info=True)
+        raise
     
-    raise RuntimeError("多次重试后仍无法获取有效响应")
+    logger.info(f"成功解析知识关系，共{len(knowledge_edges)}条")
+    return knowledge_edges
+
+def stream_knowledge_edges(messages, on_triple, user_id=None) -> list:
+    """流式调用模型，边接收边增量解析三元组并回调 on_triple，结束后校验并返回完整结果"""
+    def validate(raw):
+        # 仅用于决定是否写入缓存，修复统计由下面的最终解析记录
+        if not parse_triples(raw)[0]:
+            raise ValueError("流式回复中没有可恢复的三元组")
+    
+    parser = IncrementalTripleParser()
+    parts = []
+    for delta in stream_chat_completion(messages, 1500, "extract_knowledge", user_id=user_id,
+                                        validate=validate):
+        parts.append(delta)
+        for triple in parser.feed(delta):
+            on_triple(triple)
+    if parser.skipped:
+        logger.warning(f"流式解析跳过{parser.skipped}个格式错误的三元组")
+    return parse_knowledge_edges("".join(parts))
 
 def parse_document(file_path):
     """解析文档内容，返回文本（新增PPT支持）"""
@@ -428,15 +379,15 @@ def parse_document(file_path):
             with open(file_path, 'r', encoding='utf-8') as file:
                 return file.read()
         elif file_ext == '.pdf':
-            text = ""
+            pages = []
             with open(file_path, 'rb') as file:
                 reader = PdfReader(file)
                 for page_num, page in enumerate(reader.pages):
-                    page_text = page.extract_text() or ""
-                    text += page_text
+                    pages.append(page.extract_text() or "")
                     if page_num % 10 == 0:
                         logger.info(f"已解析PDF第 {page_num} 页")
-            return text
+            # 页与页之间以换页符分隔，文本压缩据此只在页边识别页码和页眉页脚
+            return '\f'.join(pages)
         elif file_ext in ['.docx', '.doc']:
             doc = Document(file_path)
             full_text = []
@@ -468,242 +419,155 @@ def parse_document(file_path):
         logger.error(f"解析文档出错: {str(e)}", exc_info=True)
         return None
 
-def extract_content_snippet(content: str, topic: str) -> str:
-    """从原文中提取与主题相关的片段"""
-    # 查找主题在内容中的位置
-    index = content.lower().find(topic.lower())
-    if index == -1:
-        return ""
+def load_mastery_states(topology_id):
+    """用一次查询读取拓扑图所有节点的掌握状态，返回 {节点ID: 状态字典}（复用当前上下文的数据库连接）"""
+    with nullcontext() if has_app_context() else app.app_context():
+        cursor = get_db().cursor()
+        cursor.execute(
+            "SELECT id, mastered, mastery_score, consecutive_correct FROM nodes WHERE topology_id = ?",
+            (topology_id,)
+        )
+        return {row["id"]: dict(row) for row in cursor.fetchall()}
 
-    # 提取上下文片段（主题前后各200个字符）
-    start = max(0, index - 200)
-    end = min(len(content), index + len(topic) + 200)
-    snippet = content[start:end]
-    
-    # 确保片段包含主题
-    if topic.lower() not in snippet.lower():
-        return ""
-    
-    # 添加省略号表示截断
-    if start > 0:
-        snippet = "..." + snippet
-    if end < len(content):
-        snippet = snippet + "..."
-    
-    return snippet
+def load_entity_aliases(topology_id):
+    """读取拓扑图已持久化的实体别名，返回 {归并键: 节点ID}"""
+    with nullcontext() if has_app_context() else app.app_context():
+        cursor = get_db().execute("SELECT alias_key, node_id FROM entity_aliases WHERE topology_id = ?", (topology_id,))
+        return {row["alias_key"]: row["node_id"] for row in cursor.fetchall()}
 
-def build_tree_structure(knowledge_edges, topology_id, content: str, max_nodes: int = 0, user_id=None):
-    """构建树形知识图数据结构，保存原文片段并恢复掌握状态"""
-    nodes = {}
-    edges = []
-    all_node_ids = set()
-    
-    # 收集所有节点
-    for src, rel, tgt in knowledge_edges:
-        all_node_ids.add(src)
-        all_node_ids.add(tgt)
-        
-        # 确保节点存在
-        if src not in nodes:
-            # 提取原文片段
-            snippet = extract_content_snippet(content, src)
-            nodes[src] = {
-                "id": src,
-                "label": src,
-                "title": src,  # 鼠标悬停时显示的完整标题
-                "level": 0,    # 默认层级
-                "value": 1,    # 节点大小基准
-                "mastered": False,  # 知识点掌握状态
-                "mastery_score": 0,  # 掌握分数
-                "consecutive_correct": 0,  # 连续正确回答次数
-                "content_snippet": snippet  # 保存原文片段
-            }
-        if tgt not in nodes:
-            snippet = extract_content_snippet(content, tgt)
-            nodes[tgt] = {
-                "id": tgt,
-                "label": tgt,
-                "title": tgt,
-                "level": 0,
-                "value": 1,
-                "mastered": False,
-                "mastery_score": 0,
-                "consecutive_correct": 0,
-                "content_snippet": snippet
-            }
-        
-        # 添加边
-        edges.append({
-            "from": src,
-            "to": tgt,
-            "label": rel,
-            "title": rel,  # 鼠标悬停时显示的边关系
-            "arrows": "to",
-            "font": {
-                "align": "middle"
-            }
-        })
-    
-    # 计算节点层级
-    def calculate_level(node_id, current_level=0, visited=None):
-        if visited is None:
-            visited = set()
-        if node_id in visited:
-            return
-        visited.add(node_id)
-        if node_id in nodes:
-            nodes[node_id]["level"] = max(nodes[node_id]["level"], current_level)
-            # 递归设置子节点层级
-            for edge in edges:
-                if edge["from"] == node_id:
-                    calculate_level(edge["to"], current_level + 1, visited)
+def build_tree_structure(knowledge_edges, topology_id, content: str, max_nodes: int = 0, user_id=None,
+                         mastery_states=None):
+    """
+    构建树形知识图（数组存储的 CompactGraph），提取原文片段、恢复掌握状态并保存到数据库。
+    mastery_states 为调用方已读取的 {节点ID: 掌握状态}，未传入时按拓扑图批量读取一次。
+    """
+    if mastery_states is None:
+        mastery_states = load_mastery_states(topology_id)
     
-    # 找到根节点（没有父节点的节点）
-    root_candidates = all_node_ids.copy()
-    for _, _, tgt in knowledge_edges:
-        root_candidates.discard(tgt)
+    # 实体归一化：同一概念的不同写法合并为一个节点并改写边；
+    # 已持久化的别名和已有节点ID优先，重新生成时同一概念仍对应原来的节点ID
+    entity_index = EntityIndex(load_entity_aliases(topology_id))
+    entity_index.seed(mastery_states.keys())
+    raw_count = len(knowledge_edges)
+    knowledge_edges = entity_index.canonicalize(knowledge_edges)
+    if len(knowledge_edges) < raw_count:
+        logger.info(f"实体归一化: 三元组 {raw_count} -> {len(knowledge_edges)}，新增别名 {len(entity_index.added)} 个")
     
-    root = next(iter(root_candidates)) if root_candidates else (list(nodes.keys())[0] if nodes else None)
+    # 节点名称驻留并编号，边存为CSR整数数组；层级（多源BFS）、连接数和PageRank重要性均向量化计算
+    graph = CompactGraph.from_triples(knowledge_edges)
     
-    # 从根节点开始计算层级
-    if root:
-        calculate_level(root)
+    # 提取原文片段：文档只转小写一次，一次扫描匹配所有节点名称（找不到时模糊匹配）
+    graph.set_snippets(SnippetEngine(content).snippets(graph.labels))
     
-    # 计算节点重要性（连接数）
-    for node_id in nodes:
-        in_connections = sum(1 for edge in edges if edge["to"] == node_id)
-        out_connections = sum(1 for edge in edges if edge["from"] == node_id)
-        nodes[node_id]["value"] = max(1, in_connections + out_connections)
-        
-        # 从数据库获取并恢复节点的掌握状态
-        with app.app_context():
-            db = get_db()
-            cursor = db.cursor()
-            cursor.execute(
-                "SELECT mastered, mastery_score, consecutive_correct FROM nodes WHERE topology_id = ? AND id = ?",
-                (topology_id, node_id)
-            )
-            node_status = cursor.fetchone()
-            if node_status:
-                nodes[node_id]["mastered"] = bool(node_status["mastered"])
-                nodes[node_id]["mastery_score"] = node_status["mastery_score"]
-                nodes[node_id]["consecutive_correct"] = node_status["consecutive_correct"]
+    # 恢复节点的掌握状态
+    graph.apply_mastery(mastery_states)
     
     # 保存节点和边到数据库
-    save_to_database(topology_id, list(nodes.values()), edges, content, max_nodes, user_id)
-    
-    # 转换为节点列表
-    tree_nodes = list(nodes.values())
+    save_to_database(topology_id, graph, content, max_nodes, user_id, aliases=entity_index.added)
     
-    return {
-        "nodes": tree_nodes,
-        "edges": edges,
-        "root": root
-    }
-
-def save_to_database(topology_id, nodes, edges, content: str, max_nodes=0, user_id=None):
-    """将知识图谱数据保存到数据库（保存原文内容和节点数量限制，关联用户）"""
+    return graph
+
+# 拓扑图记录：新建时写入全部字段；已存在时更新原文引用和节点数量限制，保留创建时间，
+# 未传入用户ID（如重新生成）时保留原有的所属用户
+UPSERT_TOPOLOGY_SQL = """INSERT INTO topologies (id, content_hash, max_nodes, created_at, user_id)
+    VALUES (:id, :content_hash, :max_nodes, :created_at, COALESCE(:user_id, 'anonymous'))
+    ON CONFLICT (id) DO UPDATE SET
+        content_hash = excluded.content_hash,
+        max_nodes = excluded.max_nodes,
+        user_id = COALESCE(:user_id, topologies.user_id)"""
+INSERT_NODE_SQL = """INSERT INTO nodes
+    (topology_id, id, label, level, value, mastered, mastery_score, consecutive_correct, content_snippet, x, y,
+     centrality)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+INSERT_EDGE_SQL = "INSERT OR REPLACE INTO edges (topology_id, from_node, to_node, label) VALUES (?, ?, ?, ?)"
+INSERT_ALIAS_SQL = "INSERT OR IGNORE INTO entity_aliases (topology_id, alias_key, node_id) VALUES (?, ?, ?)"
+
+def save_to_database(topology_id, graph, content: str, max_nodes=0, user_id=None, aliases=None):
+    """
+    将知识图谱整体写入数据库：拓扑图记录（原文引用、节点数量限制、所属用户）、节点、边和新增的实体别名。
+    原文按内容寻址压缩存入 document_blobs，相同内容的多次上传共享一份并增加引用计数。
+    全部写入在同一个事务中完成，只提交一次：先删除该拓扑图上一版本的节点和边，
+    再用 executemany 按预编译语句批量插入，读取方不会看到新旧混合的图谱。
+    """
     with app.app_context():
         db = get_db()
-        cursor = db.cursor()
-        
-        # 获取当前用户ID，如果没有传入则使用默认值
-        if user_id is None:
-            user_id = 'anonymous'
         
         try:
-            # 检查topologies表是否有user_id列，如果没有则添加
-            cursor.execute("PRAGMA table_info(topologies)")
-            columns = [column[1] for column in cursor.fetchall()]
-            
-            if 'user_id' not in columns:
-                cursor.execute('ALTER TABLE topologies ADD COLUMN user_id TEXT DEFAULT "anonymous"')
-                logger.info("已添加 user_id 列到 topologies 表")
-                db.commit()
-            
-            # 保存拓扑图信息（包含原文内容、节点数量限制和用户ID）
-            cursor.execute(
-                "INSERT OR REPLACE INTO topologies (id, content, max_nodes, created_at, user_id) VALUES (?, ?, ?, ?, ?)",
-                (topology_id, content, max_nodes, time.strftime('%Y-%m-%d %H:%M:%S'), user_id)
-            )
-            
-            # 保存节点
-            for node in nodes:
-                cursor.execute(
-                    """INSERT OR REPLACE INTO nodes 
-                    (topology_id, id, label, level, value, mastered, mastery_score, consecutive_correct, content_snippet) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (topology_id, node["id"], node["label"], node["level"], node["value"], 
-                     int(node["mastered"]), node["mastery_score"], node["consecutive_correct"], 
-                     node.get("content_snippet", ""))
-                )
-            
-            # 保存边
-            for edge in edges:
-                cursor.execute(
-                    "INSERT OR REPLACE INTO edges (topology_id, from_node, to_node, label) VALUES (?, ?, ?, ?)",
-                    (topology_id, edge["from"], edge["to"], edge["label"])
-                )
+            with db:
+                previous = db.execute("SELECT content_hash FROM topologies WHERE id = ?", (topology_id,)).fetchone()
+                content_hash = replace_blob(db, previous["content_hash"] if previous else None, content)
+                db.execute(UPSERT_TOPOLOGY_SQL, {
+                    "id": topology_id,
+                    "content_hash": content_hash,
+                    "max_nodes": max_nodes,
+                    "created_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+                    "user_id": user_id
+                })
+                
+                # 上一版本的节点和边整体替换（掌握状态已在构建图时恢复到新节点上）
+                db.execute("DELETE FROM edges WHERE topology_id = ?", (topology_id,))
+                db.execute("DELETE FROM nodes WHERE topology_id = ?", (topology_id,))
+                
+                # 节点含服务端预计算的布局坐标；行由生成器逐行产出，不构造中间列表
+                db.executemany(INSERT_NODE_SQL, ((topology_id,) + row for row in graph.node_rows()))
+                db.executemany(INSERT_EDGE_SQL, ((topology_id,) + row for row in graph.edge_rows()))
+                
+                # 新增的实体别名（已有别名保持不变）
+                if aliases:
+                    db.executemany(INSERT_ALIAS_SQL, ((topology_id, key, node_id) for key, node_id in aliases.items()))
             
-            db.commit()
-            logger.info(f"知识图谱 {topology_id} 保存成功，用户: {user_id}")
+            logger.info(f"知识图谱 {topology_id} 保存成功，节点 {graph.node_count} 个，边 {graph.edge_count} 条，"
+                        f"用户: {user_id or '(保留原值)'}")
             
         except Exception as e:
-            db.rollback()
             logger.error(f"保存知识图谱到数据库失败: {str(e)}")
             raise
 
 
 def process_document(file_path, topology_id, max_nodes=0, user_id=None):
-    """处理文档并生成树形知识图（支持节点数量限制）"""
+    """处理文档并生成树形知识图（支持节点数量限制）；任务已由上传接口登记，进度和结果写入任务表"""
     start_time = time.time()
     logger.info(f"开始处理文档: {file_path}, 拓扑ID: {topology_id}, 最大节点数: {max_nodes}")
     
-    # 更新状态为处理中
-    topology_results[topology_id] = {
-        "status": "processing",
-        "progress": 0,
-        "message": "开始处理文档...",
-        "created_at": time.strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
     try:
         with app.app_context():
             update_progress(topology_id, 10, "解析文档内容...")
             text = parse_document(file_path)
-            text = parse_document(file_path)
 
             if not text:
-                topology_results[topology_id] = {
-                    "status": "error",
-                    "message": "无法解析文档内容"
-                }
+                finish_job(topology_id, ERROR, "无法解析文档内容")
                 logger.error(f"文档解析失败: {file_path}")
                 return
-            # ✅ 在这里添加缓存
-            uploaded_documents[topology_id] = text
+            # 全文内容随图谱由 save_to_database 在同一事务中写入 topologies（含节点数量限制和用户ID）
             
-            # 新增：将全文内容存入数据库，便于后续问答检索
+            # 文档入库时即建立全文索引，生成图谱期间即可检索原文
             db = get_db()
-            cursor = db.cursor()
-            cursor.execute(
-                "INSERT OR REPLACE INTO topologies (id, content, created_at) VALUES (?, ?, ?)",
-                (topology_id, text, time.strftime('%Y-%m-%d %H:%M:%S'))
-            )
-            db.commit()
+            with db:
+                chunk_count = index_document(db, topology_id, text, SEARCH_CHUNK_TOKENS)
+            logger.info(f"文档全文索引完成: {topology_id}，片段 {chunk_count} 个")
+            if get_answer_cache() is not None:
+                get_answer_cache().invalidate(topology_id)
             
-            update_progress(topology_id, 20, "准备提取知识层级...")
             text_length = len(text)
+            update_progress(topology_id, 20, "准备提取知识层级...", text_length=text_length)
             if text_length < 100:
-                topology_results[topology_id] = {
-                    "status": "error",
-                    "message": "文档内容过短，无法提取知识"
-                }
+                finish_job(topology_id, ERROR, "文档内容过短，无法提取知识")
                 logger.warning(f"文档内容过短: {file_path}, 长度: {text_length}")
                 return
 
             update_progress(topology_id, 60, "调用DeepSeek API提取知识层级...")
-            knowledge_edges = extract_knowledge_from_text(text, max_nodes)
+            # 渐进式图谱：三元组一边流式到达一边入图，轮询到本进程时即可看到部分结果
+            partial_graph = ProgressiveGraph()
+            job_store.attach_partial(topology_id, partial_graph)
+            knowledge_edges = extract_knowledge_from_text(
+                text, max_nodes,
+                progress_callback=lambda done, total: update_progress(
+                    topology_id, 60 + int(20 * done / total), f"已完成第{done}/{total}个文本块的知识提取...",
+                    node_count=partial_graph.node_count, edge_count=partial_graph.edge_count
+                ),
+                user_id=user_id,
+                on_triple=partial_graph.add_triple
+            )
             logger.info(f"成功提取{len(knowledge_edges)}条知识层级关系")
             
             update_progress(topology_id, 80, "构建树形知识图并提取原文片段...")
@@ -712,37 +576,32 @@ def process_document(file_path, topology_id, max_nodes=0, user_id=None):
             processing_time = time.time() - start_time
             logger.info(f"树形知识图生成完成，耗时: {processing_time:.2f} 秒")
             
-            update_progress(topology_id, 100, "处理完成")
-            time.sleep(1)  # 确保前端有足够时间更新进度
-            
-            topology_results[topology_id] = {
-                "status": "completed",
-                "data": knowledge_graph,
-                "created_at": time.strftime('%Y-%m-%d %H:%M:%S'),
-                "node_count": len(knowledge_graph["nodes"]),
-                "edge_count": len(knowledge_graph["edges"]),
-                "processing_time": round(processing_time, 2),
-                "text_length": text_length,
-                "max_nodes": max_nodes  # 保存节点数量限制
-            }
+            # 图谱已保存到数据库，任务记录结果引用和统计信息
+            finish_job(topology_id, COMPLETED, "处理完成",
+                       node_count=knowledge_graph.node_count,
+                       edge_count=knowledge_graph.edge_count,
+                       processing_time=round(processing_time, 2),
+                       text_length=text_length,
+                       max_nodes=max_nodes)  # 保存节点数量限制
             
     except Exception as e:
-        import traceback
-        error_msg = traceback.format_exc()
         logger.error(f"处理文档出错: {str(e)}", exc_info=True)
-        topology_results[topology_id] = {
-            "status": "error",
-            "message": f"处理过程中出错: {str(e)}"
-        }
+        finish_job(topology_id, ERROR, f"处理过程中出错: {str(e)}")
 
-def update_progress(topology_id, progress, message):
-    """更新处理进度"""
-    if topology_id in topology_results:
-        topology_results[topology_id].update({
-            'progress': progress,
-            'message': message
-        })
+def update_progress(topology_id, progress, message, **fields):
+    """更新处理进度（写入任务表，任务不存在时忽略）"""
+    try:
+        with nullcontext() if has_app_context() else app.app_context():
+            job_store.update(get_db(), topology_id, progress=progress, message=message, **fields)
         logger.info(f"拓扑ID: {topology_id}, 进度: {progress}%, 消息: {message}")
+    except Exception as e:
+        # 进度只用于展示，写入失败不中断处理
+        logger.warning(f"更新处理进度失败: {topology_id}, {str(e)}")
+
+def finish_job(topology_id, status, message, **fields):
+    """记录任务结束（completed 或 error）"""
+    with nullcontext() if has_app_context() else app.app_context():
+        job_store.finish(get_db(), topology_id, status, message, **fields)
 
 @app.route('/api/generate', methods=['POST'])
 @login_required
@@ -778,6 +637,9 @@ def generate_knowledge_graph():
     
     logger.info(f"文件上传成功: {file_path}, 大小: {file_size/1024/1024:.2f} MB, 最大节点数: {max_nodes}")
     
+    # 先登记任务再启动处理线程，上传返回后的第一次轮询（可能落在其他进程上）即可查到任务
+    job_store.start(get_db(), topology_id, "开始处理文档...", max_nodes, user_id)
+    
     # 启动处理线程，并在应用上下文中执行
     threading.Thread(
         target=lambda: with_app_context(process_document, file_path, topology_id, max_nodes, user_id)
@@ -797,77 +659,109 @@ def with_app_context(func, *args, **kwargs):
 
 @app.route('/api/topology/<topology_id>', methods=['GET'])
 def get_topology(topology_id):
-    if topology_id not in topology_results:
-        # 尝试从数据库获取
-        with app.app_context():
-            db = get_db()
-            cursor = db.cursor()
-            cursor.execute(
-                "SELECT id, content, max_nodes, created_at FROM topologies WHERE id = ?",
-                (topology_id,)
-            )
-            topology = cursor.fetchone()
-            
-            if not topology:
-                logger.error(f"获取拓扑图错误: ID不存在 ({topology_id})")
-                return jsonify({'status': 'error', 'message': '拓扑图不存在'}), 404
-            
-            # 从数据库获取节点和边
-            cursor.execute(
-                "SELECT id, label, level, value, mastered, mastery_score, consecutive_correct, content_snippet FROM nodes WHERE topology_id = ?",
-                (topology_id,)
-            )
-            nodes = [dict(row) for row in cursor.fetchall()]
-            
-            cursor.execute(
-                "SELECT from_node, to_node, label FROM edges WHERE topology_id = ?",
-                (topology_id,)
-            )
-            edges = [dict(row) for row in cursor.fetchall()]
-            
-            knowledge_graph = {
-                "nodes": nodes,
-                "edges": edges,
-                "root": next((node["id"] for node in nodes if node["level"] == 0), nodes[0]["id"] if nodes else None)
+    with app.app_context():
+        db = get_read_db()
+        # 任务状态在任务表中，任何进程都能查到；已完成的图谱和没有任务记录的拓扑图从数据库读取
+        job = job_store.get(db, topology_id)
+        
+        if job is not None and job['status'] == PROCESSING:
+            response = {
+                'status': 'processing',
+                'progress': job['progress'],
+                'message': job['message'] or '正在处理中',
+                'max_nodes': job['max_nodes']  # 返回节点数量限制
             }
-            
+            partial_graph = job_store.partial_graph(topology_id)
+            if partial_graph is not None and partial_graph.node_count:
+                # 已流式提取出的部分图谱（只在执行任务的进程内；层级为临时计算结果，完成后以最终结果为准）
+                response['partial_data'] = partial_graph.snapshot()
+                response['node_count'] = partial_graph.node_count
+                response['edge_count'] = partial_graph.edge_count
+            elif job['node_count']:
+                response['node_count'] = job['node_count']
+                response['edge_count'] = job['edge_count']
+            return jsonify(response)
+        
+        if job is not None and job['status'] == ERROR:
+            logger.error(f"获取拓扑图错误: {job['message'] or '未知错误'}")
             return jsonify({
-                'status': 'success',
-                'data': knowledge_graph,
-                'created_at': topology["created_at"],
-                'node_count': len(nodes),
-                'edge_count': len(edges),
-                'text_length': len(topology["content"]),
-                'max_nodes': topology["max_nodes"]  # 返回节点数量限制
-            })
-    
-    topology = topology_results[topology_id]
+                'status': 'error',
+                'message': job['message'] or '生成知识图时出错'
+            }), 500
+        
+        cursor = db.cursor()
+        # 原文长度随blob元数据保存，不读取也不解压原文
+        cursor.execute(
+            """SELECT t.id, t.max_nodes, t.created_at, COALESCE(b.length, 0) AS text_length
+               FROM topologies t LEFT JOIN document_blobs b ON b.hash = t.content_hash
+               WHERE t.id = ?""",
+            (topology_id,)
+        )
+        topology = cursor.fetchone()
+        
+        if not topology:
+            logger.error(f"获取拓扑图错误: ID不存在 ({topology_id})")
+            return jsonify({'status': 'error', 'message': '拓扑图不存在'}), 404
+        
+        # 从数据库获取节点和边（含保存时预计算的布局坐标和重要性）
+        cursor.execute(
+            """SELECT id, label, level, value, centrality, mastered, mastery_score, consecutive_correct,
+                      content_snippet, x, y
+               FROM nodes WHERE topology_id = ?""",
+            (topology_id,)
+        )
+        nodes = [dict(row) for row in cursor.fetchall()]
+        
+        # 边字段命名与 vis.js 一致（from/to）
+        cursor.execute(
+            'SELECT from_node AS "from", to_node AS "to", label FROM edges WHERE topology_id = ?',
+            (topology_id,)
+        )
+        edges = [dict(row) for row in cursor.fetchall()]
+        
+        knowledge_graph = {
+            "nodes": nodes,
+            "edges": edges,
+            "root": next((node["id"] for node in nodes if node["level"] == 0), nodes[0]["id"] if nodes else None)
+        }
+        
+        response = {
+            'status': 'success',
+            'data': knowledge_graph,
+            'created_at': topology["created_at"],
+            'node_count': len(nodes),
+            'edge_count': len(edges),
+            'text_length': topology["text_length"],
+            'max_nodes': topology["max_nodes"]  # 返回节点数量限制
+        }
+        if job is not None:
+            response['processing_time'] = job['processing_time']
+        return jsonify(response)
+
+@app.route('/api/topology/<topology_id>/search', methods=['GET'])
+def search_topology_document(topology_id):
+    """在拓扑图原文的全文索引中检索，按BM25得分返回带高亮的片段及其在原文中的偏移"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'status': 'error', 'message': '检索内容不能为空'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', SEARCH_RESULT_LIMIT)), 1), SEARCH_MAX_RESULTS)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'limit 必须是整数'}), 400
     
-    if topology['status'] == 'processing':
+    try:
+        start_time = time.perf_counter()
+        with app.app_context():
+            results = search_document(get_read_db(), topology_id, query, limit)
         return jsonify({
-            'status': 'processing',
-            'progress': topology.get('progress', 0),
-            'message': topology.get('message', '正在处理中'),
-            'max_nodes': topology.get('max_nodes', 0)  # 返回节点数量限制
+            'status': 'success',
+            'query': query,
+            'results': results,
+            'took_ms': round((time.perf_counter() - start_time) * 1000, 2)
         })
-    
-    if topology['status'] == 'error':
-        logger.error(f"获取拓扑图错误: {topology.get('message', '未知错误')}")
-        return jsonify({
-            'status': 'error',
-            'message': topology.get('message', '生成知识图时出错')
-        }), 500
-    
-    return jsonify({
-        'status': 'success',
-        'data': topology['data'],
-        'created_at': topology['created_at'],
-        'node_count': topology['node_count'],
-        'edge_count': topology['edge_count'],
-        'processing_time': topology['processing_time'],
-        'text_length': topology.get('text_length', 0),
-        'max_nodes': topology.get('max_nodes', 0)  # 返回节点数量限制
-    })
+    except Exception as e:
+        logger.error(f"检索文档出错: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': f"检索文档时出错: {str(e)}"}), 500
 
 @app.route('/api/topology/<topology_id>/set_max_nodes', methods=['POST'])
 def set_topology_max_nodes(topology_id):
@@ -906,6 +800,7 @@ def set_topology_max_nodes(topology_id):
 @app.route('/api/topology/<topology_id>/regenerate', methods=['POST'])
 def regenerate_topology(topology_id):
     """重新生成知识图谱，使用用户输入的新节点数量"""
+    start_time = time.time()
     try:
         with app.app_context():
             db = get_db()
@@ -917,78 +812,46 @@ def regenerate_topology(topology_id):
                 return jsonify({'status': 'error', 'message': 'Invalid JSON'}), 400
             max_nodes = data.get('max_nodes', 0)  # 从请求中获取新的节点数量
             
-            # 从数据库获取原文内容
-            cursor.execute(
-                "SELECT content FROM topologies WHERE id = ?",
-                (topology_id,)
-            )
-            topology = cursor.fetchone()
+            # 从数据库获取原文内容（解压按内容寻址存储的原文）
+            document = open_document(db, topology_id)
             
-            if not topology:
+            if document is None:
                 return jsonify({
                     'status': 'error',
                     'message': '拓扑图不存在'
                 }), 404
             
-            content = topology["content"]
+            content = document.text
             
             update_progress(topology_id, 30, "重新提取知识层级...")
-            knowledge_edges = extract_knowledge_from_text(content, max_nodes)  # 使用新的节点数量
+            knowledge_edges = extract_knowledge_from_text(  # 使用新的节点数量
+                content, max_nodes,
+                progress_callback=lambda done, total: update_progress(
+                    topology_id, 30 + int(40 * done / total), f"已完成第{done}/{total}个文本块的知识提取..."
+                )
+            )
             logger.info(f"重新生成成功提取{len(knowledge_edges)}条知识层级关系")
             
-            # 保存当前节点的掌握状态
-            cursor.execute(
-                "SELECT id, mastered, mastery_score, consecutive_correct FROM nodes WHERE topology_id = ?",
-                (topology_id,)
-            )
-            mastery_states = {row["id"]: dict(row) for row in cursor.fetchall()}
+            # 保存当前节点的掌握状态（一次查询），构建新图时直接恢复并随节点一起写回数据库
+            mastery_states = load_mastery_states(topology_id)
             
             update_progress(topology_id, 70, "重新构建树形知识图...")
-            knowledge_graph = build_tree_structure(knowledge_edges, topology_id, content, max_nodes)  # 使用新的节点数量
-            
-            # 恢复节点的掌握状态
-            for node in knowledge_graph["nodes"]:
-                node_id = node["id"]
-                if node_id in mastery_states:
-                    state = mastery_states[node_id]
-                    node["mastered"] = bool(state["mastered"])
-                    node["mastery_score"] = state["mastery_score"]
-                    node["consecutive_correct"] = state["consecutive_correct"]
-                    
-                    # 更新数据库中的节点状态
-                    cursor.execute(
-                        """UPDATE nodes SET 
-                        mastered = ?, mastery_score = ?, consecutive_correct = ?
-                        WHERE topology_id = ? AND id = ?""",
-                        (int(state["mastered"]), state["mastery_score"], 
-                         state["consecutive_correct"], topology_id, node_id)
-                    )
-            
-            # 更新拓扑图的节点数量设置到数据库
-            cursor.execute(
-                "UPDATE topologies SET max_nodes = ? WHERE id = ?",
-                (max_nodes, topology_id)
-            )
+            knowledge_graph = build_tree_structure(knowledge_edges, topology_id, content, max_nodes,  # 使用新的节点数量
+                                                   mastery_states=mastery_states)
             
-            # 更新处理结果
-            topology_results[topology_id] = {
-                "status": "completed",
-                "data": knowledge_graph,
-                "created_at": time.strftime('%Y-%m-%d %H:%M:%S'),
-                "node_count": len(knowledge_graph["nodes"]),
-                "edge_count": len(knowledge_graph["edges"]),
-                "processing_time": 0,
-                "text_length": len(content),
-                "max_nodes": max_nodes  # 保存新的节点数量限制
-            }
-            
-            db.commit()
+            # 更新任务记录（图谱已保存到数据库）
+            finish_job(topology_id, COMPLETED, "重新生成完成",
+                       node_count=knowledge_graph.node_count,
+                       edge_count=knowledge_graph.edge_count,
+                       processing_time=round(time.time() - start_time, 2),
+                       text_length=len(content),
+                       max_nodes=max_nodes)  # 保存新的节点数量限制
             
             return jsonify({
                 'status': 'success',
                 'message': '知识图谱重新生成成功',
-                'node_count': len(knowledge_graph["nodes"]),
-                'edge_count': len(knowledge_graph["edges"]),
+                'node_count': knowledge_graph.node_count,
+                'edge_count': knowledge_graph.edge_count,
                 'max_nodes': max_nodes  # 返回新的节点数量限制
             })
             
@@ -1074,8 +937,9 @@ def get_question(topology_id, node_id):
             session = cursor.fetchone()
             consecutive_correct = session["consecutive_correct"] if session else 0
             
-            # 生成问题（基于会话状态）
-            question = generate_question(node_label, content_snippet, consecutive_correct)
+            # 生成问题（基于会话状态）；已有会话中再次出题时绕过缓存，保证问题多样性
+            question = generate_question(node_label, content_snippet, consecutive_correct,
+                                         bypass_cache=bool(request.args.get('session_id')))
             
             # 保存问题到数据库
             question_id = str(uuid.uuid4())
@@ -1101,8 +965,8 @@ def get_question(topology_id, node_id):
             'message': f"生成问题时出错: {str(e)}"
         }), 500
 
-def generate_question(topic, context, consecutive_correct=0):
-    """根据连续正确次数生成不同难度的问题"""
+def generate_question(topic, context, consecutive_correct=0, bypass_cache=False):
+    """根据连续正确次数生成不同难度的问题（bypass_cache=True时强制生成新问题以保证多样性）"""
     
     # 根据掌握程度生成不同难度的问题
     difficulty_map = {
@@ -1122,14 +986,7 @@ def generate_question(topic, context, consecutive_correct=0):
     ]
     
     try:
-        client = get_openai_client()
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            max_tokens=150
-        )
-        
-        question = (response.choices[0].message.content or "").strip()
+        question = chat_completion(messages, 150, "generate_question", bypass_cache=bypass_cache).strip()
         return question
     except Exception as e:
         logger.error(f"生成问题出错: {str(e)}", exc_info=True)
@@ -1264,7 +1121,7 @@ def answer_question(topology_id, question_id):
             next_question_id = None
             if not new_mastered:
                 # 生成下一个问题（基于更新后的状态）
-                next_question = generate_question(node_label, content_snippet, new_consecutive)
+                next_question = generate_question(node_label, content_snippet, new_consecutive, bypass_cache=True)
                 if next_question:
                     next_question_id = str(uuid.uuid4())
                     cursor.execute(
@@ -1317,19 +1174,16 @@ def evaluate_answer(question, answer, topic, context):
     ]
     
     try:
-        client = get_openai_client()
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            max_tokens=300
-        )
-        
-        response_text = (response.choices[0].message.content or "").strip()
-        logger.info(f"评估回答响应: {response_text[:200]}...")
+        def parse_feedback(response_text):
+            logger.info(f"评估回答响应: {response_text.strip()[:200]}...")
+            feedback = json.loads(clean_json_string(response_text))
+            if not isinstance(feedback, dict):
+                raise json.JSONDecodeError("评估结果不是JSON对象", response_text, 0)
+            return feedback
         
-        # 解析响应为JSON
+        # 解析响应为JSON（解析失败的响应不会写入缓存）
         try:
-            feedback = json.loads(clean_json_string(response_text))
+            feedback = chat_completion(messages, 300, "evaluate_answer", parse=parse_feedback)
             # 确保包含所有必要字段
             if 'correct' not in feedback:
                 feedback['correct'] = False
@@ -1450,17 +1304,200 @@ def master_node(topology_id, node_id):
         }), 500
 
 ###智能助手模块
-from openai import OpenAI
+# 进程级共享的OpenAI客户端（复用HTTP连接池，避免每次调用重新握手）
+openai_client_manager = OpenAIClientManager(
+    api_key=OPENAI_API_KEY,
+    base_url=app.config['LLM_BASE_URL'],
+    max_connections=app.config['LLM_MAX_CONNECTIONS'],
+    max_keepalive_connections=app.config['LLM_MAX_KEEPALIVE_CONNECTIONS'],
+    keepalive_expiry=app.config['LLM_KEEPALIVE_EXPIRY'],
+    connect_timeout=app.config['LLM_CONNECT_TIMEOUT'],
+    read_timeout=app.config['LLM_READ_TIMEOUT'],
+    max_retries=0  # 重试统一由LLM网关负责
+)
+atexit.register(openai_client_manager.close)
+
+# LLM网关：所有调用在此排队限流并统一重试
+llm_gateway = LLMGateway(
+    max_concurrency=app.config['LLM_MAX_CONCURRENCY'],
+    per_user_concurrency=app.config['LLM_PER_USER_CONCURRENCY'],
+    requests_per_minute=app.config['LLM_REQUESTS_PER_MINUTE'],
+    tokens_per_minute=app.config['LLM_TOKENS_PER_MINUTE'],
+    max_retries=MAX_RETRIES,
+    backoff_base=app.config['LLM_BACKOFF_BASE'],
+    backoff_factor=BACKOFF_FACTOR,
+    backoff_max=app.config['LLM_BACKOFF_MAX']
+)
+atexit.register(llm_gateway.shutdown)
+
+# 合并提示词相同的并发LLM请求
+llm_single_flight = SingleFlight(timeout=app.config['LLM_SINGLE_FLIGHT_TIMEOUT'])
 
 def get_openai_client():
-    """获取OpenAI客户端实例"""
-    # 使用简化的初始化方式，避免兼容性问题
-    return OpenAI(api_key=OPENAI_API_KEY, base_url="https://api.deepseek.com")
+    """获取共享的OpenAI客户端实例"""
+    return openai_client_manager.get_client()
+
+# LLM响应持久化缓存（与knowledge_graph.db同目录的独立SQLite文件），首次使用时按当前配置创建
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """获取LLM响应缓存，配置中禁用时返回None"""
+    global _llm_cache
+    if not app.config['LLM_CACHE_ENABLED']:
+        return None
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache(
+                    app.config['LLM_CACHE_DATABASE'],
+                    ttl=app.config['LLM_CACHE_TTL'],
+                    max_entries=app.config['LLM_CACHE_MAX_ENTRIES']
+                )
+    return _llm_cache
+
+def chat_completion(messages, max_tokens, call_site, bypass_cache=False, parse=None,
+                    user_id=None, max_retries=None, retry_parse_errors=False):
+    """
+    通过LLM网关调用DeepSeek对话接口并返回回复文本；传入 parse 时返回 parse(回复文本) 的结果。
+    call_site 在 LLM_CACHE_CALL_SITES 中时启用缓存；bypass_cache=True 时跳过缓存读取，
+    但仍用新结果刷新缓存（用于问题多样性等场景）。
+    parse 抛出异常的回复不会写入缓存，已缓存的回复解析失败时会被删除；
+    retry_parse_errors=True 时解析失败也按网关的退避策略重试。
+    user_id 用于按用户限制并发，未传入时取当前登录用户。
+    提示词相同的并发调用只向上游发送一次请求，结果（或异常）分发给所有等待者；
+    bypass_cache=True 的调用要求各自得到新的回复，不参与合并。
+    """
+    llm_cache = get_llm_cache()
+    use_cache = llm_cache is not None and call_site in app.config['LLM_CACHE_CALL_SITES']
+    cache_key = make_cache_key(LLM_MODEL, messages, max_tokens=max_tokens)
+    if use_cache:
+        if not bypass_cache:
+            cached = llm_cache.get(cache_key, call_site)
+            if cached is not None:
+                try:
+                    result = parse(cached) if parse else cached
+                    logger.info(f"LLM缓存命中: {call_site}")
+                    return result
+                except Exception as e:
+                    logger.warning(f"缓存的LLM响应解析失败，已删除: {call_site}, {str(e)}")
+                    llm_cache.delete(cache_key)
+    
+    def request_completion():
+        response = get_openai_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            max_tokens=max_tokens
+        )
+        content = response.choices[0].message.content or ""
+        return content, (parse(content) if parse else content)
+    
+    if user_id is None and has_request_context():
+        user_id = session.get('username')
+    estimated_tokens = log_prompt_budget(call_site, messages, max_tokens, LLM_CONTEXT_TOKENS)
+    
+    def call_upstream():
+        content, result = llm_gateway.call(
+            request_completion,
+            user_id=user_id,
+            estimated_tokens=estimated_tokens,
+            max_retries=max_retries,
+            retry_on=(ValueError, RuntimeError) if retry_parse_errors else ()
+        )
+        if use_cache and content:
+            llm_cache.set(cache_key, LLM_MODEL, content, call_site)
+        return content, result
+    
+    if bypass_cache:
+        return call_upstream()[1]
+    
+    (content, result), shared = llm_single_flight.do((call_site, cache_key), call_upstream)
+    if shared:
+        # 合并的调用各自解析回复文本，避免多个调用方共享同一个可变结果对象
+        logger.info(f"合并相同的进行中LLM请求: {call_site}")
+        return parse(content) if parse else content
+    return result
+
+def stream_chat_completion(messages, max_tokens, call_site, user_id=None, validate=None):
+    """
+    通过LLM网关以流式方式调用DeepSeek对话接口，逐段产出回复文本。
+    缓存命中时一次性产出缓存内容；完整读完的回复会写入缓存，中途放弃的不会。
+    传入 validate 时，只有校验通过（不抛异常）的完整回复才会写入缓存。
+    """
+    llm_cache = get_llm_cache()
+    use_cache = llm_cache is not None and call_site in app.config['LLM_CACHE_CALL_SITES']
+    cache_key = None
+    if use_cache:
+        cache_key = make_cache_key(LLM_MODEL, messages, max_tokens=max_tokens)
+        cached = llm_cache.get(cache_key, call_site)
+        if cached is not None:
+            logger.info(f"LLM缓存命中: {call_site}")
+            yield cached
+            return
+    
+    def open_stream():
+        stream = get_openai_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        
+        def deltas():
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                stream.response.close()
+        return deltas()
+    
+    if user_id is None and has_request_context():
+        user_id = session.get('username')
+    estimated_tokens = log_prompt_budget(call_site, messages, max_tokens, LLM_CONTEXT_TOKENS)
+    parts = []
+    for delta in llm_gateway.stream(open_stream, user_id=user_id, estimated_tokens=estimated_tokens):
+        parts.append(delta)
+        yield delta
+    
+    if use_cache and parts:
+        full_text = "".join(parts)
+        if validate is not None:
+            try:
+                validate(full_text)
+            except Exception as e:
+                logger.warning(f"流式回复未通过校验，不写入缓存: {call_site}, {str(e)}")
+                return
+        llm_cache.set(cache_key, LLM_MODEL, full_text, call_site)
+
+@app.route('/api/llm/health', methods=['GET'])
+@login_required
+def get_llm_health():
+    """检查LLM服务连通性"""
+    health = openai_client_manager.health_check()
+    return jsonify({
+        'status': 'success' if health['healthy'] else 'error',
+        'data': health
+    }), 200 if health['healthy'] else 503
 
-# 全局变量缓存上传文档内容，方便检索
-uploaded_documents = {}  # topology_id: 原文全文字符串
+@app.route('/api/llm/stats', methods=['GET'])
+@login_required
+def get_llm_stats():
+    """获取LLM调用统计（缓存命中率等）"""
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'cache': get_llm_cache().stats() if get_llm_cache() else None,
+            'gateway': llm_gateway.stats(),
+            'single_flight': llm_single_flight.stats(),
+            'json_repair': dict(json_repair_totals),
+            'chat_branches': dict(chat_branch_stats),
+            'answer_cache': get_answer_cache().stats() if get_answer_cache() else None,
+            'jobs': job_store.stats()
+        }
+    })
 
-def recommend_resources_based_on_question(question):
+def recommend_resources_based_on_question(question, user_id=None):
     """
     使用 DeepSeek API 根据用户问题推荐相关学习资源，返回格式：
     [
@@ -1472,38 +1509,226 @@ def recommend_resources_based_on_question(question):
         {"role": "system", "content": "你是一个学习资源推荐专家，能够根据用户的问题推荐最相关的高质量中文学习资料。请根据用户的问题，推荐5个高质量的可访问的中文学习资源，每个资源包含title、url、snippet，要求以JSON数组格式输出。只返回JSON数组，不要有多余解释。"},
         {"role": "user", "content": f"问题：{question}\n请推荐5个相关学习资源。"}
     ]
+    def parse_resources(raw):
+        # 处理可能的markdown代码块
+        resources = json.loads(clean_json_string(raw))
+        if not isinstance(resources, list):
+            raise ValueError(f"学习资源推荐返回非数组格式: {type(resources)}")
+        return resources
+    
     try:
-        client = get_openai_client()
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            max_tokens=800
-        )
-        raw = response.choices[0].message.content.strip()
-        # 尝试解析JSON
-        try:
-            # 处理可能的markdown代码块
-            if raw.startswith('```json'):
-                raw = raw[7:]
-            if raw.endswith('```'):
-                raw = raw[:-3]
-            resources = json.loads(raw)
-            if isinstance(resources, list):
-                return resources
-        except Exception:
-            pass
+        return chat_completion(messages, 800, "recommend_resources", parse=parse_resources, user_id=user_id)
+    except (json.JSONDecodeError, ValueError):
         # 解析失败返回空
         return []
     except Exception as e:
         logger.error(f"学习资源推荐API错误: {str(e)}", exc_info=True)
         return []
 
+# 问答语义缓存（进程内），首次使用时按当前配置创建
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache():
+    """获取问答语义缓存，配置中禁用时返回None"""
+    global _answer_cache
+    if not app.config['CHAT_CACHE_ENABLED']:
+        return None
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache(
+                    threshold=app.config['CHAT_CACHE_SIMILARITY'],
+                    ttl=app.config['CHAT_CACHE_TTL'],
+                    max_entries=app.config['CHAT_CACHE_MAX_ENTRIES']
+                )
+    return _answer_cache
+
+def get_document_hash(topology_id):
+    """拓扑图当前原文的内容摘要（问答缓存据此判断文档是否变化），拓扑图尚未保存时返回None"""
+    with app.app_context():
+        row = get_read_db().execute("SELECT content_hash FROM topologies WHERE id = ?", (topology_id,)).fetchone()
+        return row["content_hash"] if row else None
+
+def lookup_cached_answer(topology_id, user_question):
+    """按拓扑图查找措辞相近问题的缓存回答，返回 (缓存条目或None, 文档摘要)"""
+    answer_cache = get_answer_cache()
+    if answer_cache is None or not topology_id:
+        return None, None
+    content_hash = get_document_hash(topology_id)
+    cached = answer_cache.get(topology_id, user_question, content_hash)
+    if cached is not None:
+        logger.info(f"问答缓存命中: {topology_id}，相似度 {cached['similarity']}，原问题: {cached['question']}")
+    return cached, content_hash
+
+def store_cached_answer(topology_id, user_question, answer, source, resources, content_hash):
+    answer_cache = get_answer_cache()
+    if answer_cache is not None and topology_id:
+        answer_cache.set(topology_id, user_question, answer, source, resources, content_hash)
+
+def retrieve_document_context(topology_id, user_question):
+    """
+    本地检索阶段：在拓扑图原文的全文索引中按BM25取出与问题最相关的片段，按token预算拼接。
+    最相关片段的查询词覆盖率低于 DOC_RETRIEVAL_MIN_COVERAGE 时判定文档中没有相关内容，返回空字符串，
+    调用方直接改用网络问答，不必先等一次文档问答的回复。
+    """
+    if not topology_id:
+        return ""
+    with app.app_context():
+        passages = retrieve_passages(get_read_db(), topology_id, user_question, DOC_RETRIEVAL_TOP_K)
+    coverage = term_coverage(passages, user_question)
+    logger.info(f"文档检索: 拓扑图 {topology_id}，片段 {len(passages)} 个，查询词覆盖率 {coverage:.2f}")
+    if coverage < DOC_RETRIEVAL_MIN_COVERAGE:
+        return ""
+    return assemble_passages(passages, LLM_DOC_PROMPT_TOKENS)
+
+def build_doc_search_messages(document_context, user_question):
+    """构建"在文档中查找答案"的提示词（只包含本地检索出的相关片段）"""
+    doc_search_prompt = (
+        "你是一个文档检索助手。下方是从文档中检索出的与用户问题相关的原文片段，请从中查找回答问题的内容，"
+        "并直接用文档原文文本回答。回答时用Markdown格式对原文文字进行重新排版，可以更改与文本意思无关的序数词和特殊符号，不要改变原文有效文字，"
+        "**所有数学公式必须用LaTeX语法，并用$...$（行内）或$$...$$（块级）包裹，且不要用Markdown代码块（```）或中括号[]包裹公式**，不要改变原文有效文字。\n"
+        "文档片段：" + document_context + "\n用户问题：" + user_question + "\n请用文档原文回答："
+    )
+    return [
+        {"role": "system", "content": "你是一个文档检索助手。"},
+        {"role": "user", "content": doc_search_prompt}
+    ]
+
+def build_web_answer_messages(question):
+    """构建网络智能问答的提示词"""
+    return [
+        {"role": "system", "content": (
+            "你是一个智能助理，能够基于互联网资源回答各种问题。"
+            "回答时用Markdown格式排版，不要添加不合理的换行，去除空白段落，所有数学公式必须用LaTeX语法。"
+            "**行内公式请用$...$包裹，且必须与文字同行；独占一行或需要居中显示的公式必须与文字同行用$$...$$包裹。**"
+            "禁止用markdown代码块（```）、中括号[]或其他符号包裹公式。"
+            "只返回直接的答案内容，不要多余解释。"
+        )},
+        {"role": "user", "content": question}
+    ]
+
+# 问答分支共享的线程池和分支统计（启动、取消、超时、出错次数）
+chat_executor = ThreadPoolExecutor(max_workers=app.config['CHAT_MAX_WORKERS'], thread_name_prefix="chat")
+atexit.register(chat_executor.shutdown, wait=False, cancel_futures=True)
+chat_branch_stats = Counter()
+
+WEB_ANSWER_UNAVAILABLE = "抱歉，网络问答服务不可用。"
+
+def answer_from_document(cancel_event, document_context, question, user_id=None):
+    """文档回答分支：基于检索片段的流式回答，读完后返回完整文本，取消时关闭上游流"""
+    messages = build_doc_search_messages(document_context, question)
+    return collect_stream(stream_chat_completion(messages, 512, "doc_answer", user_id=user_id), cancel_event).strip()
+
+def answer_from_web(cancel_event, question, user_id=None):
+    """网络回答分支：流式读取网络问答回复，文档回答被采用后取消"""
+    messages = build_web_answer_messages(question)
+    return collect_stream(stream_chat_completion(messages, 1024, "web_answer", user_id=user_id), cancel_event).strip()
+
+def recommend_resources_branch(cancel_event, question, user_id=None):
+    """资源推荐分支：只依赖问题本身，请求开始时即可执行"""
+    return recommend_resources_based_on_question(question, user_id=user_id)
+
+def sse_event(event, data):
+    """格式化一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_with_knowledge_stream():
+    """
+    流式问答接口（SSE）：
+    本地检索到相关片段时流式输出文档检索回答，否则直接流式输出网络回答（不再等待文档回答判断"未找到"）。
+    事件依次为 source（当前输出来源）、token（增量文本）、resources（学习资源）、done；出错时发送 error。
+    资源推荐在请求开始时即作为并发分支启动，回答输出完毕后在其超时时间内等待结果。
+    """
+    data = request.get_json(silent=True) or {}
+    topology_id = data.get('topology_id', '')
+    user_question = data.get('question', '').strip()
+    
+    if not user_question:
+        return jsonify({'status': 'error', 'message': '问题不能为空'}), 400
+    
+    cached, content_hash = lookup_cached_answer(topology_id, user_question)
+    if cached is not None:
+        def replay():
+            yield sse_event('source', {'source': cached['source'], 'cached': True})
+            yield sse_event('token', {'source': cached['source'], 'text': cached['answer']})
+            yield sse_event('resources', {'resources': cached['resources']})
+            yield sse_event('done', {'source': cached['source'], 'cached': True})
+        return Response(replay(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    user_id = session.get('username')
+    branches = ChatFanOut(chat_executor, chat_branch_stats)
+    branches.submit("resources", recommend_resources_branch, CHAT_RESOURCES_TIMEOUT, user_question, user_id)
+    document_context = retrieve_document_context(topology_id, user_question)
+    
+    def generate():
+        source = None
+        answer_parts = []
+        answered = False
+        try:
+            if document_context:
+                doc_stream = stream_chat_completion(build_doc_search_messages(document_context, user_question),
+                                                    512, "doc_answer", user_id=user_id)
+                try:
+                    for delta in doc_stream:
+                        if source is None:
+                            source = "document"
+                            yield sse_event('source', {'source': source})
+                        answer_parts.append(delta)
+                        yield sse_event('token', {'source': source, 'text': delta})
+                    answered = source is not None
+                except Exception as e:
+                    logger.error(f"DeepSeek文档检索API错误: {str(e)}", exc_info=True)
+                    # 已输出部分文档回答时不再切换来源
+                    if source is not None:
+                        raise
+                finally:
+                    doc_stream.close()
+            
+            if source is None:
+                # 文档中查不到，流式调用智能网络问答
+                source = "web"
+                yield sse_event('source', {'source': source})
+                try:
+                    for delta in stream_chat_completion(build_web_answer_messages(user_question),
+                                                        1024, "web_answer", user_id=user_id):
+                        answer_parts.append(delta)
+                        yield sse_event('token', {'source': source, 'text': delta})
+                    answered = True
+                except Exception as e:
+                    logger.error(f"生成网络回答错误: {str(e)}", exc_info=True)
+                    yield sse_event('token', {'source': source, 'text': WEB_ANSWER_UNAVAILABLE})
+            
+            # 推荐学习资源（回答结束后单独发送，分支失败或超时时发送空列表）
+            resources = branches.result("resources")
+            yield sse_event('resources', {'resources': resources.value if resources.ok else []})
+            if answered and resources.ok:
+                store_cached_answer(topology_id, user_question, "".join(answer_parts).strip(), source,
+                                    resources.value, content_hash)
+            yield sse_event('done', {'source': source})
+        except Exception as e:
+            logger.error(f"流式交互问答错误: {str(e)}", exc_info=True)
+            yield sse_event('error', {'message': f"交互问答出错: {str(e)}"})
+        finally:
+            # 客户端中途断开时放弃尚未完成的分支
+            branches.cancel_all()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/chat', methods=['POST'])
 def chat_with_knowledge():
     """
     用户交互问答接口：
-    优先基于上传文档内容回答，若文档中没有相关内容，则调用网络智能问答。
+    本地检索到相关片段时基于这些片段回答，否则（或文档回答失败时）直接调用网络智能问答。
     同时进行相关学习资源推荐，返回相关链接和内容片段。
+    三个LLM调用作为并发分支执行：资源推荐在请求开始时即启动；有文档片段时网络回答预先启动，
+    文档回答被采用后取消。每个分支有独立超时，某个分支失败时返回其余分支的结果（errors 中列出失败的分支）。
     """
     try:
         data = request.json
@@ -1513,95 +1738,86 @@ def chat_with_knowledge():
         if not user_question:
             return jsonify({'status': 'error', 'message': '问题不能为空'}), 400
         
-        # 获取上传文档全文内容
-        with app.app_context():
-            db = get_db()
-            cursor = db.cursor()
-            cursor.execute("SELECT content FROM topologies WHERE id = ?", (topology_id,))
-            row = cursor.fetchone()
-            document_text = row["content"] if row else ""
+        # 措辞相近的问题已回答过（且文档未变化）时直接返回缓存结果，不调用LLM
+        cached, content_hash = lookup_cached_answer(topology_id, user_question)
+        if cached is not None:
+            return jsonify({
+                'status': 'success',
+                'answer': cached['answer'],
+                'resources': cached['resources'],
+                'source': cached['source'],
+                'cached': True,
+                'similarity': cached['similarity']
+            })
         
-        # 直接用DeepSeek API在文档内容中查找相关内容
-        doc_search_prompt = (
-            "你是一个文档检索助手。请在下方给定的文档内容中查找与用户问题最相关的原文片段，"
-            "并直接用文档原文文本回答。回答时用Markdown格式对原文文字进行重新排版，可以更改与文本意思无关的序数词和特殊符号，不要改变原文有效文字，"
-            "**所有数学公式必须用LaTeX语法，并用$...$（行内）或$$...$$（块级）包裹，且不要用Markdown代码块（```）或中括号[]包裹公式**，不要改变原文有效文字。如果文档中没有相关内容，请只回复'未找到'。\n"
-            "文档内容：" + document_text + "\n用户问题：" + user_question + "\n请用文档原文回答："
-        )
-        messages = [
-            {"role": "system", "content": "你是一个文档检索助手。"},
-            {"role": "user", "content": doc_search_prompt}
-        ]
+        user_id = session.get('username')
+        branches = ChatFanOut(chat_executor, chat_branch_stats)
+        errors = {}
         try:
-            client = get_openai_client()
-            response = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=messages,
-                max_tokens=512
-            )
-            doc_answer = response.choices[0].message.content.strip()
-        except Exception as e:
-            logger.error(f"DeepSeek文档检索API错误: {str(e)}", exc_info=True)
-            doc_answer = ""
+            # 推荐学习资源只依赖问题，立即开始
+            branches.submit("resources", recommend_resources_branch, CHAT_RESOURCES_TIMEOUT, user_question, user_id)
+            
+            # 本地检索与问题相关的文档片段，检索置信度不足时不调用文档问答
+            document_context = retrieve_document_context(topology_id, user_question)
+            if document_context:
+                branches.submit("doc", answer_from_document, CHAT_DOC_TIMEOUT, document_context, user_question, user_id)
+            if not document_context or CHAT_SPECULATIVE_WEB:
+                branches.submit("web", answer_from_web, CHAT_WEB_TIMEOUT, user_question, user_id)
+            
+            answer, source = "", None
+            if "doc" in branches:
+                doc = branches.result("doc")
+                logger.info(f"[问答调试] 文档回答分支: ok={doc.ok}, 耗时 {doc.elapsed}s, 错误: {doc.error}")
+                if doc.ok and doc.value:
+                    # 直接返回原始AI回答，保留Markdown；预先启动的网络回答不再需要
+                    answer, source = doc.value, "document"
+                    branches.cancel("web")
+                elif not doc.ok:
+                    errors["doc"] = doc.error
+            
+            if source is None:
+                # 文档中查不到或文档回答失败，使用网络智能问答
+                if "web" not in branches:
+                    branches.submit("web", answer_from_web, CHAT_WEB_TIMEOUT, user_question, user_id)
+                web = branches.result("web")
+                logger.info(f"[问答调试] 网络回答分支: ok={web.ok}, 耗时 {web.elapsed}s, 错误: {web.error}")
+                source = "web"
+                if web.ok and web.value:
+                    answer = web.value
+                else:
+                    answer = WEB_ANSWER_UNAVAILABLE
+                    errors["web"] = web.error or "empty answer"
+            
+            resources = branches.result("resources")
+            if not resources.ok:
+                errors["resources"] = resources.error
+        finally:
+            branches.cancel_all()
         
-        deny_phrases = ["未找到", "没有相关内容", "查无相关", "未检索到", "未能找到", "未能检索到", "没有找到"]
-        deny_matched = [deny for deny in deny_phrases if deny in doc_answer] if doc_answer else []
-        logger.info(f"[问答调试] doc_answer: {doc_answer}")
-        logger.info(f"[问答调试] deny_matched: {deny_matched}")
-        if doc_answer and not deny_matched:
-            answer = doc_answer  # 直接返回原始AI回答，保留Markdown
-            source = "document"
-        else:
-            # 文档中查不到，调用智能网络问答接口
-            answer = generate_answer_from_web(user_question)  # 直接返回原始AI回答，保留Markdown
-            source = "web"
-        # 推荐学习资源
-        resources = recommend_resources_based_on_question(user_question)
-        return jsonify({
+        response = {
             'status': 'success',
             'answer': answer,
-            'resources': resources,
+            'resources': resources.value if resources.ok else [],
             'source': source
-        })
+        }
+        if errors:
+            response['errors'] = errors  # 部分分支失败时返回其余分支的结果
+        else:
+            store_cached_answer(topology_id, user_question, answer, source, response['resources'], content_hash)
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"交互问答错误: {str(e)}", exc_info=True)
         return jsonify({'status': 'error', 'message': f"交互问答出错: {str(e)}"}), 500
 
-def generate_answer_from_web(question):
-    """
-    调用网络智能问答接口（DeepSeek）
-    """
-    messages = [
-        {"role": "system", "content": (
-            "你是一个智能助理，能够基于互联网资源回答各种问题。"
-            "回答时用Markdown格式排版，不要添加不合理的换行，去除空白段落，所有数学公式必须用LaTeX语法。"
-            "**行内公式请用$...$包裹，且必须与文字同行；独占一行或需要居中显示的公式必须与文字同行用$$...$$包裹。**"
-            "禁止用markdown代码块（```）、中括号[]或其他符号包裹公式。"
-            "只返回直接的答案内容，不要多余解释。"
-        )},
-        {"role": "user", "content": question}
-    ]
-    try:
-        client = get_openai_client()
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            max_tokens=1024  # 增大输出长度
-        )
-        answer = response.choices[0].message.content.strip()
-        logger.info(f"[问答调试] 网络AI原始返回内容: {repr(answer)}")
-        return answer
-    except Exception as e:
-        logger.error(f"生成网络回答错误: {str(e)}", exc_info=True)
-        return "抱歉，网络问答服务不可用。"
-
 @app.teardown_appcontext
 def close_db(exception):
-    """关闭数据库连接"""
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    """把数据库连接归还连接池（未提交的事务会被回滚）"""
+    pool = _db_pools.get(DATABASE)
+    for name in ('_database', '_read_database'):
+        db = g.pop(name, None)
+        if db is not None and pool is not None:
+            pool.release(db)
 
 ###首页登录模块
 @app.route('/api/register', methods=['POST'])
@@ -1797,7 +2013,7 @@ def get_user_info():
         user_id = session['user_id']
         
         with app.app_context():
-            db = get_db()
+            db = get_read_db()
             cursor = db.cursor()
             cursor.execute(
                 "SELECT id, username, email, created_at FROM users WHERE id = ?",
@@ -1897,28 +2113,41 @@ def api_change_password():
 
 @app.route('/api/topology/status/<topology_id>', methods=['GET'])
 def get_topology_status(topology_id):
-    """获取拓扑图处理状态"""
-    if topology_id not in topology_results:
-        return jsonify({
-            'status': 'error',
-            'message': '拓扑图不存在'
-        }), 404
+    """获取拓扑图处理状态（任务表各进程共享；任务记录已清理的拓扑图按已完成返回）"""
+    with app.app_context():
+        db = get_read_db()
+        job = job_store.get(db, topology_id)
+        if job is None:
+            topology = db.execute(
+                """SELECT t.max_nodes, t.created_at, COALESCE(b.length, 0) AS text_length,
+                          (SELECT COUNT(*) FROM nodes WHERE topology_id = t.id) AS node_count,
+                          (SELECT COUNT(*) FROM edges WHERE topology_id = t.id) AS edge_count
+                   FROM topologies t LEFT JOIN document_blobs b ON b.hash = t.content_hash
+                   WHERE t.id = ?""",
+                (topology_id,)
+            ).fetchone()
+            if topology is None:
+                return jsonify({
+                    'status': 'error',
+                    'message': '拓扑图不存在'
+                }), 404
+            job = dict(topology, status=COMPLETED, progress=100, message='', processing_time=0)
     
-    topology = topology_results[topology_id]
+    partial_graph = job_store.partial_graph(topology_id) if job['status'] == PROCESSING else None
     
     return jsonify({
         'status': 'success',
         'data': {
             'topology_id': topology_id,
-            'status': topology['status'],
-            'progress': topology.get('progress', 0),
-            'message': topology.get('message', ''),
-            'created_at': topology.get('created_at', ''),
-            'node_count': topology.get('node_count', 0),
-            'edge_count': topology.get('edge_count', 0),
-            'processing_time': topology.get('processing_time', 0),
-            'text_length': topology.get('text_length', 0),
-            'max_nodes': topology.get('max_nodes', 0)
+            'status': job['status'],
+            'progress': job['progress'],
+            'message': job['message'] or '',
+            'created_at': job['created_at'] or '',
+            'node_count': partial_graph.node_count if partial_graph else job['node_count'],
+            'edge_count': partial_graph.edge_count if partial_graph else job['edge_count'],
+            'processing_time': job['processing_time'],
+            'text_length': job['text_length'],
+            'max_nodes': job['max_nodes']
         }
     }), 200
 
@@ -1929,15 +2158,17 @@ def get_topologies():
         user_id = session.get('username', 'anonymous')
         
         with app.app_context():
-            db = get_db()
+            db = get_read_db()
             cursor = db.cursor()
             
+            # 预览和长度随blob元数据保存，列表查询不读取也不解压原文
             cursor.execute("""
-                SELECT id, created_at, max_nodes, 
-                       substr(content, 1, 100) as content_preview
-                FROM topologies 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC
+                SELECT t.id, t.created_at, t.max_nodes,
+                       COALESCE(b.preview, '') as content_preview, COALESCE(b.length, 0) as text_length
+                FROM topologies t
+                LEFT JOIN document_blobs b ON b.hash = t.content_hash
+                WHERE t.user_id = ? 
+                ORDER BY t.created_at DESC
             """, (user_id,))
             
             topologies = []
@@ -1946,7 +2177,7 @@ def get_topologies():
                     'id': row['id'],
                     'created_at': row['created_at'],
                     'max_nodes': row['max_nodes'],
-                    'content_preview': row['content_preview'] + '...' if len(row['content_preview']) >= 100 else row['content_preview']
+                    'content_preview': row['content_preview'] + '...' if row['text_length'] > len(row['content_preview']) else row['content_preview']
                 })
             
             return jsonify({
@@ -2207,9 +2438,5 @@ if __name__ == '__main__':
     except Exception as e:
         logger.error(f"数据库初始化异常: {str(e)}", exc_info=True)
         logger.info("尝试继续运行，但可能会出现数据库相关错误")
-    # 拓扑图处理结果存储（使用全局变量）
-    topology_results = {}
-    uploaded_documents = {}
-    
     logger.info("智能助教系统启动中...")
     app.run(debug=True, port=5000)
\ No newline at end of file
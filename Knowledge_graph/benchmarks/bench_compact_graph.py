@@ -0,0 +1,57 @@
+"""
+图存储基准：比较每个节点/边一个Python字典的旧图结构（GraphIndex 计算层级）
+与 CompactGraph（名称驻留 + CSR整数数组 + NumPy向量化指标）的内存占用和构建耗时。
+
+用法: python benchmarks/bench_compact_graph.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compact_graph import CompactGraph  # noqa: E402
+from graph_core import GraphIndex  # noqa: E402
+from bench_graph_core import synthetic_triples  # noqa: E402
+
+
+def dict_graph(knowledge_edges):
+    """旧结构：节点字典约9个键，每条边带嵌套的 font 字典"""
+    graph = GraphIndex.from_triples(knowledge_edges)
+    levels = graph.levels()
+    nodes = [{
+        "id": label, "label": label, "title": label,
+        "level": levels[node], "value": max(1, graph.in_degree[node] + graph.out_degree[node]),
+        "mastered": False, "mastery_score": 0, "consecutive_correct": 0, "content_snippet": ""
+    } for node, label in enumerate(graph.labels)]
+    edges = [{"from": src, "to": tgt, "label": rel, "title": rel, "arrows": "to", "font": {"align": "middle"}}
+             for src, rel, tgt in knowledge_edges]
+    return {"nodes": nodes, "edges": edges, "root": graph.root_label()}
+
+
+def measure(func, triples):
+    """返回 (结果, 耗时秒, 结果常驻内存字节)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(triples)
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, retained
+
+
+def main():
+    CompactGraph.from_triples(synthetic_triples(100))  # 预热NumPy
+    for n in (1000, 10000, 50000, 200000):
+        # 名称在每次运行时重新生成，避免两种结构共享同一批字符串对象
+        old, old_time, old_mem = measure(dict_graph, synthetic_triples(n))
+        del old
+        new, new_time, new_mem = measure(CompactGraph.from_triples, synthetic_triples(n))
+        print(f"{n:>7} 条边: 字典图 {old_time * 1000:8.1f} ms {old_mem / 2**20:7.1f} MiB | "
+              f"CompactGraph {new_time * 1000:8.1f} ms {new_mem / 2**20:7.1f} MiB"
+              f"（含PageRank，内存 {old_mem / new_mem:4.1f}x）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+数据库并发基准：模拟后台文档处理线程批量写入节点、多个答题请求（读后写）和图谱查询（只读）同时进行，
+比较原 get_db()（每个上下文新建连接、默认回滚日志模式）与 SQLitePool（WAL + 连接复用 + 只读连接）
+的吞吐量和 "database is locked" 错误数。
+
+用法: python benchmarks/bench_db_pool.py
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import SQLitePool  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE nodes (topology_id TEXT, id TEXT, label TEXT, mastery_score REAL DEFAULT 0,
+                    consecutive_correct INTEGER DEFAULT 0, content_snippet TEXT, PRIMARY KEY (topology_id, id));
+"""
+DURATION = 3.0
+
+
+def legacy_connect(path):
+    """原实现：每次 sqlite3.connect，默认回滚日志和5秒超时"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def run(path, open_write, open_read, close):
+    stop = time.perf_counter() + DURATION
+    counts = {"writes": 0, "answers": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def record(key):
+        with lock:
+            counts[key] += 1
+
+    def guarded(func, key):
+        try:
+            func()
+            record(key)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            record("locked")
+
+    def document_writer(worker):
+        batch = 0
+        while time.perf_counter() < stop:
+            def write():
+                db = open_write()
+                try:
+                    for i in range(200):
+                        db.execute("INSERT OR REPLACE INTO nodes (topology_id, id, label, content_snippet) "
+                                   "VALUES (?, ?, ?, ?)", (f"doc{worker}", f"n{batch}-{i}", "label", "x" * 200))
+                    db.commit()
+                finally:
+                    close(db)
+            guarded(write, "writes")
+            batch += 1
+
+    def quiz_answer(worker):
+        while time.perf_counter() < stop:
+            def answer():
+                db = open_write()
+                try:
+                    db.execute("SELECT mastery_score FROM nodes WHERE topology_id = 'quiz' AND id = ?",
+                               (f"q{worker}",)).fetchone()
+                    time.sleep(0.002)  # 评估答案期间的处理
+                    db.execute("INSERT OR REPLACE INTO nodes (topology_id, id, label, mastery_score) "
+                               "VALUES ('quiz', ?, 'q', 80)", (f"q{worker}",))
+                    db.commit()
+                finally:
+                    close(db)
+            guarded(answer, "answers")
+
+    def graph_reader():
+        while time.perf_counter() < stop:
+            def read():
+                db = open_read()
+                try:
+                    db.execute("SELECT COUNT(*), AVG(mastery_score) FROM nodes").fetchone()
+                finally:
+                    close(db)
+            guarded(read, "reads")
+
+    threads = ([threading.Thread(target=document_writer, args=(i,)) for i in range(2)] +
+               [threading.Thread(target=quiz_answer, args=(i,)) for i in range(6)] +
+               [threading.Thread(target=graph_reader) for _ in range(6)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        with sqlite3.connect(legacy_path) as conn:
+            conn.executescript(SCHEMA)
+        legacy = run(legacy_path, lambda: legacy_connect(legacy_path), lambda: legacy_connect(legacy_path),
+                     lambda db: db.close())
+
+        pooled_path = os.path.join(tmp, "pooled.db")
+        pool = SQLitePool(pooled_path)
+        with pool.connection() as conn:
+            conn.executescript(SCHEMA)
+        pooled = run(pooled_path, pool.acquire, lambda: pool.acquire(readonly=True), pool.release)
+        pool.close_all()
+
+    for name, counts in (("原实现（回滚日志）", legacy), ("SQLitePool（WAL）", pooled)):
+        print(f"{name:<18} {DURATION:.0f}秒内: 批量写入 {counts['writes']:>5}  答题写入 {counts['answers']:>6}  "
+              f"查询 {counts['reads']:>7}  database is locked {counts['locked']:>5}")
+
+
+if __name__ == "__main__":
+    main()
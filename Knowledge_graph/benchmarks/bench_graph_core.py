@@ -0,0 +1,100 @@
+"""
+图构建基准：比较原 build_tree_structure 中的递归 calculate_level + 逐节点全边扫描
+与 GraphIndex（邻接索引 + 迭代BFS）的层级/连接数计算耗时。
+
+用法: python benchmarks/bench_graph_core.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_core import GraphIndex  # noqa: E402
+
+
+def synthetic_triples(n_triples, seed=0):
+    """三棵树组成的森林（多个根节点），加上约10%的交叉边和回边（含环）"""
+    rng = random.Random(seed)
+    triples = []
+    n_nodes = max(2, int(n_triples * 0.9))
+    for i in range(3, n_nodes):
+        triples.append([f"知识点{rng.randrange(i)}", "包含", f"知识点{i}"])
+    while len(triples) < n_triples:
+        a, b = rng.randrange(n_nodes), rng.randrange(n_nodes)
+        if a != b:
+            triples.append([f"知识点{a}", "相关", f"知识点{b}"])
+    return triples
+
+
+def legacy_levels_and_values(knowledge_edges):
+    """原实现：递归DFS计算层级，每个节点两次全边扫描计算连接数"""
+    nodes = {}
+    edges = []
+    for src, rel, tgt in knowledge_edges:
+        for label in (src, tgt):
+            if label not in nodes:
+                nodes[label] = {"level": 0, "value": 1}
+        edges.append({"from": src, "to": tgt, "label": rel})
+
+    def calculate_level(node_id, current_level=0, visited=None):
+        if visited is None:
+            visited = set()
+        if node_id in visited:
+            return
+        visited.add(node_id)
+        if node_id in nodes:
+            nodes[node_id]["level"] = max(nodes[node_id]["level"], current_level)
+            for edge in edges:
+                if edge["from"] == node_id:
+                    calculate_level(edge["to"], current_level + 1, visited)
+
+    root_candidates = set(nodes)
+    for _, _, tgt in knowledge_edges:
+        root_candidates.discard(tgt)
+    root = next(iter(root_candidates)) if root_candidates else next(iter(nodes), None)
+    if root:
+        calculate_level(root)
+    for node_id in nodes:
+        in_connections = sum(1 for edge in edges if edge["to"] == node_id)
+        out_connections = sum(1 for edge in edges if edge["from"] == node_id)
+        nodes[node_id]["value"] = max(1, in_connections + out_connections)
+    return nodes
+
+
+def indexed_levels_and_values(knowledge_edges):
+    graph = GraphIndex.from_triples(knowledge_edges)
+    levels = graph.levels()
+    return {label: {"level": levels[node], "value": max(1, graph.in_degree[node] + graph.out_degree[node])}
+            for node, label in enumerate(graph.labels)}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    sys.setrecursionlimit(100000)
+    for n in (200, 500, 1000, 2000, 10000):
+        triples = synthetic_triples(n)
+        new_result, new_time = timed(indexed_levels_and_values, triples)
+        line = f"{n:>6} 个三元组: GraphIndex {new_time * 1000:8.2f} ms"
+        if n <= 2000:
+            try:
+                old_result, old_time = timed(legacy_levels_and_values, triples)
+                unreached = sum(1 for label, node in new_result.items()
+                                if node["level"] > 0 and old_result[label]["level"] == 0)
+                line += (f" | 原实现 {old_time * 1000:9.2f} ms（{old_time / new_time:6.1f}x），"
+                         f"原实现未计算层级的节点 {unreached} 个")
+            except RecursionError:
+                line += " | 原实现递归溢出"
+        else:
+            line += " | 原实现跳过（O(N·E)，耗时过长）"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+图谱保存基准：比较原 save_to_database（process_document 先单独写一次 topologies 并提交，
+再逐行 cursor.execute 写入节点和边）与单事务 executemany 批量写入的耗时，
+分别测量首次保存和重新生成（覆盖已有图谱，取3次最短耗时）两种情况。
+
+用法: python benchmarks/bench_save_graph.py
+"""
+import os
+import sys
+import time
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('FLASK_CONFIG', 'testing')
+
+from compact_graph import CompactGraph  # noqa: E402
+from bench_graph_core import synthetic_triples  # noqa: E402
+
+
+def legacy_save(app_module, topology_id, graph, content, max_nodes, user_id):
+    """
+    原实现：topologies 写两次（两次提交），节点和边逐行执行 INSERT OR REPLACE。
+    topologies 现已不再内联原文，这里写入结构与原表相同的 legacy_topologies。
+    """
+    with app_module.app.app_context():
+        db = app_module.get_db()
+        cursor = db.cursor()
+        cursor.execute("""CREATE TABLE IF NOT EXISTS legacy_topologies (id TEXT PRIMARY KEY, content TEXT NOT NULL,
+                          max_nodes INTEGER DEFAULT 0, created_at TEXT, user_id TEXT DEFAULT 'anonymous')""")
+        cursor.execute("INSERT OR REPLACE INTO legacy_topologies (id, content, created_at) VALUES (?, ?, ?)",
+                       (topology_id, content, time.strftime('%Y-%m-%d %H:%M:%S')))
+        db.commit()
+        cursor.execute(
+            "INSERT OR REPLACE INTO legacy_topologies (id, content, max_nodes, created_at, user_id) VALUES (?, ?, ?, ?, ?)",
+            (topology_id, content, max_nodes, time.strftime('%Y-%m-%d %H:%M:%S'), user_id))
+        for row in graph.node_rows():
+            cursor.execute(
+                """INSERT OR REPLACE INTO nodes
+                (topology_id, id, label, level, value, mastered, mastery_score, consecutive_correct, content_snippet, x, y,
+                 centrality)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", (topology_id,) + row)
+        for row in graph.edge_rows():
+            cursor.execute("INSERT OR REPLACE INTO edges (topology_id, from_node, to_node, label) VALUES (?, ?, ?, ?)",
+                           (topology_id,) + row)
+        db.commit()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    import app as app_module
+    app_module.logger.disabled = True
+    app_module.DATABASE = os.path.join(workdir, "bench.db")
+    app_module.init_db()
+    savers = (("逐行写入", lambda *args: legacy_save(app_module, *args)), ("批量事务", app_module.save_to_database))
+
+    content = "知识点" * 20000
+    for n_nodes in (1000, 10000):
+        graph = CompactGraph.from_triples(synthetic_triples(int(n_nodes / 0.9) + 3))
+        graph.set_snippets({label: f"{label} 的原文片段" * 5 for label in graph.labels})
+        graph.layout()
+        for name, save in savers:
+            topology_id = f"{name}-{n_nodes}"
+            first = timed(save, topology_id, graph, content, 0, "bench")
+            again = min(timed(save, topology_id, graph, content, 0, "bench") for _ in range(3))
+            print(f"{graph.node_count:>6} 个节点 / {graph.edge_count:>6} 条边 {name}: "
+                  f"首次保存 {first * 1000:8.1f} ms，重新生成 {again * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+原文片段提取基准：比较原 extract_content_snippet（每个节点都对全文 lower() 再 find）
+与 SnippetEngine（全文只转小写一次，多模式自动机一次扫描）在大文档上的耗时。
+
+用法: python benchmarks/bench_snippet_engine.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snippet_engine import SnippetEngine  # noqa: E402
+
+
+def legacy_extract_content_snippet(content: str, topic: str) -> str:
+    """原实现"""
+    index = content.lower().find(topic.lower())
+    if index == -1:
+        return ""
+    start = max(0, index - 200)
+    end = min(len(content), index + len(topic) + 200)
+    snippet = content[start:end]
+    if topic.lower() not in snippet.lower():
+        return ""
+    if start > 0:
+        snippet = "..." + snippet
+    if end < len(content):
+        snippet = snippet + "..."
+    return snippet
+
+
+def synthetic_document(n_chars, labels, seed=0):
+    """随机中英文填充文本，其中穿插节点名称（部分名称出现多次，部分不出现）"""
+    rng = random.Random(seed)
+    filler = "这是用于性能测试的填充文本，包含一些常见的中文字符和 English words for testing. "
+    parts = []
+    size = 0
+    present = labels[: int(len(labels) * 0.9)]
+    while size < n_chars:
+        piece = filler if rng.random() > 0.05 else f"{rng.choice(present)}与{rng.choice(present)}的关系。"
+        parts.append(piece)
+        size += len(piece)
+    return "".join(parts)[:n_chars]
+
+
+def main():
+    labels = [f"知识点{i}号概念" for i in range(190)] + [f"Concept Number {i}" for i in range(10)]
+    for n_chars in (200_000, 1_000_000, 2_000_000):
+        content = synthetic_document(n_chars, labels)
+        start = time.perf_counter()
+        legacy = {label: legacy_extract_content_snippet(content, label) for label in labels}
+        legacy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        engine = SnippetEngine(content).snippets(labels)
+        engine_time = time.perf_counter() - start
+        legacy_found = sum(1 for snippet in legacy.values() if snippet)
+        engine_found = sum(1 for snippet in engine.values() if snippet)
+        print(f"{n_chars / 1e6:.1f}M 字符, {len(labels)} 个节点: 原实现 {legacy_time * 1000:8.1f} ms（命中 {legacy_found}）"
+              f" | SnippetEngine {engine_time * 1000:8.1f} ms（命中 {engine_found}，含模糊匹配）"
+              f" | {legacy_time / engine_time:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
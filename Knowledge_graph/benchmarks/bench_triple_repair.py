@@ -0,0 +1,78 @@
+"""
+容错三元组解析基准：
+1. 在畸形模型输出语料（malformed_outputs.jsonl）上统计严格 json.loads 与 parse_triples 的恢复情况；
+2. 在不同规模的合成大输出上测量解析耗时，验证耗时随输入长度线性增长。
+
+用法: python benchmarks/bench_triple_repair.py
+"""
+import os
+import sys
+import json
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from triple_repair import parse_triples  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "malformed_outputs.jsonl")
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def strict_parse(output):
+    try:
+        data = json.loads(output.strip().strip("`").removeprefix("json"))
+    except json.JSONDecodeError:
+        return []
+    return [item for item in data if isinstance(item, list) and len(item) == 3] if isinstance(data, list) else []
+
+
+def synthetic_output(n_triples, seed=0):
+    """生成含各类常见错误的大规模模型输出"""
+    rng = random.Random(seed)
+    elements = []
+    for i in range(n_triples):
+        parent, child = f"知识点{i // 5}", f"知识点{i + 1}"
+        kind = rng.random()
+        if kind < 0.1:
+            elements.append(f"['{parent}', '包含', '{child}']")
+        elif kind < 0.2:
+            elements.append(f'["{parent}", "包含", "{child}" 的 "别名"]')
+        elif kind < 0.25:
+            elements.append(f'["{parent}", "包含"]')
+        else:
+            elements.append(f'["{parent}", "包含", "{child}"]')
+    separators = [", " if rng.random() > 0.05 else " " for _ in elements]
+    return "```json\n[" + "".join(e + s for e, s in zip(elements, separators)) + "]\n```"
+
+
+def main():
+    corpus = load_corpus()
+    expected_total = sum(len(case["expected"]) for case in corpus)
+    strict_total = sum(len(strict_parse(case["output"])) for case in corpus)
+    recovered_total = 0
+    exact = 0
+    for case in corpus:
+        triples, stats = parse_triples(case["output"])
+        recovered_total += len(triples)
+        exact += triples == case["expected"]
+        print(f"{case['name']:<36} 恢复 {len(triples)}/{len(case['expected'])}  修复: {dict(stats.repairs) or '无'}")
+    print(f"\n语料 {len(corpus)} 条，期望三元组 {expected_total} 个")
+    print(f"严格 json.loads 恢复: {strict_total}")
+    print(f"parse_triples 恢复:  {recovered_total}（完全一致 {exact}/{len(corpus)} 条）\n")
+
+    for n in (2500, 5000, 10000, 20000):
+        output = synthetic_output(n)
+        start = time.perf_counter()
+        triples, stats = parse_triples(output)
+        elapsed = time.perf_counter() - start
+        print(f"合成输出 {n:>6} 个元素 / {len(output):>8} 字符: {elapsed * 1000:8.1f} ms，"
+              f"恢复 {stats.recovered}，跳过 {stats.skipped}")
+
+
+if __name__ == "__main__":
+    main()
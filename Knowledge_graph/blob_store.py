@@ -0,0 +1,92 @@
+import zlib
+import hashlib
+
+# 文档列表中显示的原文预览长度（字符），随blob一起保存，列表查询无需解压
+PREVIEW_CHARS = 100
+COMPRESS_LEVEL = 6
+CODEC = "zlib"
+
+
+def text_digest(text: str) -> str:
+    """文档内容的地址：UTF-8编码后的SHA-256十六进制摘要"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode('utf-8'), COMPRESS_LEVEL)
+
+
+def decompress_text(codec: str, data: bytes) -> str:
+    if codec != CODEC:
+        raise ValueError(f"不支持的文档压缩格式: {codec}")
+    return zlib.decompress(data).decode('utf-8')
+
+
+def acquire_blob(db, text: str) -> str:
+    """
+    引用一份文档内容并返回其摘要：内容已存在时只增加引用计数（不再压缩），
+    否则压缩后写入。调用方负责事务提交。
+    """
+    digest = text_digest(text)
+    updated = db.execute("UPDATE document_blobs SET refcount = refcount + 1 WHERE hash = ?", (digest,))
+    if not updated.rowcount:
+        db.execute(
+            "INSERT INTO document_blobs (hash, refcount, length, preview, codec, data) VALUES (?, 1, ?, ?, ?, ?)",
+            (digest, len(text), text[:PREVIEW_CHARS], CODEC, compress_text(text))
+        )
+    return digest
+
+
+def release_blob(db, digest: str):
+    """释放一次引用，引用计数归零时删除内容。调用方负责事务提交。"""
+    if not digest:
+        return
+    db.execute("UPDATE document_blobs SET refcount = refcount - 1 WHERE hash = ?", (digest,))
+    db.execute("DELETE FROM document_blobs WHERE hash = ? AND refcount <= 0", (digest,))
+
+
+def replace_blob(db, old_digest, text: str) -> str:
+    """拓扑图改为引用 text：内容未变时引用计数不变，否则引用新内容并释放旧内容"""
+    digest = text_digest(text)
+    if digest == old_digest:
+        return digest
+    acquire_blob(db, text)
+    release_blob(db, old_digest)
+    return digest
+
+
+class LazyDocument:
+    """
+    文档的惰性访问器：只持有摘要、长度和预览，首次访问 text 时才读取压缩数据并解压（结果缓存在对象上）。
+    压缩数据在调用方提供的连接上读取，应在取得该对象的同一个应用上下文中访问 text。
+    """
+
+    __slots__ = ("digest", "length", "preview", "_db", "_text")
+
+    def __init__(self, db, digest: str, length: int, preview: str):
+        self._db = db
+        self.digest = digest
+        self.length = length
+        self.preview = preview
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            row = self._db.execute("SELECT codec, data FROM document_blobs WHERE hash = ?", (self.digest,)).fetchone()
+            self._text = decompress_text(row[0], row[1]) if row else ""
+        return self._text
+
+    def __len__(self):
+        return self.length
+
+
+def open_document(db, topology_id):
+    """拓扑图原文的惰性访问器，拓扑图或原文不存在时返回 None（不读取压缩数据）"""
+    row = db.execute(
+        """SELECT b.hash, b.length, b.preview FROM topologies t
+           JOIN document_blobs b ON b.hash = t.content_hash
+           WHERE t.id = ?""",
+        (topology_id,)
+    ).fetchone()
+    return LazyDocument(db, row[0], row[1], row[2]) if row else None
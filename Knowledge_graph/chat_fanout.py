@@ -0,0 +1,109 @@
+import time
+import logging
+import threading
+from collections import namedtuple, defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+# 各请求共享的分支统计计数器的锁
+_stats_lock = threading.Lock()
+
+# 分支结果：ok 为 False 时 error 为 "timeout"、"cancelled" 或异常描述
+BranchResult = namedtuple('BranchResult', ['name', 'ok', 'value', 'error', 'elapsed'])
+
+
+class BranchCancelled(Exception):
+    """分支在运行中被取消"""
+
+
+def collect_stream(deltas, cancel_event: threading.Event) -> str:
+    """
+    读完流式回复并拼接为完整文本；每收到一段都检查取消标志，取消时关闭上游流
+    （停止生成，释放网关并发名额）并抛出 BranchCancelled。
+    """
+    parts = []
+    try:
+        for delta in deltas:
+            if cancel_event.is_set():
+                raise BranchCancelled()
+            parts.append(delta)
+    finally:
+        close = getattr(deltas, "close", None)
+        if close is not None:
+            close()
+    if cancel_event.is_set():
+        raise BranchCancelled()
+    return "".join(parts)
+
+
+class _Branch:
+    __slots__ = ("name", "future", "cancel_event", "timeout", "started")
+
+    def __init__(self, name, future, cancel_event, timeout, started):
+        self.name = name
+        self.future = future
+        self.cancel_event = cancel_event
+        self.timeout = timeout
+        self.started = started
+
+
+class ChatFanOut:
+    """
+    问答的并发分支：每个分支在共享线程池中执行，有各自的超时（从提交时开始计时）和取消标志。
+    分支函数的第一个参数为取消标志（threading.Event），流式分支应通过 collect_stream 响应取消；
+    非流式的调用无法中途打断，取消或超时后其结果被丢弃。
+    分支失败、超时或被取消都不会影响其他分支，调用方据此返回部分结果。
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, stats=None):
+        self.executor = executor
+        self.stats = stats if stats is not None else defaultdict(int)
+        self._branches = {}
+
+    def _count(self, key: str):
+        with _stats_lock:
+            self.stats[key] += 1
+
+    def submit(self, name: str, func, timeout: float, *args, **kwargs):
+        cancel_event = threading.Event()
+        future = self.executor.submit(func, cancel_event, *args, **kwargs)
+        self._branches[name] = _Branch(name, future, cancel_event, timeout, time.perf_counter())
+        self._count(f"{name}_started")
+
+    def __contains__(self, name):
+        return name in self._branches
+
+    def cancel(self, name: str):
+        """取消分支：尚未开始执行的直接撤销，执行中的设置取消标志"""
+        branch = self._branches.get(name)
+        if branch is None or branch.future.done():
+            return
+        branch.cancel_event.set()
+        branch.future.cancel()
+        self._count(f"{name}_cancelled")
+        logger.info(f"问答分支已取消: {name}")
+
+    def result(self, name: str) -> BranchResult:
+        """等待分支结束，最多等到该分支的超时时刻；超时的分支会被取消"""
+        branch = self._branches[name]
+        remaining = branch.timeout - (time.perf_counter() - branch.started)
+        try:
+            value = branch.future.result(timeout=max(0.0, remaining))
+            ok, error = True, None
+        except FutureTimeoutError:
+            self.cancel(name)
+            self._count(f"{name}_timeouts")
+            logger.warning(f"问答分支超时（{branch.timeout}秒）: {name}")
+            value, ok, error = None, False, "timeout"
+        except Exception as e:
+            cancelled = isinstance(e, BranchCancelled) or branch.future.cancelled()
+            if not cancelled:
+                self._count(f"{name}_errors")
+                logger.error(f"问答分支出错: {name}, {str(e)}", exc_info=True)
+            value, ok, error = None, False, "cancelled" if cancelled else str(e)
+        return BranchResult(name, ok, value, error, round(time.perf_counter() - branch.started, 3))
+
+    def cancel_all(self):
+        for name in self._branches:
+            self.cancel(name)
@@ -0,0 +1,146 @@
+import re
+from collections import namedtuple
+
+# 文本块：index为块序号，start/end为在原文中的字符偏移
+Chunk = namedtuple('Chunk', ['index', 'start', 'end', 'text'])
+
+# 中日韩字符（含全角标点），按约1个token/字估算
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+# 句子边界：中英文句末标点、后接空白的英文句点或换行（不含小数点）
+_BOUNDARY_PATTERN = re.compile(r'(?:[。！？!?；;]+|\.(?=\s|$))[ \t]*|\n+')
+
+# 不视为句末的常见英文缩写（小写，不含句点）
+_ABBREVIATIONS = {'e.g', 'i.e', 'mr', 'mrs', 'ms', 'dr', 'prof', 'vs', 'fig', 'eq', 'no', 'vol', 'al'}
+
+# 缩写判断：句点前的单词
+_LAST_WORD_PATTERN = re.compile(r'([A-Za-z][A-Za-z.]*)$')
+
+
+def estimate_tokens(text: str) -> int:
+    """本地估算文本的token数量（中文按字计，其余按约4个字符1个token计）"""
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return cjk_count + (other_count + 3) // 4
+
+
+def _split_sentences(text: str):
+    """按句子切分文本，返回 (起始偏移, 结束偏移) 列表"""
+    spans = []
+    pos = 0
+    for match in _BOUNDARY_PATTERN.finditer(text):
+        if match.group().startswith('.'):
+            word = _LAST_WORD_PATTERN.search(text, max(pos, match.start() - 16), match.start())
+            if word and word.group(1).lower() in _ABBREVIATIONS:
+                continue
+        if match.end() > pos:
+            spans.append((pos, match.end()))
+            pos = match.end()
+    if pos < len(text):
+        spans.append((pos, len(text)))
+    return spans
+
+
+def _char_cost(char: str) -> float:
+    """单个字符的token估算开销"""
+    return 1.0 if _CJK_PATTERN.match(char) else 0.25
+
+
+def _hard_split(text: str, start: int, end: int, max_tokens: int):
+    """将超过token上限的单个句子硬切分，尽量在空白处断开以免截断英文单词"""
+    spans = []
+    pos = start
+    cost = 0.0
+    last_space = -1
+    i = start
+    while i < end:
+        char_cost = _char_cost(text[i])
+        if cost + char_cost > max_tokens and i > pos:
+            cut = last_space + 1 if last_space >= pos else i
+            spans.append((pos, cut))
+            pos, cost, last_space = cut, 0.0, -1
+            i = cut
+            continue
+        if text[i].isspace():
+            last_space = i
+        cost += char_cost
+        i += 1
+    if pos < end:
+        spans.append((pos, end))
+    return spans
+
+
+def _tail_start(text: str, start: int, end: int, max_tokens: int) -> int:
+    """返回 text[start:end] 中token数不超过 max_tokens 的最长后缀的起始偏移"""
+    pos = end
+    cost = 0.0
+    while pos > start:
+        char_cost = _char_cost(text[pos - 1])
+        if cost + char_cost > max_tokens:
+            break
+        cost += char_cost
+        pos -= 1
+    return pos
+
+
+def split_text_into_chunks(text: str, max_tokens: int, overlap_tokens: int = 0) -> list:
+    """
+    将文本切分为token数受限且相互重叠的文本块。
+    优先在句子边界处切分，相邻块之间保留约 overlap_tokens 的重叠内容，
+    避免跨块的知识点关系丢失。
+    """
+    if not text or not text.strip():
+        return []
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return [Chunk(0, 0, len(text), text)]
+
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+
+    # 句子级片段，超长句子先硬切分；片段上限预留重叠空间，保证硬切分片段之间也能重叠
+    span_limit = max_tokens - overlap_tokens
+    spans = []
+    for start, end in _split_sentences(text):
+        if estimate_tokens(text[start:end]) > span_limit:
+            spans.extend(_hard_split(text, start, end, span_limit))
+        else:
+            spans.append((start, end))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for span in spans:
+        span_tokens = estimate_tokens(text[span[0]:span[1]])
+        if current and current_tokens + span_tokens > max_tokens:
+            chunk_start, chunk_end = current[0][0], current[-1][1]
+            chunks.append(Chunk(len(chunks), chunk_start, chunk_end, text[chunk_start:chunk_end]))
+
+            # 从当前块末尾回溯若干句子作为下一块的重叠部分
+            carried = []
+            carried_tokens = 0
+            for prev in reversed(current):
+                prev_tokens = estimate_tokens(text[prev[0]:prev[1]])
+                if carried_tokens + prev_tokens > overlap_tokens:
+                    break
+                carried.insert(0, prev)
+                carried_tokens += prev_tokens
+            # 末尾句子本身超过重叠预算时，按字符截取其尾部作为重叠
+            if not carried and overlap_tokens > 0:
+                last_start, last_end = current[-1]
+                tail_start = _tail_start(text, last_start, last_end, overlap_tokens)
+                if tail_start < last_end:
+                    carried = [(tail_start, last_end)]
+                    carried_tokens = estimate_tokens(text[tail_start:last_end])
+            if carried_tokens + span_tokens > max_tokens:
+                carried, carried_tokens = [], 0
+            current, current_tokens = carried, carried_tokens
+
+        current.append(span)
+        current_tokens += span_tokens
+
+    if current:
+        chunk_start, chunk_end = current[0][0], current[-1][1]
+        chunks.append(Chunk(len(chunks), chunk_start, chunk_end, text[chunk_start:chunk_end]))
+
+    return chunks
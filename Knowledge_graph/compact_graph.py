@@ -0,0 +1,210 @@
+import sys
+
+import numpy as np
+
+from graph_core import GraphIndex, source_component_roots
+from graph_layout import hierarchical_layout
+
+
+def _csr(keys, values, n):
+    """按 keys 分组的CSR邻接数组 (indptr, indices)，同一节点内保持边的原始顺序"""
+    order = np.argsort(keys, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return indptr, values[order].astype(np.int32)
+
+
+def _gather(indptr, indices, frontier):
+    """取出 frontier 中所有节点的邻居（向量化，不逐节点循环）"""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if not total:
+        return indices[:0]
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return indices[offsets + np.arange(total)]
+
+
+class CompactGraph:
+    """
+    数组存储的知识图：节点名称驻留（intern）后按编号存放，边为CSR格式的整数邻接数组，
+    关系名称去重后以编号引用；层级、连接数、重要性（PageRank）和掌握状态均为NumPy数组。
+    只在响应边界通过 to_vis() 生成 vis.js 所需的JSON结构。
+    """
+
+    def __init__(self, labels, src, dst, relation_ids, relations):
+        self.labels = [sys.intern(label) for label in labels]
+        self.index = {label: node for node, label in enumerate(self.labels)}
+        self.relations = relations
+        n = len(self.labels)
+        self.src = np.asarray(src, dtype=np.int32)
+        self.dst = np.asarray(dst, dtype=np.int32)
+        self.relation_ids = np.asarray(relation_ids, dtype=np.int32)
+        self.out_indptr, self.out_indices = _csr(self.src, self.dst, n)
+        self.out_degree = np.diff(self.out_indptr).astype(np.int32)
+        self.in_degree = np.bincount(self.dst, minlength=n).astype(np.int32)
+
+        self.level = self.levels()
+        self.value = np.maximum(1, self.in_degree + self.out_degree)
+        self.centrality = self.pagerank()
+        self.mastered = np.zeros(n, dtype=bool)
+        self.mastery_score = np.zeros(n, dtype=np.float64)
+        self.consecutive_correct = np.zeros(n, dtype=np.int32)
+        self.snippets = [""] * n
+        self._layout = None
+
+    @classmethod
+    def from_index(cls, index: GraphIndex):
+        relation_index = {}
+        relation_ids = [relation_index.setdefault(rel, len(relation_index)) for _, _, rel in index.edges]
+        src = [u for u, _, _ in index.edges]
+        dst = [v for _, v, _ in index.edges]
+        return cls(index.labels, src, dst, relation_ids, list(relation_index))
+
+    @classmethod
+    def from_triples(cls, triples):
+        return cls.from_index(GraphIndex.from_triples(triples))
+
+    @property
+    def node_count(self) -> int:
+        return len(self.labels)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.src)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _reachable(self, sources) -> np.ndarray:
+        reached = np.zeros(len(self.labels), dtype=bool)
+        frontier = np.asarray(sources, dtype=np.int64)
+        reached[frontier] = True
+        while frontier.size:
+            children = _gather(self.out_indptr, self.out_indices, frontier)
+            frontier = np.unique(children[~reached[children]])
+            reached[frontier] = True
+        return reached
+
+    def roots(self) -> np.ndarray:
+        """
+        层级计算的起点（按编号排序）：入度为0的节点，以及每个没有外部入边的环中编号最小的节点。
+        只对入度为0的节点无法到达的部分（必然包含环）做强连通分量分解。
+        """
+        roots = np.flatnonzero(self.in_degree == 0)
+        unreached = np.flatnonzero(~self._reachable(roots))
+        if unreached.size:
+            # 无法到达的节点之间的子图：其中的源强连通分量即为环形根
+            local = np.full(len(self.labels), -1, dtype=np.int64)
+            local[unreached] = np.arange(unreached.size)
+            children = [[] for _ in range(unreached.size)]
+            for u, v in zip(local[self.src].tolist(), local[self.dst].tolist()):
+                if u >= 0 and v >= 0:
+                    children[u].append(v)
+            cycle_roots = unreached[source_component_roots(children)]
+            roots = np.sort(np.concatenate([roots, cycle_roots]))
+        return roots
+
+    def levels(self) -> np.ndarray:
+        """所有根节点出发的多源BFS，逐层向量化扩展，返回每个节点到最近根节点的距离"""
+        levels = np.full(len(self.labels), -1, dtype=np.int32)
+        if not len(self.labels):
+            return levels
+        frontier = self.roots().astype(np.int64)
+        levels[frontier] = 0
+        depth = 0
+        while frontier.size:
+            children = _gather(self.out_indptr, self.out_indices, frontier)
+            frontier = np.unique(children[levels[children] == -1])
+            depth += 1
+            levels[frontier] = depth
+        return levels
+
+    def pagerank(self, damping: float = 0.85, max_iter: int = 100, tol: float = 1e-8) -> np.ndarray:
+        """节点重要性：幂迭代计算的PageRank，无出边节点的得分均匀分配给所有节点"""
+        n = len(self.labels)
+        if not n:
+            return np.zeros(0)
+        rank = np.full(n, 1.0 / n)
+        out_degree = self.out_degree.astype(np.float64)
+        dangling = out_degree == 0
+        safe_degree = np.where(dangling, 1.0, out_degree)
+        for _ in range(max_iter):
+            flow = np.bincount(self.dst, weights=(rank / safe_degree)[self.src], minlength=n)
+            updated = (1 - damping) / n + damping * (flow + rank[dangling].sum() / n)
+            if np.abs(updated - rank).sum() < tol:
+                return updated
+            rank = updated
+        return rank
+
+    def layout(self):
+        """服务端预计算的层级布局 (x, y)：图结构不可变，每个图对象只计算一次"""
+        if self._layout is None:
+            self._layout = hierarchical_layout(self)
+        return self._layout
+
+    def root_label(self):
+        """主根节点：编号最小的入度为0的节点，全部节点都在环中时取0号节点"""
+        if not len(self.labels):
+            return None
+        zero_in = np.flatnonzero(self.in_degree == 0)
+        return self.labels[int(zero_in[0]) if zero_in.size else 0]
+
+    def set_snippets(self, snippets: dict):
+        for label, snippet in snippets.items():
+            node = self.index.get(label)
+            if node is not None:
+                self.snippets[node] = snippet
+
+    def apply_mastery(self, states: dict):
+        """按 {节点ID: 掌握状态} 恢复掌握状态，忽略图中不存在的节点"""
+        for node_id, state in states.items():
+            node = self.index.get(node_id)
+            if node is not None:
+                self.mastered[node] = bool(state["mastered"])
+                self.mastery_score[node] = state["mastery_score"]
+                self.consecutive_correct[node] = state["consecutive_correct"]
+
+    def node_rows(self):
+        """逐行产出 (ID, 名称, 层级, 连接数, 是否掌握, 掌握分数, 连续正确次数, 原文片段, x, y, 重要性)，用于写入数据库"""
+        x, y = self.layout()
+        return zip(self.labels, self.labels, self.level.tolist(), self.value.tolist(),
+                   self.mastered.astype(int).tolist(), self.mastery_score.tolist(),
+                   self.consecutive_correct.tolist(), self.snippets, x.tolist(), y.tolist(),
+                   np.round(self.centrality, 6).tolist())
+
+    def edge_rows(self):
+        """逐行产出 (父ID, 子ID, 关系)，用于写入数据库"""
+        labels, relations = self.labels, self.relations
+        return ((labels[u], labels[v], relations[r])
+                for u, v, r in zip(self.src.tolist(), self.dst.tolist(), self.relation_ids.tolist()))
+
+    def to_vis(self) -> dict:
+        """生成 vis.js 使用的 {nodes, edges, root} 结构（仅在响应时调用），节点带固定坐标 x/y"""
+        x, y = self.layout()
+        nodes = [{
+            "id": label,
+            "label": label,
+            "title": label,
+            "level": level,
+            "value": value,
+            "centrality": round(centrality, 6),
+            "mastered": mastered,
+            "mastery_score": score,
+            "consecutive_correct": correct,
+            "content_snippet": snippet,
+            "x": node_x,
+            "y": node_y
+        } for label, level, value, centrality, mastered, score, correct, snippet, node_x, node_y in zip(
+            self.labels, self.level.tolist(), self.value.tolist(), self.centrality.tolist(),
+            self.mastered.tolist(), self.mastery_score.tolist(), self.consecutive_correct.tolist(), self.snippets,
+            x.tolist(), y.tolist())]
+        edges = [{
+            "from": src,
+            "to": tgt,
+            "label": rel,
+            "title": rel,
+            "arrows": "to",
+            "font": {"align": "middle"}
+        } for src, tgt, rel in self.edge_rows()]
+        return {"nodes": nodes, "edges": edges, "root": self.root_label()}
@@ -9,6 +9,11 @@ class Config:
     
     # 数据库配置
     DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge_graph.db')
+    DB_POOL_SIZE = 8                      # 读写连接、只读连接各自的上限
+    DB_POOL_TIMEOUT = 30                  # 等待空闲连接的最长时间（秒）
+    DB_BUSY_TIMEOUT_MS = 5000             # 遇到写锁时的忙等待时间（毫秒）
+    DB_CACHE_SIZE_KIB = 16384             # 每个连接的页缓存大小（KiB）
+    DB_MMAP_SIZE = 256 * 1024 * 1024      # 内存映射读取的大小（字节）
     
     # 文件上传配置
     UPLOAD_FOLDER = 'uploads'
@@ -20,6 +25,80 @@ class Config:
     MAX_RETRIES = 3
     BACKOFF_FACTOR = 2
     
+    # 知识提取配置（长文档分块并发提取）
+    EXTRACTION_CHUNK_TOKENS = 6000    # 每个文本块的token上限
+    EXTRACTION_CHUNK_OVERLAP = 300    # 相邻文本块的重叠token数
+    EXTRACTION_MAX_WORKERS = 4        # 并发提取的文本块数量
+    
+    # LLM调用配置
+    LLM_MODEL = 'deepseek-chat'
+    LLM_BASE_URL = os.environ.get('LLM_BASE_URL') or 'https://api.deepseek.com'
+    LLM_CONTEXT_TOKENS = 64000            # 模型上下文窗口（提示词+回复）
+    LLM_DOC_PROMPT_TOKENS = 12000         # 文档问答提示词中文档内容的token预算
+    
+    # 文档全文检索配置（SQLite FTS5）
+    SEARCH_CHUNK_TOKENS = 200             # 每个检索片段的token上限
+    SEARCH_RESULT_LIMIT = 10              # 检索接口默认返回的片段数
+    SEARCH_MAX_RESULTS = 50               # 检索接口单次返回的片段数上限
+    DOC_RETRIEVAL_TOP_K = 8               # 文档问答提示词中最多放入的检索片段数
+    DOC_RETRIEVAL_MIN_COVERAGE = 0.6      # 最相关片段的查询词覆盖率低于该值时直接改用网络问答
+    
+    # 交互问答并发配置（文档回答、网络回答、资源推荐三个分支并发执行）
+    CHAT_MAX_WORKERS = 16                 # 问答分支共享线程池的线程数
+    CHAT_DOC_TIMEOUT = 60                 # 文档回答分支超时（秒）
+    CHAT_WEB_TIMEOUT = 90                 # 网络回答分支超时（秒）
+    CHAT_RESOURCES_TIMEOUT = 45           # 资源推荐分支超时（秒）
+    CHAT_SPECULATIVE_WEB = True           # 有文档片段时是否同时预先开始网络回答（文档回答被采用后取消）
+    
+    # 问答语义缓存配置（按拓扑图，MinHash/LSH 匹配措辞相近的问题）
+    CHAT_CACHE_ENABLED = True
+    CHAT_CACHE_SIMILARITY = 0.7           # 问题字符双字组的Jaccard相似度阈值
+    CHAT_CACHE_TTL = 24 * 3600            # 缓存有效期（秒）
+    CHAT_CACHE_MAX_ENTRIES = 500          # 每个拓扑图最多缓存的问答数，超出按LRU淘汰
+    
+    # 文档处理任务配置（任务状态保存在数据库的 topology_jobs 表中，各进程共享）
+    JOB_RETENTION = 24 * 3600             # 结束的任务保留时间（秒），之后自动删除
+    JOB_STALE_AFTER = 1800                # 处理中任务超过该时间（秒）没有进度则视为中断
+    JOB_CACHE_SIZE = 1024                 # 进程内任务状态读缓存的条目上限
+    JOB_CACHE_TTL = 2                     # 读缓存中任务状态的有效期（秒）
+    JOB_PURGE_INTERVAL = 600              # 清理过期任务的最小间隔（秒）
+    
+    # 本地DeepSeek替身服务配置（fake_llm_server.py，用于性能测试和压测）
+    FAKE_LLM_HOST = '127.0.0.1'
+    FAKE_LLM_PORT = int(os.environ.get('FAKE_LLM_PORT') or 8765)
+    FAKE_LLM_LATENCY_MS = 0                 # 每次请求的基础延迟（毫秒）
+    FAKE_LLM_JITTER_MS = 0                  # 延迟随机抖动幅度（毫秒）
+    FAKE_LLM_ERROR_RATE = 0                 # 返回429/503错误的概率
+    FAKE_LLM_STREAM_CHUNK_CHARS = 8         # 流式输出每块的字符数
+    FAKE_LLM_STREAM_CHUNK_DELAY_MS = 20     # 流式输出每块之间的间隔（毫秒）
+    
+    # LLM客户端连接池配置（进程内共享，keep-alive复用连接）
+    LLM_MAX_CONNECTIONS = 20              # 连接池最大连接数
+    LLM_MAX_KEEPALIVE_CONNECTIONS = 10    # 最大空闲keep-alive连接数
+    LLM_KEEPALIVE_EXPIRY = 60             # 空闲连接保持时间（秒）
+    LLM_CONNECT_TIMEOUT = 10              # 建立连接超时（秒）
+    LLM_READ_TIMEOUT = 120                # 读取响应超时（秒）
+    
+    # LLM网关配置（并发限制、限速与重试）
+    LLM_MAX_CONCURRENCY = 8               # 全局同时进行的LLM调用数
+    LLM_PER_USER_CONCURRENCY = 3          # 单个用户同时进行的LLM调用数
+    LLM_REQUESTS_PER_MINUTE = 60          # 每分钟请求数上限（0为不限）
+    LLM_TOKENS_PER_MINUTE = 300000        # 每分钟token数上限（0为不限）
+    LLM_BACKOFF_BASE = 1                  # 首次重试等待基准（秒），按 BACKOFF_FACTOR 指数增长
+    LLM_BACKOFF_MAX = 30                  # 单次重试最长等待（秒）
+    LLM_SINGLE_FLIGHT_TIMEOUT = 150       # 等待相同的进行中请求返回结果的最长时间（秒）
+    
+    # LLM响应缓存配置（SQLite，与主数据库同目录）
+    LLM_CACHE_ENABLED = True
+    LLM_CACHE_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'llm_cache.db')
+    LLM_CACHE_TTL = 7 * 24 * 3600     # 缓存有效期（秒）
+    LLM_CACHE_MAX_ENTRIES = 5000      # 缓存条目上限，超出按LRU淘汰
+    # 启用缓存的调用点
+    LLM_CACHE_CALL_SITES = {
+        'extract_knowledge', 'generate_question', 'evaluate_answer',
+        'recommend_resources', 'doc_answer', 'web_answer'
+    }
+    
     # 邮件配置
     MAIL_SERVER = 'smtp.qq.com'
     MAIL_PORT = 465
@@ -89,6 +168,8 @@ class TestingConfig(Config):
     
     # 测试环境使用内存数据库
     DATABASE = ':memory:'
+    LLM_CACHE_ENABLED = False
+    CHAT_CACHE_ENABLED = False
     
     # 禁用CSRF保护（测试环境）
     WTF_CSRF_ENABLED = False
@@ -96,6 +177,17 @@ class TestingConfig(Config):
     # 测试环境邮件配置
     MAIL_SUPPRESS_SEND = True
 
+class BenchmarkConfig(DevelopmentConfig):
+    """性能测试配置：LLM调用指向本地替身服务"""
+    DEBUG = False
+    LOG_LEVEL = 'INFO'
+    
+    LLM_BASE_URL = os.environ.get('LLM_BASE_URL') or f'http://{Config.FAKE_LLM_HOST}:{Config.FAKE_LLM_PORT}'
+    # 替身服务不限速，也不应让缓存掩盖真实调用开销
+    LLM_REQUESTS_PER_MINUTE = 0
+    LLM_TOKENS_PER_MINUTE = 0
+    LLM_CACHE_ENABLED = False
+
 class ProductionConfig(Config):
     """生产环境配置"""
     DEBUG = False
@@ -120,6 +212,7 @@ class ProductionConfig(Config):
 config = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
+    'benchmark': BenchmarkConfig,
     'production': ProductionConfig,
     'default': DevelopmentConfig
 } 
\ No newline at end of file
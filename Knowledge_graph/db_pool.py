@@ -0,0 +1,141 @@
+import time
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+
+class PoolTimeoutError(RuntimeError):
+    """等待空闲数据库连接超时"""
+
+
+class SQLitePool:
+    """
+    SQLite连接池：读写连接与只读连接分别维护空闲列表，各自最多 max_connections 个。
+    连接启用WAL日志、synchronous=NORMAL、忙等待超时以及页缓存和内存映射设置；
+    只读连接以 mode=ro 打开并设置 query_only，WAL模式下读取不会被写入阻塞。
+    同一线程重复获取同一类连接时复用已借出的连接（引用计数），
+    因此嵌套的应用上下文不会在同一线程内占用两个写连接而互相锁住。
+    """
+
+    def __init__(self, path: str, max_connections: int = 8, busy_timeout_ms: int = 5000,
+                 cache_size_kib: int = 16384, mmap_size: int = 256 * 1024 * 1024,
+                 acquire_timeout: float = 30):
+        self.path = path
+        self.memory = path == ':memory:' or path.startswith('file::memory:')
+        # 内存数据库每个连接都是独立的库，只能共享一个连接
+        self.max_connections = 1 if self.memory else max(1, max_connections)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.acquire_timeout = acquire_timeout
+        self._lock = threading.Lock()
+        self._borrowed = {}  # (线程ID, 是否只读) -> [连接, 引用计数]
+        self._idle = {False: [], True: []}
+        self._slots = {False: threading.BoundedSemaphore(self.max_connections),
+                       True: threading.BoundedSemaphore(self.max_connections)}
+        self._stats = defaultdict(int)
+
+    def _connect(self, readonly: bool) -> sqlite3.Connection:
+        if readonly:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False,
+                                   timeout=self.busy_timeout_ms / 1000)
+        else:
+            # 写事务以 BEGIN IMMEDIATE 开始：在第一条写语句处排队取得写锁，避免读锁升级失败
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000,
+                                   isolation_level='IMMEDIATE')
+        conn.row_factory = sqlite3.Row
+        if not readonly and not self.memory:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        with self._lock:
+            self._stats["opened"] += 1
+        return conn
+
+    def acquire(self, readonly: bool = False) -> sqlite3.Connection:
+        """借出一个连接；池满时最多等待 acquire_timeout 秒，超时抛出 PoolTimeoutError"""
+        readonly = readonly and not self.memory
+        owner = (threading.get_ident(), readonly)
+        with self._lock:
+            held = self._borrowed.get(owner)
+            if held is not None:
+                held[1] += 1
+                return held[0]
+
+        start = time.perf_counter()
+        if not self._slots[readonly].acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeoutError(f"等待数据库连接超时（{self.acquire_timeout}秒）")
+        waited = time.perf_counter() - start
+        try:
+            with self._lock:
+                self._stats["acquired"] += 1
+                self._stats["wait_ms"] += int(waited * 1000)
+                conn = self._idle[readonly].pop() if self._idle[readonly] else None
+            if conn is None:
+                conn = self._connect(readonly)
+        except BaseException:
+            self._slots[readonly].release()
+            raise
+        with self._lock:
+            self._borrowed[owner] = [conn, 1]
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """归还连接：引用计数归零时回滚未提交的事务并放回空闲列表"""
+        with self._lock:
+            owner = next((key for key, held in self._borrowed.items() if held[0] is conn), None)
+            if owner is None:
+                raise ValueError("归还的连接不是从该连接池借出的")
+            held = self._borrowed[owner]
+            held[1] -= 1
+            if held[1] > 0:
+                return
+            del self._borrowed[owner]
+        readonly = owner[1]
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+                with self._lock:
+                    self._stats["rollbacks"] += 1
+            with self._lock:
+                self._idle[readonly].append(conn)
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            self._slots[readonly].release()
+
+    @contextmanager
+    def connection(self, readonly: bool = False):
+        conn = self.acquire(readonly)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle[False])
+            stats["idle_readonly"] = len(self._idle[True])
+            stats["in_use"] = len(self._borrowed)
+        stats["max_connections"] = self.max_connections
+        return stats
+
+    def close_all(self):
+        """关闭所有空闲连接（用于进程退出或测试清理）"""
+        with self._lock:
+            idle = self._idle[False] + self._idle[True]
+            self._idle = {False: [], True: []}
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,248 @@
+import re
+import html
+import math
+from collections import namedtuple
+
+from blob_store import open_document
+from chunking import split_text_into_chunks, estimate_tokens
+from prompt_builder import SPAN_SEPARATOR, compact_text, query_terms
+
+# 检索到的文档片段：start/end 为在原文中的字符偏移，score 为BM25得分（越大越相关）
+Passage = namedtuple('Passage', ['chunk_index', 'start', 'end', 'score', 'text'])
+
+# 片段高亮使用的私有区字符，HTML转义后再替换为 <mark> 标签（文档原文不会被当作HTML输出）
+_MARK_OPEN = '\ue000'
+_MARK_CLOSE = '\ue001'
+# 汉字之间插入的零宽空格：unicode61 分词器把它视为分隔符，使每个汉字成为一个词元，
+# 任意长度的中文词都能以相邻汉字组成的短语查询（"机 器 学 习"）
+_SEPARATOR = '\u200b'
+_CJK_BOUNDARY_PATTERN = re.compile(
+    r'(?<=[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff])(?=\w)|(?<=\w)(?=[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff])'
+)
+_CJK_TERM_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+
+# 每个检索片段的token上限，以及高亮摘要的最大词元数（汉字按1个词元计）
+SEARCH_CHUNK_TOKENS = 200
+SNIPPET_TOKENS = 48
+
+# BM25 参数；IDF 和平均片段长度按单个拓扑图的索引统计，不受其他文档影响
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 与 unicode61 分词一致的词元：连续的字母数字（零宽空格不属于 \w，汉字逐字成词）
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+# 提问用语（疑问词、语气词、客套话），不参与检索，避免"什么是"之类的双字组稀释查询词覆盖率
+_QUESTION_WORDS_PATTERN = re.compile(
+    r'什么是|是什么|什么|怎么样|怎么|怎样|如何|为什么|为何|哪些|哪个|哪里|是否|有没有|能否|可以|请问|请|'
+    r'介绍一下|解释一下|说明一下|简述|一下|告诉我|吗|呢|吧|啊|呀|的'
+)
+
+def segment(text: str) -> str:
+    """建索引前的分词预处理：在汉字与相邻字符之间插入零宽空格"""
+    return _CJK_BOUNDARY_PATTERN.sub(_SEPARATOR, text.replace(_SEPARATOR, ''))
+
+
+def _phrase(text: str) -> str:
+    """FTS5 短语：汉字逐字以空格分隔，双引号转义"""
+    if _CJK_TERM_PATTERN.search(text):
+        text = ' '.join(text)
+    return '"' + text.replace('"', '""') + '"'
+
+
+def strip_question_words(query: str) -> str:
+    """去掉疑问词、语气词等提问用语（替换为空格，避免前后文字拼成新的双字组）"""
+    return _QUESTION_WORDS_PATTERN.sub(' ', query or '')
+
+
+def retrieval_terms(query: str) -> set:
+    """检索用的查询词：去掉提问用语后的英文/数字单词和中文双字组"""
+    return query_terms(strip_question_words(query))
+
+
+def build_match_query(topology_id: str, query: str):
+    """
+    把自然语言查询转换为 FTS5 MATCH 表达式：英文/数字单词和中文双字组（与文档问答的查询词一致）
+    以 OR 组合，BM25 让命中更多查询词的片段排在前面；再以 topology_id 列过滤到当前文档。
+    没有可检索的查询词时返回 None。
+    """
+    terms = sorted(retrieval_terms(query))
+    if not terms:
+        return None
+    return f"body : ({' OR '.join(_phrase(term) for term in terms)}) AND topology_id : {_phrase(topology_id)}"
+
+
+def _topology_filter(topology_id: str) -> str:
+    return f"topology_id : {_phrase(topology_id)}"
+
+
+def _token_count(body: str) -> int:
+    return len(_TOKEN_PATTERN.findall(body))
+
+
+def _delete_rows(db, topology_id: str):
+    db.execute(
+        "DELETE FROM document_chunks WHERE rowid IN (SELECT rowid FROM document_chunks WHERE document_chunks MATCH ?)",
+        (_topology_filter(topology_id),)
+    )
+
+
+def index_document(db, topology_id: str, text: str, max_tokens: int = SEARCH_CHUNK_TOKENS) -> int:
+    """
+    按句子边界把文档切成检索片段并写入全文索引（记录每个片段在原文中的偏移），
+    替换该拓扑图已有的索引，返回片段数。调用方负责事务提交。
+    """
+    _delete_rows(db, topology_id)
+    chunks = split_text_into_chunks(text or "", max_tokens) if text else []
+    bodies = [segment(chunk.text) for chunk in chunks]
+    db.executemany(
+        "INSERT INTO document_chunks (body, topology_id, chunk_index, start_offset, end_offset) VALUES (?, ?, ?, ?, ?)",
+        ((body, topology_id, chunk.index, chunk.start, chunk.end) for body, chunk in zip(bodies, chunks))
+    )
+    # 该拓扑图的片段数和总词元数，BM25 的 IDF 和平均长度只用本文档的统计
+    db.execute(
+        "INSERT OR REPLACE INTO document_index_stats (topology_id, chunk_count, token_count) VALUES (?, ?, ?)",
+        (topology_id, len(chunks), sum(_token_count(body) for body in bodies))
+    )
+    return len(chunks)
+
+
+def index_unindexed_documents(db) -> int:
+    """
+    为还没有全文索引（或缺少索引统计）的拓扑图原文补建索引（建立索引表或统计表之前上传的文档），
+    返回补建的文档数。调用方负责事务提交。
+    """
+    pending = [row[0] for row in db.execute(
+        """SELECT id FROM topologies WHERE content_hash IS NOT NULL
+           AND id NOT IN (SELECT topology_id FROM document_index_stats)"""
+    ).fetchall()]
+    for topology_id in pending:
+        document = open_document(db, topology_id)
+        index_document(db, topology_id, document.text if document else "")
+    return len(pending)
+
+
+def _render_highlight(snippet: str) -> str:
+    """去掉分词用的零宽空格，合并相邻的高亮区间，转义HTML后把高亮标记换成 <mark>"""
+    snippet = snippet.replace(_SEPARATOR, '').replace(_MARK_CLOSE + _MARK_OPEN, '')
+    return html.escape(snippet).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+
+def _term_pattern(term: str):
+    """查询词在片段原文（小写）中的匹配：英文/数字词按整词匹配，与分词结果一致"""
+    if term.isascii():
+        return re.compile(r'(?<![a-z0-9])' + re.escape(term) + r'(?![a-z0-9])')
+    return re.compile(re.escape(term))
+
+
+def _index_stats(db, topology_id: str):
+    """拓扑图索引的 (片段数, 平均词元数)；没有统计记录（旧索引）时按该拓扑图的片段现算"""
+    row = db.execute(
+        "SELECT chunk_count, token_count FROM document_index_stats WHERE topology_id = ?", (topology_id,)
+    ).fetchone()
+    if row is None:
+        bodies = [body for (body,) in db.execute(
+            "SELECT body FROM document_chunks WHERE document_chunks MATCH ?", (_topology_filter(topology_id),)
+        ).fetchall()]
+        row = (len(bodies), sum(_token_count(body) for body in bodies))
+    chunk_count, token_count = row
+    return chunk_count, (token_count / chunk_count if chunk_count else 0.0)
+
+
+def _rank_chunks(db, topology_id: str, query: str, limit: int):
+    """
+    FTS5 找出该拓扑图中包含任一查询词的片段，再按本拓扑图的统计计算 BM25：
+    文档频率取自这些候选片段（包含查询词的片段都在其中），片段数和平均长度取自索引统计。
+    返回按得分从高到低的 [(得分, rowid, chunk_index, start, end, 片段原文)]。
+    """
+    match = build_match_query(topology_id, query)
+    if match is None:
+        return None, []
+    rows = db.execute(
+        """SELECT rowid, chunk_index, start_offset, end_offset, body
+           FROM document_chunks WHERE document_chunks MATCH ?""",
+        (match,)
+    ).fetchall()
+    if not rows:
+        return match, []
+    chunk_count, average_length = _index_stats(db, topology_id)
+    patterns = [_term_pattern(term) for term in sorted(retrieval_terms(query))]
+    texts = [row[4].replace(_SEPARATOR, '') for row in rows]
+    frequencies = [[len(pattern.findall(text.lower())) for pattern in patterns] for text in texts]
+    document_frequency = [sum(1 for counts in frequencies if counts[i]) for i in range(len(patterns))]
+    chunk_count = max(chunk_count, len(rows))
+    idf = [math.log((chunk_count - df + 0.5) / (df + 0.5) + 1) for df in document_frequency]
+
+    ranked = []
+    for row, text, counts in zip(rows, texts, frequencies):
+        length_norm = 1 - BM25_B + BM25_B * (_token_count(row[4]) / average_length if average_length else 1)
+        score = sum(weight * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+                    for weight, tf in zip(idf, counts) if tf)
+        ranked.append((score, row[0], row[1], row[2], row[3], text))
+    ranked.sort(key=lambda item: (-item[0], item[2]))
+    return match, ranked[:limit]
+
+
+def search_document(db, topology_id: str, query: str, limit: int = 10) -> list:
+    """
+    在拓扑图的原文中检索与查询最相关的片段，按 BM25 得分从高到低返回
+    [{chunk_index, start, end, score, highlight}]，highlight 为带 <mark> 高亮的摘要。
+    """
+    match, ranked = _rank_chunks(db, topology_id, query, limit)
+    if not ranked:
+        return []
+    rowids = [item[1] for item in ranked]
+    snippets = dict(db.execute(
+        f"""SELECT rowid, snippet(document_chunks, 0, ?, ?, '…', ?)
+            FROM document_chunks WHERE document_chunks MATCH ? AND rowid IN ({', '.join('?' * len(rowids))})""",
+        (_MARK_OPEN, _MARK_CLOSE, SNIPPET_TOKENS, match, *rowids)
+    ).fetchall())
+    return [{
+        "chunk_index": chunk_index,
+        "start": start,
+        "end": end,
+        "score": round(score, 4),
+        "highlight": _render_highlight(snippets.get(rowid, ""))
+    } for score, rowid, chunk_index, start, end, _ in ranked]
+
+
+def retrieve_passages(db, topology_id: str, query: str, top_k: int = 8) -> list:
+    """按BM25得分从高到低返回与查询最相关的 top_k 个片段（Passage，text 为片段原文）"""
+    _, ranked = _rank_chunks(db, topology_id, query, top_k)
+    return [Passage(chunk_index, start, end, score, text) for score, _, chunk_index, start, end, text in ranked]
+
+
+def term_coverage(passages, query: str) -> float:
+    """
+    检索置信度：单个片段最多覆盖了多少比例的查询词（0~1）。
+    BM25 得分与文档长度和语料相关、不能跨文档比较，覆盖率用于判断文档中是否有相关内容。
+    """
+    terms = retrieval_terms(query)
+    if not terms or not passages:
+        return 0.0
+    return max(sum(1 for term in terms if term in passage.text.lower()) for passage in passages) / len(terms)
+
+
+def assemble_passages(passages, budget_tokens: int) -> str:
+    """
+    把片段压缩后按得分依次放入 budget_tokens 预算，再按原文顺序拼接，
+    不相邻的片段之间用分隔标记隔开。
+    """
+    chosen = []
+    used = 0
+    for passage in sorted(passages, key=lambda p: -p.score):
+        text = compact_text(passage.text)
+        cost = estimate_tokens(text)
+        if not text or used + cost > budget_tokens:
+            continue
+        chosen.append((passage, text))
+        used += cost
+    chosen.sort(key=lambda item: item[0].start)
+
+    parts = []
+    previous_end = None
+    for passage, text in chosen:
+        if previous_end is not None:
+            parts.append("\n" if passage.start <= previous_end else SPAN_SEPARATOR)
+        parts.append(text)
+        previous_end = passage.end
+    return "".join(parts)
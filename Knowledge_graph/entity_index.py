@@ -0,0 +1,133 @@
+import re
+import unicodedata
+
+_SPACES_PATTERN = re.compile(r'\s+')
+# 模型常在名称前加的列表序号，如 "1. "、"2、"、"(3) "
+_ENUMERATION_PATTERN = re.compile(r'^(?:\(?\d{1,3}[.)]\s+|\d{1,3}、\s*)')
+# 名称首部可去除的符号：引号、书名号、项目符号
+_LEADING_STRIP = '"\'“”‘’《「『【<•·*-—~ '
+# 名称尾部可去除的符号：句末标点、引号、书名号（保留右括号用于别名识别）
+_TRAILING_STRIP = '。，、；：！？.,;:!?"\'“”‘’》」』】>~ '
+# "中文名(English Name)" 或 "English Name(中文名)" 形式的中英文别名
+_ALIAS_PATTERN = re.compile(r'^(.+?)\s*\(\s*([^()]+?)\s*\)$')
+_CJK_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+_LATIN_PATTERN = re.compile(r'[A-Za-z]')
+_ENGLISH_WORD_PATTERN = re.compile(r'[a-z]+')
+# 中文与英文/数字之间的空白（"机器 学习"、"Python 编程" 视为同一写法）
+_CJK_GAP_PATTERN = re.compile(r'(?<=[\u3400-\u9fff]) (?=\S)|(?<=\S) (?=[\u3400-\u9fff])')
+
+
+def normalize_label(label) -> str:
+    """
+    名称的显示形式：NFKC归一（全角字母数字和标点转半角），合并空白，
+    去除列表序号和首尾多余的标点、引号、书名号。
+    """
+    if label is None:
+        return ""
+    text = unicodedata.normalize('NFKC', str(label))
+    text = _SPACES_PATTERN.sub(' ', text).strip()
+    text = _ENUMERATION_PATTERN.sub('', text)
+    return text.lstrip(_LEADING_STRIP).rstrip(_TRAILING_STRIP)
+
+
+# 以 s 结尾但不是复数（或单复数同形）的常见词，不做单数化
+_INVARIANT_WORDS = frozenset({
+    'news', 'series', 'species', 'means', 'lens', 'chaos', 'atlas', 'alias', 'canvas', 'bias', 'gas',
+    'ethos', 'pathos', 'logos', 'cosmos', 'kudos', 'pancreas', 'diabetes', 'measles', 'rabies',
+    'headquarters', 'whereas', 'always', 'perhaps', 'towards', 'afterwards', 'besides', 'sometimes',
+    'yes', 'this', 'thus', 'its', 'his', 'has', 'was', 'does', 'goes', 'plus', 'corps', 'aids',
+})
+# 单数以 ie 结尾的名词：复数只去掉 s，不按 -ies -> -y 处理
+_IE_PLURALS = frozenset({
+    'movies', 'cookies', 'calories', 'zombies', 'rookies', 'brownies', 'selfies', 'smoothies',
+    'prairies', 'pies', 'ties', 'lies', 'dies', 'genies', 'hippies', 'newbies',
+})
+# 单数以 che 结尾的名词：复数只去掉 s
+_CHE_PLURALS = frozenset({'caches', 'niches', 'aches', 'headaches', 'avalanches', 'moustaches', 'mustaches', 'cliches'})
+
+
+def _singular(word: str) -> str:
+    """
+    英文单词的单数化，只处理明确的复数词尾：-ies -> -y，-sses/-ches/-shes/-xes 去掉 es，其余去掉 s。
+    -ics 学科名（physics、mathematics）、-ss/-us/-is 结尾的词和单复数同形或本身以 s 结尾的常见词保持不变；
+    宁可漏并，不可误并（误并会写入别名表，重新生成后依然存在）。
+    """
+    if len(word) <= 3 or word in _INVARIANT_WORDS or word.endswith(('ss', 'us', 'is', 'ics')):
+        return word
+    if word.endswith('ies'):
+        return word[:-1] if word in _IE_PLURALS else word[:-3] + 'y'
+    if word.endswith(('sses', 'ches', 'shes', 'xes')):
+        return word[:-1] if word in _CHE_PLURALS else word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def canonical_key(label) -> str:
+    """归并用的键：显示形式转小写，去除中文两侧的空白，英文单词单数化"""
+    text = normalize_label(label).lower()
+    text = _CJK_GAP_PATTERN.sub('', text)
+    return _ENGLISH_WORD_PATTERN.sub(lambda m: _singular(m.group()), text)
+
+
+def split_alias(label: str):
+    """
+    识别 "中文名(English)" / "English(中文名)" 形式的中英文别名，返回 (主名称, 别名)，否则返回 (label, None)。
+    括号内外同为中文或同为英文时视为限定说明（如 "栈(数据结构)"），不拆分。
+    """
+    match = _ALIAS_PATTERN.match(label)
+    if not match:
+        return label, None
+    outer, inner = match.group(1).strip(), match.group(2).strip()
+    outer_cjk, inner_cjk = bool(_CJK_PATTERN.search(outer)), bool(_CJK_PATTERN.search(inner))
+    if outer_cjk == inner_cjk or not _LATIN_PATTERN.search(inner if outer_cjk else outer):
+        return label, None
+    return outer, inner
+
+
+class EntityIndex:
+    """
+    拓扑图的实体别名索引：归并键 -> 规范名称（即节点ID）。
+    同一概念的不同写法（全角/半角、首尾标点、中英文别名、英文单复数）解析为同一个节点；
+    已有的别名优先，因此持久化后重新生成图谱时同一概念仍解析为原来的节点ID。
+    """
+
+    def __init__(self, aliases=None):
+        self.aliases = dict(aliases or {})
+        self.added = {}  # 本次新增的别名，用于写回数据库
+
+    def _remember(self, key: str, canonical: str):
+        if key and key not in self.aliases:
+            self.aliases[key] = canonical
+            self.added[key] = canonical
+
+    def seed(self, labels):
+        """用已有节点ID初始化索引（兼容没有别名记录的旧拓扑图），已有别名不被覆盖"""
+        for label in labels:
+            self._remember(canonical_key(label), label)
+
+    def resolve(self, label) -> str:
+        """返回名称对应的规范名称，名称为空时返回空字符串"""
+        display = normalize_label(label)
+        if not display:
+            return ""
+        main, alias = split_alias(display)
+        keys = [canonical_key(display), canonical_key(main)]
+        if alias:
+            keys.append(canonical_key(alias))
+        canonical = next((self.aliases[key] for key in keys if key in self.aliases), main)
+        for key in keys:
+            self._remember(key, canonical)
+        return canonical
+
+    def canonicalize(self, knowledge_edges) -> list:
+        """把三元组中的名称替换为规范名称，丢弃合并后出现的自环，同一对 (父, 子) 只保留最先出现的关系"""
+        merged = []
+        seen_pairs = set()
+        for src, rel, tgt in knowledge_edges:
+            src, tgt = self.resolve(src), self.resolve(tgt)
+            if not src or not tgt or src == tgt or (src, tgt) in seen_pairs:
+                continue
+            seen_pairs.add((src, tgt))
+            merged.append([src, rel, tgt])
+        return merged
@@ -0,0 +1,87 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+
+def _normalize_label(value) -> str:
+    """规整知识点名称：转为字符串并去除首尾空白"""
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def merge_knowledge_edges(partial_results, max_nodes: int = 0) -> list:
+    """
+    合并各文本块提取出的三元组并去重。
+    同一对 (父, 子) 只保留最先出现的关系；忽略空名称和自环。
+    若设置了 max_nodes，则按知识点在各块中出现的频次保留前 max_nodes 个节点。
+    """
+    merged = []
+    seen_pairs = set()
+    node_frequency = Counter()
+    first_seen = {}
+
+    for edges in partial_results:
+        for item in edges or []:
+            if not (isinstance(item, (list, tuple)) and len(item) == 3):
+                continue
+            src, rel, tgt = (_normalize_label(v) for v in item)
+            if not src or not tgt or src == tgt:
+                continue
+            node_frequency[src] += 1
+            node_frequency[tgt] += 1
+            for label in (src, tgt):
+                first_seen.setdefault(label, len(first_seen))
+            if (src, tgt) in seen_pairs:
+                continue
+            seen_pairs.add((src, tgt))
+            merged.append([src, rel or "包含", tgt])
+
+    if max_nodes > 0 and len(first_seen) > max_nodes:
+        ranked = sorted(first_seen, key=lambda label: (-node_frequency[label], first_seen[label]))
+        kept = set(ranked[:max_nodes])
+        merged = [edge for edge in merged if edge[0] in kept and edge[2] in kept]
+        logger.info(f"节点数超过限制，按出现频次保留前{max_nodes}个节点")
+
+    return merged
+
+
+def map_reduce_extract(chunks, extract_chunk, max_workers: int = 4, max_nodes: int = 0,
+                       progress_callback=None) -> list:
+    """
+    对文本块并发执行知识提取（map），再合并去重（reduce）。
+    extract_chunk(chunk) 返回该块的三元组列表；
+    progress_callback(done, total) 在每个块完成（成功或失败）后调用。
+    部分块失败时跳过该块，全部失败时抛出最后一个异常。
+    """
+    total = len(chunks)
+    if total == 0:
+        return []
+
+    partial_results = [None] * total
+    failures = []
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as executor:
+        futures = {executor.submit(extract_chunk, chunk): idx for idx, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                partial_results[idx] = future.result()
+                logger.info(f"文本块 {idx + 1}/{total} 提取完成，三元组 {len(partial_results[idx])} 条")
+            except Exception as e:
+                failures.append(e)
+                logger.error(f"文本块 {idx + 1}/{total} 提取失败: {str(e)}")
+            done += 1
+            if progress_callback:
+                progress_callback(done, total)
+
+    if len(failures) == total:
+        raise failures[-1]
+    if failures:
+        logger.warning(f"{len(failures)}/{total} 个文本块提取失败，已跳过")
+
+    # 按块顺序合并，保证结果与文档顺序一致
+    return merge_knowledge_edges(partial_results, max_nodes)
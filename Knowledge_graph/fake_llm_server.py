@@ -0,0 +1,266 @@
+"""
+本地DeepSeek替身服务：兼容OpenAI chat-completions接口的确定性假服务器，
+用于在没有API密钥、不受服务商延迟影响的情况下做性能测试和压测。
+
+针对 app.py 中的各类提示词（知识提取、出题、评估、资源推荐、文档问答、网络问答）
+返回格式正确、由提示词内容确定的回复；延迟、错误率和流式输出节奏均可配置。
+
+用法:
+    python fake_llm_server.py --port 8765 --latency-ms 500 --error-rate 0.05
+    FLASK_CONFIG=benchmark python app.py      # 或设置 LLM_BASE_URL=http://127.0.0.1:8765
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+
+from flask import Flask, Response, jsonify, request
+
+from config import Config
+from chunking import estimate_tokens
+
+_TERM_PATTERN = re.compile(r'[\u4e00-\u9fff]{2,8}|[A-Za-z][A-Za-z\-]{3,}')
+_SENTENCE_PATTERN = re.compile(r'[^。！？!?；;\n]+[。！？!?；;]?')
+_WORD_PATTERN = re.compile(r'\w')
+_NODE_LIMIT_PATTERN = re.compile(r'不超过(\d+)个')
+
+
+def prompt_seed(messages) -> int:
+    """由提示词计算确定性随机种子"""
+    material = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+    return int(hashlib.sha256(material.encode('utf-8')).hexdigest()[:16], 16)
+
+
+def _terms(text: str, limit: int) -> list:
+    """按出现顺序取文本中不重复的候选知识点"""
+    terms = []
+    seen = set()
+    for match in _TERM_PATTERN.finditer(text):
+        term = match.group()
+        if term not in seen:
+            seen.add(term)
+            terms.append(term)
+            if len(terms) >= limit:
+                break
+    return terms
+
+
+def _after(text: str, marker: str) -> str:
+    index = text.find(marker)
+    return text[index + len(marker):] if index != -1 else text
+
+
+def fake_extract_knowledge(system: str, user: str) -> str:
+    """知识提取：以首个候选词为根，按每个父节点3个子节点构建树形三元组"""
+    match = _NODE_LIMIT_PATTERN.search(system)
+    limit = int(match.group(1)) if match else 30
+    terms = _terms(_after(user, "：\n"), max(2, limit))
+    edges = [[terms[(i - 1) // 3], "包含", terms[i]] for i in range(1, len(terms))]
+    return json.dumps(edges, ensure_ascii=False)
+
+
+def fake_generate_question(system: str, user: str) -> str:
+    match = re.search(r'测试用户对"(.+?)"的理解', system)
+    topic = match.group(1) if match else "该知识点"
+    return f"请结合原文说明“{topic}”的含义及其主要特点。"
+
+
+def fake_evaluate_answer(system: str, user: str, rng: random.Random) -> str:
+    answer = _after(user, "回答: ").split("\n", 1)[0]
+    correct = len(answer.strip()) >= 4 and rng.random() < 0.7
+    return json.dumps({
+        "correct": correct,
+        "feedback": "回答抓住了要点。" if correct else "回答不完整，请参考原文片段补充关键概念。",
+        "next_question": None
+    }, ensure_ascii=False)
+
+
+def fake_recommend_resources(user: str) -> str:
+    topic = "".join(_terms(user, 1)) or "学习"
+    return json.dumps([{
+        "title": f"{topic}入门教程（{i + 1}）",
+        "url": f"https://example.com/{hashlib.md5((topic + str(i)).encode('utf-8')).hexdigest()[:8]}",
+        "snippet": f"系统介绍{topic}的相关概念与实例。"
+    } for i in range(5)], ensure_ascii=False)
+
+
+def fake_doc_answer(user: str) -> str:
+    """
+    文档问答：提示词中只有本地检索出的相关片段（覆盖率不足时应用直接走网络回答，不会发来文档问答），
+    返回与问题共享候选词最多的片段句子，都不共享时返回第一句；没有片段时返回空回复。
+    """
+    document = _after(user, "文档片段：").split("\n用户问题：", 1)[0]
+    question = _after(user, "\n用户问题：").split("\n", 1)[0]
+    keywords = set(_terms(question, 20)) | {question[i:i + 2] for i in range(len(question) - 1)}
+    sentences = [sentence.strip() for sentence in _SENTENCE_PATTERN.findall(document) if _WORD_PATTERN.search(sentence)]
+    best, best_score = (sentences[0] if sentences else ""), 0
+    for sentence in sentences:
+        score = sum(1 for keyword in keywords if keyword in sentence)
+        if score > best_score:
+            best, best_score = sentence, score
+    return best
+
+
+def fake_web_answer(user: str) -> str:
+    topic = "、".join(_terms(user, 3)) or "这个问题"
+    return f"关于{topic}：这是本地替身服务生成的示例回答，用于性能测试。\n\n- 要点一\n- 要点二"
+
+
+def fake_reply(messages, rng: random.Random) -> str:
+    """根据系统提示词识别调用点并生成对应格式的回复"""
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    if "知识图谱构建专家" in system:
+        return fake_extract_knowledge(system, user)
+    if "教育专家" in system:
+        return fake_generate_question(system, user)
+    if "知识评估专家" in system:
+        return fake_evaluate_answer(system, user, rng)
+    if "学习资源推荐专家" in system:
+        return fake_recommend_resources(user)
+    if "文档检索助手" in system:
+        return fake_doc_answer(user)
+    return fake_web_answer(user)
+
+
+def truncate_to_tokens(text: str, max_tokens: int):
+    """按 max_tokens 截断回复，返回 (文本, finish_reason)"""
+    if not max_tokens or estimate_tokens(text) <= max_tokens:
+        return text, "stop"
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low], "length"
+
+
+def create_fake_llm_app(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                        stream_chunk_chars: int = 8, stream_chunk_delay_ms: float = 0,
+                        seed: int = 0) -> Flask:
+    """创建假服务器应用；错误注入与延迟抖动使用固定种子，回复内容只由提示词决定"""
+    fake_app = Flask("fake_llm_server")
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    stats = {"requests": 0, "errors": 0, "streams": 0}
+
+    def completion_id(messages):
+        return "chatcmpl-" + hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode('utf-8')).hexdigest()[:24]
+
+    @fake_app.route('/models', methods=['GET'])
+    @fake_app.route('/v1/models', methods=['GET'])
+    def list_models():
+        return jsonify({"object": "list", "data": [{"id": Config.LLM_MODEL, "object": "model", "owned_by": "fake"}]})
+
+    @fake_app.route('/stats', methods=['GET'])
+    def get_stats():
+        return jsonify(stats)
+
+    @fake_app.route('/chat/completions', methods=['POST'])
+    @fake_app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        body = request.get_json(force=True)
+        messages = body.get("messages", [])
+        model = body.get("model", Config.LLM_MODEL)
+        with rng_lock:
+            stats["requests"] += 1
+            delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+            error_roll = rng.random()
+            error_kind = rng.random()
+        time.sleep(delay)
+
+        if error_roll < error_rate:
+            with rng_lock:
+                stats["errors"] += 1
+            if error_kind < 0.5:
+                response = jsonify({"error": {"message": "Rate limit reached (fake)", "type": "rate_limit_error"}})
+                response.status_code = 429
+                response.headers["Retry-After"] = "1"
+                return response
+            response = jsonify({"error": {"message": "Service unavailable (fake)", "type": "server_error"}})
+            response.status_code = 503
+            return response
+
+        content, finish_reason = truncate_to_tokens(
+            fake_reply(messages, random.Random(prompt_seed(messages))), body.get("max_tokens")
+        )
+        created = int(time.time())
+        cid = completion_id(messages)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+
+        if not body.get("stream"):
+            return jsonify({
+                "id": cid,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": estimate_tokens(content),
+                    "total_tokens": prompt_tokens + estimate_tokens(content)
+                }
+            })
+
+        with rng_lock:
+            stats["streams"] += 1
+
+        def chunk(delta, finish=None):
+            return "data: " + json.dumps({
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]
+            }, ensure_ascii=False) + "\n\n"
+
+        def generate():
+            yield chunk({"role": "assistant", "content": ""})
+            for start in range(0, len(content), stream_chunk_chars):
+                if stream_chunk_delay_ms:
+                    time.sleep(stream_chunk_delay_ms / 1000)
+                yield chunk({"content": content[start:start + stream_chunk_chars]})
+            yield chunk({}, finish_reason)
+            yield "data: [DONE]\n\n"
+
+        return Response(generate(), mimetype='text/event-stream')
+
+    return fake_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地DeepSeek替身服务（OpenAI兼容接口）")
+    parser.add_argument("--host", default=Config.FAKE_LLM_HOST)
+    parser.add_argument("--port", type=int, default=Config.FAKE_LLM_PORT)
+    parser.add_argument("--latency-ms", type=float, default=Config.FAKE_LLM_LATENCY_MS, help="每次请求的基础延迟")
+    parser.add_argument("--jitter-ms", type=float, default=Config.FAKE_LLM_JITTER_MS, help="延迟随机抖动幅度")
+    parser.add_argument("--error-rate", type=float, default=Config.FAKE_LLM_ERROR_RATE, help="返回429/503错误的概率")
+    parser.add_argument("--stream-chunk-chars", type=int, default=Config.FAKE_LLM_STREAM_CHUNK_CHARS,
+                        help="流式输出每块的字符数")
+    parser.add_argument("--stream-chunk-delay-ms", type=float, default=Config.FAKE_LLM_STREAM_CHUNK_DELAY_MS,
+                        help="流式输出每块之间的间隔")
+    parser.add_argument("--seed", type=int, default=0, help="延迟抖动与错误注入的随机种子")
+    args = parser.parse_args()
+
+    fake_app = create_fake_llm_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        stream_chunk_chars=args.stream_chunk_chars,
+        stream_chunk_delay_ms=args.stream_chunk_delay_ms,
+        seed=args.seed
+    )
+    fake_app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
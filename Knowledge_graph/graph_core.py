@@ -0,0 +1,144 @@
+from collections import deque
+
+
+def strongly_connected_components(children) -> list:
+    """迭代版Tarjan算法，children[u] 为节点 u 的子节点编号列表，返回每个节点所属的强连通分量编号"""
+    n = len(children)
+    order = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    component = [-1] * n
+    stack = []
+    counter = 0
+    component_count = 0
+    for start in range(n):
+        if order[start] != -1:
+            continue
+        work = [(start, 0)]
+        order[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack[start] = True
+        while work:
+            node, child_pos = work[-1]
+            node_children = children[node]
+            if child_pos < len(node_children):
+                work[-1] = (node, child_pos + 1)
+                child = node_children[child_pos]
+                if order[child] == -1:
+                    order[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, 0))
+                elif on_stack[child]:
+                    low[node] = min(low[node], order[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == order[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component[member] = component_count
+                    if member == node:
+                        break
+                component_count += 1
+    return component
+
+
+def source_component_roots(children) -> list:
+    """每个没有外部入边的强连通分量中编号最小的节点（入度为0的节点自成一个分量），按编号排序"""
+    component = strongly_connected_components(children)
+    has_external_parent = set()
+    for u, node_children in enumerate(children):
+        for v in node_children:
+            if component[u] != component[v]:
+                has_external_parent.add(component[v])
+    roots = []
+    seen_components = set()
+    for node, comp in enumerate(component):
+        if comp in has_external_parent or comp in seen_components:
+            continue
+        seen_components.add(comp)
+        roots.append(node)
+    return roots
+
+
+class GraphIndex:
+    """
+    知识图的邻接索引：节点按首次出现顺序编号，维护出边/入边邻接表和入度/出度。
+    层级计算为 O(N+E) 的迭代BFS，支持多个根节点和环。
+    """
+
+    def __init__(self):
+        self.labels = []        # 节点编号 -> 名称
+        self.index = {}         # 名称 -> 节点编号
+        self.children = []      # 出边邻接表
+        self.in_degree = []
+        self.out_degree = []
+        self.edges = []         # (父编号, 子编号, 关系)
+
+    @classmethod
+    def from_triples(cls, triples):
+        graph = cls()
+        for src, rel, tgt in triples:
+            graph.add_edge(src, rel, tgt)
+        return graph
+
+    def add_node(self, label) -> int:
+        node = self.index.get(label)
+        if node is None:
+            node = self.index[label] = len(self.labels)
+            self.labels.append(label)
+            self.children.append([])
+            self.in_degree.append(0)
+            self.out_degree.append(0)
+        return node
+
+    def add_edge(self, src, rel, tgt):
+        u = self.add_node(src)
+        v = self.add_node(tgt)
+        self.children[u].append(v)
+        self.out_degree[u] += 1
+        self.in_degree[v] += 1
+        self.edges.append((u, v, rel))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def degree(self, label) -> int:
+        node = self.index[label]
+        return self.in_degree[node] + self.out_degree[node]
+
+    def roots(self) -> list:
+        """
+        层级计算的起点（节点编号，按首次出现顺序）：所有入度为0的节点，
+        以及每个没有外部入边的环（强连通分量）中最先出现的节点。
+        """
+        return source_component_roots(self.children)
+
+    def levels(self) -> list:
+        """从所有根节点出发的多源BFS，返回每个节点的层级（到最近根节点的距离）"""
+        levels = [-1] * len(self.labels)
+        queue = deque()
+        for root in self.roots():
+            levels[root] = 0
+            queue.append(root)
+        while queue:
+            node = queue.popleft()
+            next_level = levels[node] + 1
+            for child in self.children[node]:
+                if levels[child] == -1:
+                    levels[child] = next_level
+                    queue.append(child)
+        return levels
+
+    def root_label(self):
+        """主根节点：最先出现的入度为0的节点，全部节点都在环中时取最先出现的节点"""
+        for node, degree in enumerate(self.in_degree):
+            if degree == 0:
+                return self.labels[node]
+        return self.labels[0] if self.labels else None
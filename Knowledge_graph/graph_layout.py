@@ -0,0 +1,60 @@
+import numpy as np
+
+# 与前端原 vis.js 层级布局一致的间距
+NODE_SPACING = 150
+LEVEL_SEPARATION = 200
+
+
+def spanning_parents(graph) -> np.ndarray:
+    """布局用的生成树：每个节点的父节点为第一条来自上一层的入边的起点，根节点为 -1"""
+    level = graph.level
+    parents = np.full(len(graph.labels), -1, dtype=np.int64)
+    tree_edges = np.flatnonzero(level[graph.dst] == level[graph.src] + 1)
+    children, first = np.unique(graph.dst[tree_edges], return_index=True)
+    parents[children] = graph.src[tree_edges[first]]
+    return parents
+
+
+def hierarchical_layout(graph, node_spacing: float = NODE_SPACING, level_separation: float = LEVEL_SEPARATION):
+    """
+    自上而下的层级布局，返回 (x, y) 两个数组。
+    y 由节点层级决定；x 按生成树的子树宽度（叶子数）分配区间，父节点居中于其子树之上，
+    多棵树按根节点编号从左到右排列，整体水平居中。每层的计算均为向量化操作。
+    """
+    n = len(graph.labels)
+    if not n:
+        return np.zeros(0), np.zeros(0)
+    level = graph.level.astype(np.int64)
+    parents = spanning_parents(graph)
+    max_level = int(level.max())
+    by_level = [np.flatnonzero(level == depth) for depth in range(max_level + 1)]
+
+    # 自底向上：子树宽度 = 子节点宽度之和，叶子宽度为1
+    width = np.ones(n)
+    child_sum = np.zeros(n)
+    for depth in range(max_level, -1, -1):
+        nodes = by_level[depth]
+        width[nodes] = np.where(child_sum[nodes] > 0, child_sum[nodes], 1)
+        if depth:
+            np.add.at(child_sum, parents[nodes], width[nodes])
+
+    # 自顶向下：兄弟节点按编号依次占用父节点区间，区间左端 = 父节点左端 + 前面兄弟的宽度之和
+    left = np.zeros(n)
+    roots = by_level[0]
+    left[roots] = np.cumsum(width[roots]) - width[roots]
+    for depth in range(1, max_level + 1):
+        nodes = by_level[depth]
+        if not nodes.size:
+            continue
+        nodes = nodes[np.lexsort((nodes, parents[nodes]))]
+        node_parents = parents[nodes]
+        cumulative = np.cumsum(width[nodes])
+        group_start = np.r_[True, node_parents[1:] != node_parents[:-1]]
+        preceding = cumulative - width[nodes]
+        preceding -= np.maximum.accumulate(np.where(group_start, preceding, 0))
+        left[nodes] = left[node_parents] + preceding
+
+    total_width = width[roots].sum()
+    x = (left + width / 2 - total_width / 2) * node_spacing
+    y = level * float(level_separation)
+    return x, y
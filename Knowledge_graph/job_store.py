@@ -0,0 +1,167 @@
+import time
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+PROCESSING = "processing"
+COMPLETED = "completed"
+ERROR = "error"
+
+# 可由调用方写入的列
+_JOB_FIELDS = ("status", "progress", "message", "user_id", "max_nodes", "node_count", "edge_count",
+               "text_length", "processing_time", "result_id", "created_at", "started_at", "finished_at")
+
+
+def _check_fields(fields):
+    unknown = set(fields) - set(_JOB_FIELDS)
+    if unknown:
+        raise ValueError(f"未知的任务字段: {', '.join(sorted(unknown))}")
+
+
+def _upsert_sql(columns) -> str:
+    """只写入给定列的 upsert：任务不存在时插入，存在时只更新这些列"""
+    column_list = ", ".join(("topology_id",) + columns)
+    values = ", ".join(f":{column}" for column in ("topology_id",) + columns)
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns)
+    return (f"INSERT INTO topology_jobs ({column_list}) VALUES ({values}) "
+            f"ON CONFLICT (topology_id) DO UPDATE SET {updates}")
+
+
+class JobStore:
+    """
+    文档处理任务的持久化状态（SQLite topology_jobs 表，由迁移创建）：状态、进度、消息、计时和结果引用
+    （result_id 指向 topologies.id），各 worker 进程共享，轮询落在任何进程上都能查到任务。
+    每次写入是一条按列生成的 upsert 短事务；读取经过进程内的有界缓存（LRU，条目 cache_ttl 秒后重新读库，
+    本进程写入时立即失效），轮询频繁时大多不访问数据库。
+    结束超过 retention 秒的任务被自动删除（结果仍在 topologies 表中）；
+    超过 stale_after 秒没有更新的处理中任务（进程退出或重启）被标记为出错。
+    渐进式的部分图谱只存在于执行任务的进程内，其他进程返回任务表中的节点/边数。
+    """
+
+    def __init__(self, retention: int = 24 * 3600, stale_after: int = 1800, cache_size: int = 1024,
+                 cache_ttl: float = 2.0, purge_interval: int = 600):
+        self.retention = retention
+        self.stale_after = stale_after
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # 拓扑ID -> (过期时刻, 任务字典)
+        self._partials = {}  # 拓扑ID -> 本进程正在构建的部分图谱
+        self._last_purge = 0.0
+        self._stats = defaultdict(int)
+
+    def _written(self, topology_id):
+        """本进程写入后缓存的任务立即失效"""
+        with self._lock:
+            self._cache.pop(topology_id, None)
+            self._stats["writes"] += 1
+
+    def _write(self, db, topology_id: str, fields: dict, now: float):
+        _check_fields(fields)
+        columns = tuple(column for column in _JOB_FIELDS if column in fields) + ("updated_at",)
+        with db:
+            db.execute(_upsert_sql(columns), dict(fields, topology_id=topology_id, updated_at=now))
+        self._written(topology_id)
+
+    def start(self, db, topology_id: str, message: str, max_nodes: int = 0, user_id=None):
+        """登记新任务（同一拓扑ID的旧任务被重置），并按间隔顺带清理过期任务"""
+        now = time.time()
+        self._write(db, topology_id, {
+            "status": PROCESSING, "progress": 0, "message": message, "user_id": user_id, "max_nodes": max_nodes,
+            "node_count": 0, "edge_count": 0, "text_length": 0, "processing_time": 0, "result_id": None,
+            "created_at": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+            "started_at": now, "finished_at": None
+        }, now)
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            self.purge(db, now)
+
+    def update(self, db, topology_id: str, **fields):
+        """更新已存在任务的进度等字段，任务不存在时不写入"""
+        if not fields:
+            return
+        _check_fields(fields)
+        assignments = ", ".join(f"{column} = :{column}" for column in fields)
+        with db:
+            db.execute(
+                f"UPDATE topology_jobs SET {assignments}, updated_at = :updated_at WHERE topology_id = :topology_id",
+                dict(fields, topology_id=topology_id, updated_at=time.time())
+            )
+        self._written(topology_id)
+
+    def finish(self, db, topology_id: str, status: str, message: str, **fields):
+        """任务结束（completed 或 error）：记录结束时间和耗时，释放本进程的部分图谱"""
+        now = time.time()
+        fields = dict(fields, status=status, message=message, finished_at=now)
+        if status == COMPLETED:
+            fields.setdefault("progress", 100)
+            fields.setdefault("result_id", topology_id)
+        if "processing_time" not in fields:
+            row = db.execute("SELECT started_at FROM topology_jobs WHERE topology_id = ?", (topology_id,)).fetchone()
+            if row is not None and row[0] is not None:
+                fields["processing_time"] = round(now - row[0], 2)
+        self._write(db, topology_id, fields, now)
+        with self._lock:
+            self._partials.pop(topology_id, None)
+
+    def get(self, db, topology_id: str):
+        """读取任务（字典），不存在时返回 None；缓存未过期时不访问数据库"""
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(topology_id)
+            if cached is not None and cached[0] > now:
+                self._cache.move_to_end(topology_id)
+                self._stats["cache_hits"] += 1
+                return dict(cached[1])
+            self._stats["cache_misses"] += 1
+        cursor = db.execute("SELECT * FROM topology_jobs WHERE topology_id = ?", (topology_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip((column[0] for column in cursor.description), row))
+        with self._lock:
+            self._cache[topology_id] = (now + self.cache_ttl, job)
+            self._cache.move_to_end(topology_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(job)
+
+    def purge(self, db, now: float = None) -> int:
+        """删除结束超过保留期的任务，把长时间没有进度的处理中任务标记为出错，返回删除数"""
+        now = time.time() if now is None else now
+        with db:
+            stale = db.execute(
+                """UPDATE topology_jobs SET status = ?, message = ?, finished_at = ?, updated_at = ?
+                   WHERE status = ? AND updated_at < ?""",
+                (ERROR, "处理中断（服务进程已退出），请重新上传", now, now, PROCESSING, now - self.stale_after)
+            ).rowcount
+            deleted = db.execute(
+                "DELETE FROM topology_jobs WHERE finished_at < ?", (now - self.retention,)
+            ).rowcount
+        with self._lock:
+            if stale or deleted:
+                self._cache.clear()
+            self._stats["purged"] += deleted
+            self._stats["interrupted"] += stale
+        if stale or deleted:
+            logger.info(f"清理处理任务: 删除过期任务 {deleted} 个，标记中断任务 {stale} 个")
+        return deleted
+
+    def attach_partial(self, topology_id: str, graph):
+        with self._lock:
+            self._partials[topology_id] = graph
+
+    def partial_graph(self, topology_id: str):
+        """本进程中该任务正在构建的部分图谱，任务不在本进程执行时返回 None"""
+        with self._lock:
+            return self._partials.get(topology_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached"] = len(self._cache)
+            stats["running_here"] = len(self._partials)
+        return stats
@@ -0,0 +1,137 @@
+import re
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+
+def normalize_prompt(messages) -> str:
+    """规范化提示词：合并连续空白并去除首尾空白，使格式差异不影响缓存命中"""
+    normalized = []
+    for message in messages:
+        content = re.sub(r'\s+', ' ', str(message.get("content", ""))).strip()
+        normalized.append({"role": message.get("role", ""), "content": content})
+    return json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+
+
+def make_cache_key(model: str, messages, **params) -> str:
+    """由模型名、规范化提示词和生成参数计算缓存键"""
+    material = json.dumps(
+        {"model": model, "prompt": normalize_prompt(messages), "params": params},
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    基于SQLite的LLM响应持久化缓存。
+    支持TTL过期和按条目数的LRU淘汰，并按调用点统计命中/未命中次数。
+    """
+
+    def __init__(self, path: str, ttl: int = 7 * 24 * 3600, max_entries: int = 5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "stores": 0})
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                call_site TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                hit_count INTEGER DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache (last_accessed)")
+        self._conn.commit()
+
+    def get(self, key: str, call_site: str = "default"):
+        """读取缓存，未命中或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats[call_site]["misses"] += 1
+                return None
+            response, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                self._stats[call_site]["misses"] += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_accessed = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                (now, key)
+            )
+            self._conn.commit()
+            self._stats[call_site]["hits"] += 1
+            return response
+
+    def set(self, key: str, model: str, response: str, call_site: str = "default"):
+        """写入缓存，超过容量时淘汰最久未访问的条目"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO llm_cache
+                (cache_key, model, call_site, response, created_at, last_accessed, hit_count)
+                VALUES (?, ?, ?, ?, ?, ?, 0)""",
+                (key, model, call_site, response, now, now)
+            )
+            self._stats[call_site]["stores"] += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """删除过期条目，并按LRU将条目数控制在 max_entries 以内（调用方需持有锁）"""
+        if self.ttl:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        if self.max_entries:
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    """DELETE FROM llm_cache WHERE cache_key IN (
+                        SELECT cache_key FROM llm_cache ORDER BY last_accessed ASC LIMIT ?
+                    )""",
+                    (overflow,)
+                )
+                logger.info(f"LLM缓存淘汰{overflow}条最久未访问的记录")
+
+    def delete(self, key: str):
+        """删除指定缓存条目"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """返回各调用点及总体的命中统计"""
+        with self._lock:
+            sites = {site: dict(counts) for site, counts in self._stats.items()}
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        hits = sum(counts["hits"] for counts in sites.values())
+        misses = sum(counts["misses"] for counts in sites.values())
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0,
+            "call_sites": sites
+        }
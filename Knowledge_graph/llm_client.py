@@ -0,0 +1,90 @@
+import time
+import logging
+import threading
+
+import httpx
+from openai import OpenAI
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+
+class OpenAIClientManager:
+    """
+    进程级共享的OpenAI客户端管理器。
+    所有LLM调用复用同一个客户端及其HTTP连接池（keep-alive），避免每次调用重新建立TLS连接。
+    """
+
+    def __init__(self, api_key: str, base_url: str, max_connections: int = 20,
+                 max_keepalive_connections: int = 10, keepalive_expiry: float = 60,
+                 connect_timeout: float = 10, read_timeout: float = 120, max_retries: int = 2):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self._client = None
+        self._http_client = None
+        self._lock = threading.Lock()
+        self._created_at = None
+
+    def get_client(self) -> OpenAI:
+        """获取共享客户端，首次调用时创建（线程安全）"""
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None:
+                self._http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                        keepalive_expiry=self.keepalive_expiry
+                    ),
+                    timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+                )
+                self._client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=self._http_client,
+                    max_retries=self.max_retries
+                )
+                self._created_at = time.time()
+                logger.info(f"已创建共享OpenAI客户端: {self.base_url}, 连接池上限: {self.max_connections}")
+            return self._client
+
+    def close(self):
+        """关闭客户端并释放连接池，下次调用 get_client 时重新创建"""
+        with self._lock:
+            if self._http_client is not None:
+                try:
+                    self._http_client.close()
+                except Exception as e:
+                    logger.warning(f"关闭HTTP连接池出错: {str(e)}")
+            self._client = None
+            self._http_client = None
+            self._created_at = None
+
+    def reset(self):
+        """重建客户端（例如连接池状态异常时）"""
+        self.close()
+        return self.get_client()
+
+    def health_check(self) -> dict:
+        """检查与LLM服务的连通性，返回状态和耗时"""
+        start = time.time()
+        try:
+            self.get_client().models.list()
+            healthy, error = True, None
+        except Exception as e:
+            healthy, error = False, str(e)
+            logger.warning(f"LLM服务健康检查失败: {error}")
+        return {
+            "healthy": healthy,
+            "latency_ms": round((time.time() - start) * 1000, 1),
+            "base_url": self.base_url,
+            "client_age_seconds": round(time.time() - self._created_at, 1) if self._created_at else None,
+            "error": error
+        }
@@ -0,0 +1,301 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+# 可重试的上游错误：限流、超时、连接失败和服务端错误
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class TokenBucket:
+    """按分钟速率补充的令牌桶，rate_per_minute 为0表示不限速"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.fill_rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        """取出 amount 个令牌，不足时等待补充（按到达顺序排队）"""
+        if self.capacity <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.fill_rate)
+
+
+def get_retry_after(error) -> float:
+    """从上游错误响应的 Retry-After 头中读取建议等待秒数，没有则返回0"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return 0
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return 0
+    return 0
+
+
+def backoff_delay(attempt: int, base: float, factor: float, max_delay: float) -> float:
+    """第 attempt 次重试前的等待时间：指数退避加随机抖动（equal jitter）"""
+    delay = min(max_delay, base * (factor ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class LLMGateway:
+    """
+    所有LLM调用的异步网关。
+    在独立线程的事件循环中执行：全局与按用户的并发信号量、
+    每分钟请求数/token数令牌桶限速，以及遵循 Retry-After 的指数退避重试。
+    阻塞的SDK调用放入线程池执行，重试等待不占用调用方以外的线程。
+    """
+
+    def __init__(self, max_concurrency: int = 8, per_user_concurrency: int = 3,
+                 requests_per_minute: float = 60, tokens_per_minute: float = 0,
+                 max_retries: int = 3, backoff_base: float = 1, backoff_factor: float = 2,
+                 backoff_max: float = 30):
+        self.max_concurrency = max_concurrency
+        self.per_user_concurrency = per_user_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._global_semaphore = None
+        self._user_semaphores = {}  # 用户 -> [信号量, 正在使用或等待的调用数]，只在事件循环线程中访问
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = defaultdict(int)
+
+    def _count(self, key: str, delta: int = 1):
+        # 统计在事件循环线程和读取流的调用方线程中都会更新
+        with self._stats_lock:
+            self._stats[key] += delta
+
+    def _ensure_started(self):
+        """首次使用时启动事件循环线程"""
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+                ready.set()
+                loop.run_forever()
+
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm-gateway")
+            self._thread = threading.Thread(target=run, name="llm-gateway-loop", daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            logger.info(f"LLM网关已启动，全局并发: {self.max_concurrency}，单用户并发: {self.per_user_concurrency}")
+
+    def _user_semaphore(self, user_id):
+        """取得用户的并发信号量并登记一次使用，用完后必须调用 _release_user"""
+        entry = self._user_semaphores.get(user_id)
+        if entry is None:
+            entry = self._user_semaphores[user_id] = [asyncio.Semaphore(self.per_user_concurrency), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release_user(self, user_id):
+        """注销一次使用；没有调用在使用或等待时信号量已恢复满额，删除以免用户表无限增长"""
+        entry = self._user_semaphores[user_id]
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._user_semaphores[user_id]
+
+    def _release_stream(self, user_id, user_semaphore):
+        """在事件循环线程中归还流式调用占用的并发名额"""
+        self._count("in_flight", -1)
+        self._global_semaphore.release()
+        user_semaphore.release()
+        self._release_user(user_id)
+
+    async def complete(self, func, user_id=None, estimated_tokens: int = 0, max_retries: int = None,
+                       retry_on=()):
+        """
+        在并发与速率限制下执行阻塞调用 func()，失败时按退避策略重试。
+        retry_on 为额外视为可重试的异常类型（例如响应解析失败）。
+        """
+        max_retries = max(1, self.max_retries if max_retries is None else max_retries)
+        retryable = RETRYABLE_ERRORS + tuple(retry_on)
+        user_key = user_id or "anonymous"
+        user_semaphore = self._user_semaphore(user_key)
+        loop = asyncio.get_running_loop()
+
+        try:
+            for attempt in range(1, max_retries + 1):
+                try:
+                    async with user_semaphore, self._global_semaphore:
+                        await self._request_bucket.acquire(1)
+                        await self._token_bucket.acquire(estimated_tokens)
+                        self._count("in_flight")
+                        self._count("requests")
+                        try:
+                            return await loop.run_in_executor(self._executor, func)
+                        finally:
+                            self._count("in_flight", -1)
+                except retryable as e:
+                    if isinstance(e, openai.RateLimitError):
+                        self._count("rate_limited")
+                    if attempt >= max_retries:
+                        self._count("failures")
+                        raise
+                    delay = max(get_retry_after(e),
+                                backoff_delay(attempt, self.backoff_base, self.backoff_factor, self.backoff_max))
+                    self._count("retries")
+                    logger.warning(f"LLM调用失败（第{attempt}次）: {str(e)}，{delay:.1f}秒后重试")
+                    await asyncio.sleep(delay)
+                except Exception:
+                    self._count("failures")
+                    raise
+        finally:
+            self._release_user(user_key)
+
+    async def _open_stream(self, open_stream, user_id=None, estimated_tokens: int = 0, max_retries: int = None):
+        """
+        在并发与速率限制下打开流式响应，打开失败时按退避策略重试。
+        返回 (迭代器, 释放函数)：并发名额一直保留到调用方读完或放弃该流并调用释放函数。
+        """
+        max_retries = max(1, self.max_retries if max_retries is None else max_retries)
+        user_key = user_id or "anonymous"
+        user_semaphore = self._user_semaphore(user_key)
+        loop = asyncio.get_running_loop()
+
+        def release():
+            # 由读取流的调用方线程调用：信号量和用户表只在事件循环线程中修改
+            loop.call_soon_threadsafe(self._release_stream, user_key, user_semaphore)
+
+        opened = False
+        try:
+            for attempt in range(1, max_retries + 1):
+                await user_semaphore.acquire()
+                try:
+                    await self._global_semaphore.acquire()
+                except BaseException:
+                    user_semaphore.release()
+                    raise
+                try:
+                    await self._request_bucket.acquire(1)
+                    await self._token_bucket.acquire(estimated_tokens)
+                    self._count("requests")
+                    self._count("streams")
+                    iterator = await loop.run_in_executor(self._executor, open_stream)
+                    self._count("in_flight")
+                    opened = True
+                    return iterator, release
+                except RETRYABLE_ERRORS as e:
+                    self._global_semaphore.release()
+                    user_semaphore.release()
+                    if isinstance(e, openai.RateLimitError):
+                        self._count("rate_limited")
+                    if attempt >= max_retries:
+                        self._count("failures")
+                        raise
+                    delay = max(get_retry_after(e),
+                                backoff_delay(attempt, self.backoff_base, self.backoff_factor, self.backoff_max))
+                    self._count("retries")
+                    logger.warning(f"LLM流式调用失败（第{attempt}次）: {str(e)}，{delay:.1f}秒后重试")
+                    await asyncio.sleep(delay)
+                except BaseException:
+                    self._global_semaphore.release()
+                    user_semaphore.release()
+                    self._count("failures")
+                    raise
+        finally:
+            # 打开成功时由 release 注销
+            if not opened:
+                self._release_user(user_key)
+
+    def stream(self, open_stream, user_id=None, estimated_tokens: int = 0, max_retries: int = None):
+        """
+        同步门面（流式）：open_stream() 返回一个可迭代的增量结果，
+        本方法逐项产出，调用方读完或中途关闭生成器时释放并发名额。
+        """
+        self._ensure_started()
+        iterator, release = asyncio.run_coroutine_threadsafe(
+            self._open_stream(open_stream, user_id, estimated_tokens, max_retries),
+            self._loop
+        ).result()
+        try:
+            for item in iterator:
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+            release()
+
+    def call(self, func, user_id=None, estimated_tokens: int = 0, max_retries: int = None, retry_on=()):
+        """同步门面：供Flask处理函数和后台线程调用，阻塞直到结果返回"""
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(
+            self.complete(func, user_id, estimated_tokens, max_retries, retry_on),
+            self._loop
+        )
+        return future.result()
+
+    def stats(self) -> dict:
+        """返回网关运行统计"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["tracked_users"] = len(self._user_semaphores)
+        return stats
+
+    def shutdown(self):
+        """停止事件循环和线程池"""
+        with self._start_lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._executor.shutdown(wait=False)
+            self._loop = None
+            self._thread = None
+            self._executor = None
+            self._user_semaphores = {}
@@ -0,0 +1,334 @@
+import time
+import zlib
+import hashlib
+import logging
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+# 迁移记录表：每个已执行的迁移一行
+VERSION_TABLE = """CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL
+)"""
+
+
+def _columns(db, table) -> list:
+    return [row[1] for row in db.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _primary_key(db, table) -> list:
+    """按主键中的顺序返回主键列"""
+    rows = [row for row in db.execute(f"PRAGMA table_info({table})").fetchall() if row[5]]
+    return [row[1] for row in sorted(rows, key=lambda row: row[5])]
+
+
+def _add_column(db, table, column, definition):
+    if column not in _columns(db, table):
+        db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _rebuild_table(db, table, create_sql):
+    """
+    按新的表定义重建表并复制两边共有的列（SQLite不支持修改主键）。
+    先建新表再删旧表、改名，避免其他表外键中的表名被改写。
+    """
+    db.execute(create_sql.replace(f"CREATE TABLE IF NOT EXISTS {table} ", f"CREATE TABLE {table}_new ", 1))
+    old_columns = set(_columns(db, table))
+    column_list = ", ".join(column for column in _columns(db, f"{table}_new") if column in old_columns)
+    db.execute(f"INSERT OR REPLACE INTO {table}_new ({column_list}) SELECT {column_list} FROM {table}")
+    db.execute(f"DROP TABLE {table}")
+    db.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+
+# 已发布迁移中使用的表定义，与迁移一起冻结：表结构变化只能追加新的迁移，不能修改这里
+NODES_SCHEMA = """CREATE TABLE IF NOT EXISTS nodes (
+    topology_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    level INTEGER DEFAULT 0,
+    value REAL DEFAULT 1,
+    mastered INTEGER DEFAULT 0,
+    mastery_score REAL DEFAULT 0,
+    consecutive_correct INTEGER DEFAULT 0,
+    content_snippet TEXT,
+    PRIMARY KEY (topology_id, id),
+    FOREIGN KEY (topology_id) REFERENCES topologies (id)
+)"""
+
+# 边按拓扑图聚簇存储（WITHOUT ROWID），按 topology_id 读取全部边时只需顺序扫描主键
+EDGES_SCHEMA = """CREATE TABLE IF NOT EXISTS edges (
+    topology_id TEXT NOT NULL,
+    from_node TEXT NOT NULL,
+    to_node TEXT NOT NULL,
+    label TEXT,
+    PRIMARY KEY (topology_id, from_node, to_node),
+    FOREIGN KEY (topology_id) REFERENCES topologies (id)
+) WITHOUT ROWID"""
+
+
+def initial_schema(db):
+    """基础表结构（nodes 以 (topology_id, id) 为唯一主键）"""
+    statements = [
+        """CREATE TABLE IF NOT EXISTS topologies (
+            id TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            max_nodes INTEGER DEFAULT 0,
+            created_at TEXT,
+            user_id TEXT DEFAULT 'anonymous'
+        )""",
+        NODES_SCHEMA,
+        EDGES_SCHEMA,
+        """CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            email TEXT,
+            email_verified INTEGER DEFAULT 0,
+            created_at TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS quiz_sessions (
+            id TEXT PRIMARY KEY,
+            topology_id TEXT,
+            node_id TEXT,
+            created_at TEXT,
+            consecutive_correct INTEGER DEFAULT 0,
+            mastered INTEGER DEFAULT 0,
+            FOREIGN KEY (topology_id) REFERENCES topologies (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS questions (
+            id TEXT PRIMARY KEY,
+            topology_id TEXT,
+            node_id TEXT,
+            question TEXT,
+            session_id TEXT,
+            created_at TEXT,
+            answered_at TEXT,
+            answer TEXT,
+            feedback TEXT,
+            correctness INTEGER DEFAULT 0,
+            FOREIGN KEY (topology_id) REFERENCES topologies (id),
+            FOREIGN KEY (session_id) REFERENCES quiz_sessions (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS password_resets (
+            id TEXT PRIMARY KEY,
+            user_id TEXT,
+            token TEXT,
+            created_at TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )""",
+    ]
+    for statement in statements:
+        db.execute(statement)
+
+
+def fix_legacy_keys(db):
+    """
+    旧数据库：topologies 补 user_id 列；nodes 的主键不是 (topology_id, id) 时重建，
+    使不同拓扑图可以有同名节点；edges 重建为按拓扑图聚簇的 WITHOUT ROWID 表。
+    """
+    _add_column(db, "topologies", "user_id", "TEXT DEFAULT 'anonymous'")
+    if _primary_key(db, "nodes") != ["topology_id", "id"]:
+        _rebuild_table(db, "nodes", NODES_SCHEMA)
+    without_rowid = db.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'edges'"
+    ).fetchone()[0].upper().rstrip().endswith("WITHOUT ROWID")
+    if not without_rowid:
+        _rebuild_table(db, "edges", EDGES_SCHEMA)
+
+
+def add_quiz_progress(db):
+    """answer_question 累加的 quiz_sessions.questions_answered 列"""
+    _add_column(db, "quiz_sessions", "questions_answered", "INTEGER DEFAULT 0")
+
+
+def add_node_layout(db):
+    """服务端预计算的节点布局坐标"""
+    _add_column(db, "nodes", "x", "REAL")
+    _add_column(db, "nodes", "y", "REAL")
+
+
+def add_entity_aliases(db):
+    """实体别名表：归并键 -> 规范名称（节点ID），重新生成图谱时保持节点ID稳定"""
+    db.execute("""CREATE TABLE IF NOT EXISTS entity_aliases (
+        topology_id TEXT NOT NULL,
+        alias_key TEXT NOT NULL,
+        node_id TEXT NOT NULL,
+        PRIMARY KEY (topology_id, alias_key)
+    ) WITHOUT ROWID""")
+
+
+def add_query_indexes(db):
+    """app.py 中高频查询的二级索引"""
+    statements = [
+        # /api/topologies：按用户列出拓扑图并按创建时间倒序
+        "CREATE INDEX IF NOT EXISTS idx_topologies_user_created ON topologies (user_id, created_at DESC)",
+        # 批量恢复掌握状态：覆盖索引，无需回表读取原文片段
+        """CREATE INDEX IF NOT EXISTS idx_nodes_mastery
+           ON nodes (topology_id, id, mastered, mastery_score, consecutive_correct)""",
+        # 按会话查询问题
+        "CREATE INDEX IF NOT EXISTS idx_questions_session ON questions (session_id)",
+        # 按拓扑图节点查找答题会话
+        "CREATE INDEX IF NOT EXISTS idx_quiz_sessions_node ON quiz_sessions (topology_id, node_id)",
+        # 注册/找回密码时按邮箱查找用户
+        "CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)",
+        # 重置密码时按令牌查找
+        "CREATE INDEX IF NOT EXISTS idx_password_resets_token ON password_resets (token)",
+    ]
+    for statement in statements:
+        db.execute(statement)
+
+
+TOPOLOGIES_SCHEMA = """CREATE TABLE IF NOT EXISTS topologies (
+    id TEXT PRIMARY KEY,
+    content_hash TEXT REFERENCES document_blobs (hash),
+    max_nodes INTEGER DEFAULT 0,
+    created_at TEXT,
+    user_id TEXT DEFAULT 'anonymous'
+)"""
+
+
+def add_document_blobs(db):
+    """
+    文档原文移入按SHA-256寻址的压缩blob表（带引用计数），相同内容只存一份；
+    topologies 以 content_hash 引用原文，重建表去掉内联的 content 列。
+    """
+    db.execute("""CREATE TABLE IF NOT EXISTS document_blobs (
+        hash TEXT PRIMARY KEY,
+        refcount INTEGER NOT NULL DEFAULT 0,
+        length INTEGER NOT NULL,
+        preview TEXT NOT NULL,
+        codec TEXT NOT NULL,
+        data BLOB NOT NULL
+    )""")
+    _add_column(db, "topologies", "content_hash", "TEXT")
+    if "content" in _columns(db, "topologies"):
+        rows = db.execute("SELECT id, content FROM topologies WHERE content_hash IS NULL").fetchall()
+        for topology_id, content in rows:
+            # 与迁移发布时的blob格式一致：UTF-8、zlib 级别6、预览前100个字符
+            data = (content or "").encode('utf-8')
+            digest = hashlib.sha256(data).hexdigest()
+            db.execute(
+                """INSERT INTO document_blobs (hash, refcount, length, preview, codec, data) VALUES (?, 1, ?, ?, 'zlib', ?)
+                   ON CONFLICT (hash) DO UPDATE SET refcount = refcount + 1""",
+                (digest, len(content or ""), (content or "")[:100], zlib.compress(data, 6))
+            )
+            db.execute("UPDATE topologies SET content_hash = ? WHERE id = ?", (digest, topology_id))
+        _rebuild_table(db, "topologies", TOPOLOGIES_SCHEMA)
+    # 重建表会删除原表上的索引
+    db.execute("CREATE INDEX IF NOT EXISTS idx_topologies_user_created ON topologies (user_id, created_at DESC)")
+
+
+def add_document_search(db):
+    """
+    文档片段的FTS5全文索引（汉字逐字分词）。已有文档的索引依赖分词和切分规则，
+    不在迁移中生成，由启动时的 doc_search.index_unindexed_documents 补建。
+    """
+    db.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS document_chunks USING fts5(
+        body,
+        topology_id,
+        chunk_index UNINDEXED,
+        start_offset UNINDEXED,
+        end_offset UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""")
+
+
+def add_topology_jobs(db):
+    """文档处理任务表（替代进程内的处理结果字典），按结束时间索引以清理过期任务"""
+    db.execute("""CREATE TABLE IF NOT EXISTS topology_jobs (
+        topology_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL DEFAULT 'processing',
+        progress INTEGER NOT NULL DEFAULT 0,
+        message TEXT,
+        user_id TEXT,
+        max_nodes INTEGER DEFAULT 0,
+        node_count INTEGER DEFAULT 0,
+        edge_count INTEGER DEFAULT 0,
+        text_length INTEGER DEFAULT 0,
+        processing_time REAL DEFAULT 0,
+        result_id TEXT,
+        created_at TEXT,
+        started_at REAL,
+        updated_at REAL NOT NULL,
+        finished_at REAL
+    )""")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_topology_jobs_finished ON topology_jobs (finished_at)")
+
+
+def drop_plural_aliases(db):
+    """
+    删除旧的英文单数化规则（去掉所有词尾 s）为以 s 结尾的节点写入的纯英文别名，如 "new" -> "news"；
+    重新生成图谱时已有节点ID按新规则重新登记。
+    """
+    db.execute("""DELETE FROM entity_aliases
+        WHERE lower(node_id) LIKE '%s' AND alias_key <> lower(node_id)
+          AND alias_key NOT GLOB '*[^a-z0-9 ]*'""")
+
+
+def add_document_index_stats(db):
+    """每个拓扑图全文索引的片段数和总词元数，BM25 按单个文档的统计计算；已有文档在启动时重建索引"""
+    db.execute("""CREATE TABLE IF NOT EXISTS document_index_stats (
+        topology_id TEXT PRIMARY KEY,
+        chunk_count INTEGER NOT NULL,
+        token_count INTEGER NOT NULL
+    )""")
+
+
+def add_node_centrality(db):
+    """节点重要性（PageRank），保存图谱时写入；此前保存的图谱为 NULL，重新生成后补齐"""
+    _add_column(db, "nodes", "centrality", "REAL")
+
+
+# 有序迁移列表：(版本号, 名称, 迁移函数)，只能追加，不能修改已发布的迁移
+MIGRATIONS = [
+    (1, "initial_schema", initial_schema),
+    (2, "fix_legacy_keys", fix_legacy_keys),
+    (3, "add_quiz_progress", add_quiz_progress),
+    (4, "add_node_layout", add_node_layout),
+    (5, "add_entity_aliases", add_entity_aliases),
+    (6, "add_query_indexes", add_query_indexes),
+    (7, "add_document_blobs", add_document_blobs),
+    (8, "add_document_search", add_document_search),
+    (9, "add_topology_jobs", add_topology_jobs),
+    (10, "drop_plural_aliases", drop_plural_aliases),
+    (11, "add_document_index_stats", add_document_index_stats),
+    (12, "add_node_centrality", add_node_centrality),
+]
+
+
+def applied_versions(db) -> set:
+    db.execute(VERSION_TABLE)
+    return {row[0] for row in db.execute("SELECT version FROM schema_migrations").fetchall()}
+
+
+def run_migrations(db, migrations=None) -> list:
+    """
+    按版本顺序执行尚未执行的迁移，每个迁移在独立的写事务中执行并记录版本，返回本次执行的版本号。
+    事务内重新检查版本，多个进程同时启动时每个迁移也只执行一次。
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    db.execute(VERSION_TABLE)
+    db.commit()
+    executed = []
+    for version, name, migrate in sorted(migrations, key=lambda item: item[0]):
+        if version in applied_versions(db):
+            continue
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if version in applied_versions(db):
+                db.rollback()
+                continue
+            migrate(db)
+            db.execute(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, time.strftime('%Y-%m-%d %H:%M:%S'))
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.error(f"数据库迁移 {version}_{name} 失败", exc_info=True)
+            raise
+        executed.append(version)
+        logger.info(f"已执行数据库迁移 {version}_{name}")
+    return executed
@@ -0,0 +1,77 @@
+import threading
+
+from graph_core import GraphIndex
+
+
+class ProgressiveGraph:
+    """
+    边提取边构建的知识图：三元组到达时即加入图中，
+    处理过程中可随时生成与最终结果格式一致的部分结果快照（不含原文片段）。
+    线程安全，可被多个文本块的提取线程同时写入。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes = {}        # 知识点 -> 首次出现序号
+        self._edges = {}        # (父, 子) -> 关系
+        self._version = 0
+        self._snapshot = None
+        self._snapshot_version = -1
+
+    def add_triple(self, triple):
+        """加入一个三元组，忽略空名称、自环和重复的 (父, 子)"""
+        src, rel, tgt = (str(v).strip() for v in triple)
+        if not src or not tgt or src == tgt:
+            return
+        with self._lock:
+            if (src, tgt) in self._edges:
+                return
+            for label in (src, tgt):
+                if label not in self._nodes:
+                    self._nodes[label] = len(self._nodes)
+            self._edges[(src, tgt)] = rel or "包含"
+            self._version += 1
+
+    @property
+    def node_count(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._edges)
+
+    def snapshot(self) -> dict:
+        """生成当前部分结果（节点层级按所有根节点及环BFS计算），图未变化时复用上次结果"""
+        with self._lock:
+            if self._snapshot_version == self._version:
+                return self._snapshot
+            edge_items = list(self._edges.items())
+            version = self._version
+
+        graph = GraphIndex.from_triples((src, rel, tgt) for (src, tgt), rel in edge_items)
+        levels = graph.levels()
+        nodes = [{
+            "id": label,
+            "label": label,
+            "title": label,
+            "level": levels[node],
+            "value": max(1, graph.in_degree[node] + graph.out_degree[node]),
+            "mastered": False,
+            "mastery_score": 0,
+            "consecutive_correct": 0
+        } for node, label in enumerate(graph.labels)]
+        edges = [{
+            "from": src,
+            "to": tgt,
+            "label": rel,
+            "title": rel,
+            "arrows": "to",
+            "font": {"align": "middle"}
+        } for (src, tgt), rel in edge_items]
+        snapshot = {"nodes": nodes, "edges": edges, "root": graph.root_label()}
+
+        with self._lock:
+            if version >= self._snapshot_version:
+                self._snapshot = snapshot
+                self._snapshot_version = version
+        return snapshot
@@ -0,0 +1,166 @@
+import re
+import logging
+from collections import Counter
+
+from chunking import split_text_into_chunks, estimate_tokens
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+# 控制字符（保留换行和制表符）
+_CONTROL_PATTERN = re.compile(r'[\x00-\x08\x0b-\x1f\x7f-\x9f]')
+_SPACES_PATTERN = re.compile(r'[ \t\u3000\xa0]+')
+_BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+
+# 页码行，只在分页文本（以换页符分隔）的页边识别，正文中的纯数字行保留
+_PAGE_NUMBER_PATTERN = re.compile(
+    r'^(?:第\s*\d+\s*页(?:\s*/?\s*共\s*\d+\s*页)?|-\s*\d+\s*-|\d+\s*/\s*\d+|page\s+\d+(?:\s+of\s+\d+)?|\d{1,4})$', re.I
+)
+# 任意位置的样板行：目录引导点、纯分隔线
+_BOILERPLATE_PATTERNS = [
+    re.compile(r'^.{0,60}?[.·…]{4,}\s*\d+$'),
+    re.compile(r'^[-=_*·—]{3,}$'),
+]
+
+# 页边行：每页开头和结尾各几行非空行
+_PAGE_EDGE_LINES = 2
+# 页眉页脚判定：在至少这么多页的页边出现的短行
+_REPEATED_LINE_MIN_PAGES = 3
+_REPEATED_LINE_MAX_LENGTH = 40
+
+_QUERY_TERM_PATTERN = re.compile(r'[A-Za-z0-9]{2,}|[\u4e00-\u9fff]+')
+
+# 多个不相邻片段之间的分隔标记
+SPAN_SEPARATOR = "\n……\n"
+
+
+def _page_edges(lines) -> set:
+    """一页中开头和结尾几行非空行的下标"""
+    non_empty = [i for i, line in enumerate(lines) if line]
+    return set(non_empty[:_PAGE_EDGE_LINES] + non_empty[-_PAGE_EDGE_LINES:])
+
+
+def compact_text(text: str) -> str:
+    """
+    压缩文档文本以节省token：去除控制字符、目录/分隔线等样板行，合并连续空白和空行。
+    文本以换页符分页时（PDF），再去除页边的页码和在多页页边重复出现的页眉页脚；
+    正文中的数字行和重复行不受影响。不做JSON转义（提示词中的引号和反斜杠无需转义）。
+    """
+    if not text:
+        return ""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    pages = [[_SPACES_PATTERN.sub(' ', line).strip() for line in _CONTROL_PATTERN.sub('', page).split('\n')]
+             for page in text.split('\f')]
+    edges = [_page_edges(lines) for lines in pages] if len(pages) > 1 else [set()]
+    page_counts = Counter(
+        line for lines, edge in zip(pages, edges)
+        for line in {lines[i] for i in edge} if len(line) <= _REPEATED_LINE_MAX_LENGTH
+    )
+    kept = []
+    for lines, edge in zip(pages, edges):
+        for i, line in enumerate(lines):
+            if line and i in edge and (_PAGE_NUMBER_PATTERN.match(line) or
+                                       page_counts[line] >= _REPEATED_LINE_MIN_PAGES):
+                continue
+            if line and any(pattern.match(line) for pattern in _BOILERPLATE_PATTERNS):
+                continue
+            kept.append(line)
+    return _BLANK_LINES_PATTERN.sub('\n\n', '\n'.join(kept)).strip()
+
+
+def query_terms(query: str) -> set:
+    """提取查询词：英文/数字单词（小写）以及中文的双字组"""
+    terms = set()
+    for match in _QUERY_TERM_PATTERN.finditer(query or ""):
+        word = match.group()
+        if word.isascii():
+            terms.add(word.lower())
+        elif len(word) == 1:
+            terms.add(word)
+        else:
+            terms.update(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def score_passage(text: str, terms: set) -> float:
+    """片段与查询的相关度：命中的不同查询词数量为主，词频（封顶3次）为辅"""
+    lowered = text.lower()
+    score = 0.0
+    for term in terms:
+        count = lowered.count(term)
+        if count:
+            score += 1 + 0.1 * min(count, 3)
+    return score
+
+
+def fit_document(text: str, budget_tokens: int, query: str = "", passage_tokens: int = 300, compact: bool = True):
+    """
+    压缩文档并裁剪到 budget_tokens 以内，返回 (文档文本, 预算报告)；compact=False 表示文本已压缩过。
+    超出预算时把文档切成片段：有查询时按相关度挑选片段，没有查询时按原文顺序保留，
+    选中的片段按原文顺序拼接，不相邻的片段之间用分隔标记隔开。
+    """
+    compacted = compact_text(text) if compact else text
+    compacted_tokens = estimate_tokens(compacted)
+    report = {
+        "original_tokens": estimate_tokens(text),
+        "compacted_tokens": compacted_tokens,
+        "budget_tokens": budget_tokens,
+        "document_tokens": compacted_tokens,
+        "selected_passages": None,
+        "total_passages": None
+    }
+    if not budget_tokens or compacted_tokens <= budget_tokens:
+        return compacted, report
+
+    passages = split_text_into_chunks(compacted, min(passage_tokens, budget_tokens))
+    terms = query_terms(query)
+    if terms:
+        ranked = sorted(passages, key=lambda p: (-score_passage(p.text, terms), p.index))
+    else:
+        ranked = passages
+
+    chosen = []
+    used = 0
+    for passage in ranked:
+        cost = estimate_tokens(passage.text)
+        if used + cost > budget_tokens:
+            continue
+        chosen.append(passage)
+        used += cost
+    chosen.sort(key=lambda p: p.index)
+
+    parts = []
+    previous_end = None
+    for passage in chosen:
+        if previous_end is not None:
+            parts.append("" if passage.start == previous_end else SPAN_SEPARATOR)
+        parts.append(passage.text)
+        previous_end = passage.end
+    fitted = "".join(parts)
+
+    report.update({
+        "document_tokens": estimate_tokens(fitted),
+        "selected_passages": len(chosen),
+        "total_passages": len(passages)
+    })
+    return fitted, report
+
+
+def describe_report(report: dict) -> str:
+    """预算报告的单行描述，用于日志"""
+    text = (f"文档 {report['document_tokens']}/{report['budget_tokens']} tokens"
+            f"（原文 {report['original_tokens']}，压缩后 {report['compacted_tokens']}")
+    if report.get("selected_passages") is not None:
+        text += f"，选取片段 {report['selected_passages']}/{report['total_passages']}"
+    return text + "）"
+
+
+def log_prompt_budget(call_site: str, messages, max_tokens: int, context_tokens: int = 0) -> int:
+    """记录一次调用的token预算使用情况，返回提示词与回复上限合计的预估token数"""
+    prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+    total = prompt_tokens + max_tokens
+    if context_tokens and total > context_tokens:
+        logger.warning(f"LLM调用[{call_site}] 预估token {total} 超出上下文窗口 {context_tokens}")
+    else:
+        logger.info(f"LLM调用[{call_site}] 预估token: 提示词 {prompt_tokens} + 回复上限 {max_tokens} = {total}"
+                    + (f"/{context_tokens}" if context_tokens else ""))
+    return total
@@ -0,0 +1,187 @@
+import re
+import time
+import zlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from doc_search import strip_question_words
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+# 大于2^32的素数：哈希函数族 (a*x + b) mod p，a、b、x 均小于2^32，乘积不会溢出uint64
+_PRIME = (1 << 32) + 15
+_NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize_question(question: str) -> str:
+    """问题的归一形式：NFKC、小写，去掉提问用语、标点和空白"""
+    text = unicodedata.normalize('NFKC', question or '').lower()
+    return _NON_WORD_PATTERN.sub('', strip_question_words(text))
+
+
+def char_ngrams(text: str, n: int) -> set:
+    """字符 n-gram 集合，文本短于 n 时整体作为一个元素"""
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class MinHasher:
+    """字符 n-gram 集合的MinHash签名：两个签名相同位置取值相等的比例估计集合的Jaccard相似度"""
+
+    def __init__(self, num_perm: int = 64, ngram: int = 2, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.ngram = ngram
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        grams = char_ngrams(text, self.ngram)
+        if not grams:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+        return ((np.outer(hashes, self.a) + self.b) % _PRIME).min(axis=0)
+
+
+def similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    return float(np.mean(signature_a == signature_b))
+
+
+class _TopologyAnswers:
+    """单个拓扑图的缓存：按最近使用排序的条目和LSH分桶索引"""
+
+    def __init__(self, content_hash):
+        self.content_hash = content_hash
+        self.entries = OrderedDict()  # 条目ID -> 条目字典
+        self.buckets = defaultdict(set)  # (分段号, 分段签名) -> 条目ID集合
+
+
+class SemanticAnswerCache:
+    """
+    按拓扑图划分的问答结果缓存，措辞略有不同的同一问题也能命中：
+    问题归一化后取字符 n-gram 的MinHash签名，签名分成 bands 段做LSH分桶，
+    同桶的候选条目再按签名估计的Jaccard相似度与 threshold 比较。
+    条目记录回答时文档内容的摘要，文档变化后该拓扑图的缓存整体失效；条目超过 ttl 秒过期，
+    每个拓扑图最多保留 max_entries 条（LRU淘汰）。只保存在进程内存中，不需要外部模型。
+    """
+
+    def __init__(self, threshold: float = 0.7, ttl: int = 24 * 3600, max_entries: int = 500,
+                 num_perm: int = 64, bands: int = 16, ngram: int = 2):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须是 bands 的整数倍")
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, ngram)
+        self._lock = threading.Lock()
+        self._topologies = {}
+        self._next_id = 0
+        self._stats = defaultdict(int)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _remove(self, cache: _TopologyAnswers, entry_id):
+        entry = cache.entries.pop(entry_id)
+        for key in self._band_keys(entry["signature"]):
+            bucket = cache.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del cache.buckets[key]
+
+    def _topology(self, topology_id, content_hash, create: bool):
+        """取拓扑图的缓存；文档摘要与缓存时不同则整体失效"""
+        cache = self._topologies.get(topology_id)
+        if cache is not None and cache.content_hash != content_hash:
+            del self._topologies[topology_id]
+            self._stats["invalidations"] += 1
+            logger.info(f"文档已变化，问答缓存失效: {topology_id}")
+            cache = None
+        if cache is None and create:
+            cache = self._topologies[topology_id] = _TopologyAnswers(content_hash)
+        return cache
+
+    def get(self, topology_id: str, question: str, content_hash=None):
+        """查找相似问题的缓存结果，返回条目字典（含 similarity）或 None"""
+        normalized = normalize_question(question)
+        signature = self.hasher.signature(normalized)
+        now = time.time()
+        with self._lock:
+            self._stats["lookups"] += 1
+            cache = self._topology(topology_id, content_hash, create=False)
+            best, best_score = None, 0.0
+            if cache is not None and normalized:
+                candidates = set()
+                for key in self._band_keys(signature):
+                    candidates.update(cache.buckets.get(key, ()))
+                for entry_id in candidates:
+                    entry = cache.entries[entry_id]
+                    if now - entry["created_at"] > self.ttl:
+                        self._remove(cache, entry_id)
+                        self._stats["expired"] += 1
+                        continue
+                    score = 1.0 if entry["normalized"] == normalized else similarity(signature, entry["signature"])
+                    if score >= self.threshold and score > best_score:
+                        best, best_score = entry, score
+            if best is None:
+                self._stats["misses"] += 1
+                return None
+            cache.entries.move_to_end(best["id"])
+            best["hits"] += 1
+            self._stats["hits"] += 1
+            result = {key: best[key] for key in ("question", "answer", "source", "resources", "hits")}
+            result["similarity"] = round(best_score, 3)
+            return result
+
+    def set(self, topology_id: str, question: str, answer: str, source: str, resources=None, content_hash=None):
+        normalized = normalize_question(question)
+        if not normalized or not answer:
+            return
+        entry = {
+            "question": question,
+            "normalized": normalized,
+            "signature": self.hasher.signature(normalized),
+            "answer": answer,
+            "source": source,
+            "resources": resources or [],
+            "created_at": time.time(),
+            "hits": 0
+        }
+        with self._lock:
+            cache = self._topology(topology_id, content_hash, create=True)
+            # 相同归一问题只保留最新的回答
+            for entry_id, existing in list(cache.entries.items()):
+                if existing["normalized"] == normalized:
+                    self._remove(cache, entry_id)
+            entry["id"] = self._next_id
+            self._next_id += 1
+            cache.entries[entry["id"]] = entry
+            for key in self._band_keys(entry["signature"]):
+                cache.buckets[key].add(entry["id"])
+            while len(cache.entries) > self.max_entries:
+                self._remove(cache, next(iter(cache.entries)))
+                self._stats["evictions"] += 1
+            self._stats["stores"] += 1
+
+    def invalidate(self, topology_id: str):
+        """清除拓扑图的全部缓存（文档重新上传或重新索引时调用）"""
+        with self._lock:
+            if self._topologies.pop(topology_id, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["topologies"] = len(self._topologies)
+            stats["entries"] = sum(len(cache.entries) for cache in self._topologies.values())
+        lookups = stats.get("lookups", 0)
+        stats["hit_rate"] = round(stats.get("hits", 0) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,66 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+
+class SingleFlight:
+    """
+    合并相同键的并发调用：同一时刻同一个键只执行一次 func，
+    其余调用方等待并共享该次调用的结果或异常。调用结束后键即释放，不做结果缓存。
+    """
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = defaultdict(int)
+
+    def do(self, key, func, timeout: float = None):
+        """
+        执行或加入键为 key 的调用，返回 (结果, 是否为共享结果)。
+        等待他人调用超过 timeout 秒时抛出 TimeoutError，发起调用的一方不受超时限制。
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._stats["executions"] += 1
+            else:
+                self._stats["collapsed"] += 1
+
+        if not leader:
+            wait = self.timeout if timeout is None else timeout
+            try:
+                return future.result(timeout=wait), True
+            except FutureTimeoutError:
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise TimeoutError(f"等待相同请求的结果超时（{wait}秒）")
+
+        try:
+            result = func()
+        except BaseException as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> dict:
+        """返回调用统计：calls 总调用数，executions 实际执行数，collapsed 被合并的调用数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        calls = stats.get("calls", 0)
+        stats["collapse_rate"] = round(stats.get("collapsed", 0) / calls, 4) if calls else 0
+        return stats
@@ -0,0 +1,207 @@
+import re
+from collections import deque, defaultdict
+
+# 模糊匹配用的词元：中文按双字组，英文/数字按单词（至少3个字符）
+_CJK_RUN_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_WORD_PATTERN = re.compile(r'[a-z0-9]{3,}')
+
+# 每个模式参与评分的最多出现次数，避免极短的常见词拖慢评分
+MAX_OCCURRENCES_PER_PATTERN = 1000
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机：一次扫描文本即可找出所有模式的全部出现位置"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(pattern_id)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def finditer(self, text: str):
+        """逐个产出 (起始位置, 模式编号)，按结束位置的先后顺序"""
+        goto, fail, output, patterns = self.goto, self.fail, self.output, self.patterns
+        if not goto[0]:
+            return
+        # 处于初始状态时，用正则直接跳到下一个可能开始匹配的字符
+        first_chars = re.compile('[' + ''.join(re.escape(char) for char in goto[0]) + ']')
+        state = 0
+        index, n = 0, len(text)
+        while index < n:
+            if state == 0:
+                match = first_chars.search(text, index)
+                if match is None:
+                    return
+                index = match.start()
+            char = text[index]
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern_id in output[state]:
+                yield index - len(patterns[pattern_id]) + 1, pattern_id
+            index += 1
+
+
+def _lower_preserving_offsets(content: str) -> str:
+    """转为小写且保证与原文逐字符对齐（个别字符小写后长度变化时保留原字符）"""
+    lowered = content.lower()
+    if len(lowered) == len(content):
+        return lowered
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in content)
+
+
+def fuzzy_terms(label: str) -> dict:
+    """模糊匹配词元及权重：中文双字组权重1，英文单词/数字区分度更高，权重2"""
+    lowered = label.lower()
+    terms = {}
+    for run in _CJK_RUN_PATTERN.findall(lowered):
+        if len(run) == 1:
+            terms[run] = 1
+        for i in range(len(run) - 1):
+            terms[run[i:i + 2]] = 1
+    for word in _WORD_PATTERN.findall(lowered):
+        terms[word] = 2
+    return terms
+
+
+class SnippetEngine:
+    """
+    原文片段提取引擎：文档只转小写一次，用一个多模式自动机一次扫描找出所有节点名称。
+    每个名称选取附近出现其他节点名称最多的那次出现（同分取最早），
+    原文中找不到的名称（模型改写过的）按词元覆盖率做模糊匹配。
+    """
+
+    def __init__(self, content: str, window: int = 200, fuzzy_threshold: float = 0.7):
+        self.content = content or ""
+        self.lowered = _lower_preserving_offsets(self.content)
+        self.window = window
+        self.fuzzy_threshold = fuzzy_threshold
+
+    def _format(self, index: int, length: int) -> str:
+        """与原 extract_content_snippet 相同的格式：命中位置前后各 window 个字符，截断处加省略号"""
+        start = max(0, index - self.window)
+        end = min(len(self.content), index + length + self.window)
+        snippet = self.content[start:end]
+        if start > 0:
+            snippet = "..." + snippet
+        if end < len(self.content):
+            snippet = snippet + "..."
+        return snippet
+
+    def _exact_positions(self, patterns):
+        """一次扫描返回每个模式的出现位置列表，以及全部命中的 (位置, 模式编号) 列表"""
+        occurrences = defaultdict(list)
+        hits = []
+        for start, pattern_id in AhoCorasick(patterns).finditer(self.lowered):
+            positions = occurrences[pattern_id]
+            if len(positions) < MAX_OCCURRENCES_PER_PATTERN:
+                positions.append(start)
+                hits.append((start, pattern_id))
+        hits.sort()
+        return occurrences, hits
+
+    def _best_occurrences(self, hits) -> dict:
+        """滑动窗口统计每次出现前后 window 范围内其他名称的命中数，选出每个模式得分最高的一次"""
+        best = {}
+        left = right = 0
+        n = len(hits)
+        window_counts = defaultdict(int)
+        for position, pattern_id in hits:
+            while right < n and hits[right][0] <= position + self.window:
+                window_counts[hits[right][1]] += 1
+                right += 1
+            while hits[left][0] < position - self.window:
+                window_counts[hits[left][1]] -= 1
+                left += 1
+            score = (right - left) - window_counts[pattern_id]
+            current = best.get(pattern_id)
+            if current is None or score > current[0]:
+                best[pattern_id] = (score, position)
+        return {pattern_id: position for pattern_id, (_, position) in best.items()}
+
+    def _fuzzy_position(self, label: str, term_positions: dict):
+        """在词元加权覆盖率最高的窗口中取位置，覆盖率低于阈值时返回None"""
+        terms = fuzzy_terms(label)
+        if not terms:
+            return None
+        merged = sorted((position, term) for term in terms for position in term_positions.get(term, ()))
+        if not merged:
+            return None
+        span = max(len(label) * 3, 20)
+        counts = defaultdict(int)
+        covered = 0
+        best_covered, best_position = 0, None
+        left = 0
+        for position, term in merged:
+            counts[term] += 1
+            if counts[term] == 1:
+                covered += terms[term]
+            while merged[left][0] < position - span:
+                left_term = merged[left][1]
+                counts[left_term] -= 1
+                if counts[left_term] == 0:
+                    covered -= terms[left_term]
+                left += 1
+            if covered > best_covered:
+                best_covered, best_position = covered, merged[left][0]
+        if best_covered / sum(terms.values()) < self.fuzzy_threshold:
+            return None
+        return best_position
+
+    def snippets(self, labels) -> dict:
+        """返回 {名称: 原文片段}，找不到的名称对应空字符串"""
+        labels = list(dict.fromkeys(labels))
+        patterns = [label.lower() for label in labels if label and label.strip()]
+        pattern_ids = {pattern: pattern_id for pattern_id, pattern in enumerate(dict.fromkeys(patterns))}
+        patterns = list(pattern_ids)
+        results = {label: "" for label in labels}
+        if not self.content or not patterns:
+            return results
+
+        _, hits = self._exact_positions(patterns)
+        best = self._best_occurrences(hits)
+
+        missing = []
+        for label in labels:
+            pattern_id = pattern_ids.get(label.lower())
+            if pattern_id is not None and pattern_id in best:
+                results[label] = self._format(best[pattern_id], len(label))
+            elif label and label.strip():
+                missing.append(label)
+
+        if missing:
+            # 模糊匹配：所有未命中名称的词元同样只扫描一次文档
+            terms = list({term for label in missing for term in fuzzy_terms(label)})
+            term_positions = {}
+            if terms:
+                term_occurrences, _ = self._exact_positions(terms)
+                term_positions = {terms[term_id]: positions for term_id, positions in term_occurrences.items()}
+            for label in missing:
+                position = self._fuzzy_position(label, term_positions)
+                if position is not None:
+                    results[label] = self._format(position, len(label))
+        return results
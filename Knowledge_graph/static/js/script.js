@@ -593,8 +593,16 @@ document.addEventListener('DOMContentLoaded', function() {
             if (progressBar) progressBar.style.width = `${progress}%`;
             if (progressPercentage) progressPercentage.textContent = `${progress}%`;
             if (progressMessage) progressMessage.textContent = data.message || '处理中...';
+            // 渐进式显示已提取出的部分图谱
+            if (data.partial_data && data.partial_data.nodes.length > 0) {
+              renderPartialGraph(data.partial_data);
+              if (nodeCount) nodeCount.textContent = data.node_count;
+              if (edgeCount) edgeCount.textContent = data.edge_count;
+              if (graphContainer) graphContainer.classList.remove('hidden');
+            }
           } else if (data.status === 'success') {
             clearInterval(interval);
+            partialGraphData = null;
             renderGraph(data.data);
             if (nodeCount) nodeCount.textContent = data.node_count;
             if (edgeCount) edgeCount.textContent = data.edge_count;
@@ -606,6 +614,7 @@ document.addEventListener('DOMContentLoaded', function() {
             if (answerFeedback) answerFeedback.classList.add('hidden');
           } else if (data.status === 'error') {
             clearInterval(interval);
+            partialGraphData = null;
             // showNotification('错误', data.message, 'error'); // 已去除生成失败弹窗
             resetUpload();
           }
@@ -619,6 +628,72 @@ document.addEventListener('DOMContentLoaded', function() {
     }, 1000);
   }
 
+  // 渲染处理中的部分图谱：复用同一个网络，只增量更新新出现的节点和边
+  let partialGraphData = null;
+  function renderPartialGraph(graphData) {
+    if (!networkContainer) return;
+    if (partialGraphData === null) {
+      if (network !== null) {
+        network.destroy();
+      }
+      partialGraphData = {
+        nodes: new vis.DataSet(),
+        edges: new vis.DataSet()
+      };
+      network = new vis.Network(networkContainer, partialGraphData, {
+        layout: {
+          hierarchical: {
+            enabled: true,
+            direction: 'UD',
+            sortMethod: 'directed',
+            nodeSpacing: 150,
+            levelSeparation: 200
+          }
+        },
+        interaction: {
+          hover: true,
+          tooltipDelay: 200
+        },
+        physics: {
+          enabled: false
+        },
+        nodes: {
+          shape: 'circle',
+          font: {
+            size: 14,
+            face: 'Inter'
+          }
+        },
+        edges: {
+          color: {
+            color: '#95a5a6',
+            highlight: '#7f8c8d'
+          },
+          width: 1,
+          arrows: {
+            to: {
+              enabled: true,
+              scaleFactor: 0.8
+            }
+          },
+          font: {
+            size: 12,
+            face: 'Inter',
+            align: 'middle'
+          }
+        }
+      });
+    }
+    partialGraphData.nodes.update(graphData.nodes.map(node => ({
+      ...node,
+      ...updateNodeColor(node)
+    })));
+    partialGraphData.edges.update(graphData.edges.map(edge => ({
+      ...edge,
+      id: `${edge.from}->${edge.to}`
+    })));
+  }
+
   // 渲染知识图谱
   function renderGraph(graphData) {
     console.log('开始渲染图谱，节点数:', graphData.nodes.length);
@@ -646,9 +721,17 @@ document.addEventListener('DOMContentLoaded', function() {
       edges: edges
     };
     
+    // 服务端已预计算层级布局时直接使用节点坐标，跳过浏览器端的布局计算
+    const hasServerLayout = graphData.nodes.length > 0 &&
+      graphData.nodes.every(node => typeof node.x === 'number' && typeof node.y === 'number');
+    
     // 配置选项
     const options = {
-      layout: {
+      layout: hasServerLayout ? {
+        hierarchical: {
+          enabled: false
+        }
+      } : {
         hierarchical: {
           enabled: true,
           direction: 'UD',
@@ -1456,13 +1539,24 @@ document.addEventListener('DOMContentLoaded', function() {
   const qaHistory = document.getElementById('qaHistory');
   const resourceRecommend = document.getElementById('resourceRecommend');
 
+  const greetingMsg = document.getElementById('greetingMsg');
+  let hasAsked = false; // 是否已提问
+
   if (qaSubmitBtn) {
     qaSubmitBtn.addEventListener('click', () => {
       const question = qaInput.value.trim();
       if (!question) return;
-      // 显示用户问题（去除首行空行）
-      const userMsg = `<div class='msg user-msg'><strong>你：</strong> ${question}</div>`;
-      qaHistory.innerHTML += userMsg;
+      // 首次提问时隐藏问候语
+      if (!hasAsked && greetingMsg) {
+        greetingMsg.style.display = 'none';
+        hasAsked = true;
+      }
+      // 用户气泡（右侧）
+      const userRow = document.createElement('div');
+      userRow.className = 'msg-row user';
+      userRow.innerHTML = `<div class='msg user-msg'></div><div class='msg-avatar'><i class='fa fa-user'></i></div>`;
+      userRow.querySelector('.user-msg').textContent = question;
+      qaHistory.appendChild(userRow);
       qaInput.value = '';
       // 显示“正在思考中……”
       thinkingMsg = document.createElement('div');
@@ -1470,63 +1564,87 @@ document.addEventListener('DOMContentLoaded', function() {
       thinkingMsg.innerHTML = `<i class="fa fa-spinner fa-spin"></i> 正在思考中……`;
       qaHistory.appendChild(thinkingMsg);
       qaHistory.scrollTop = qaHistory.scrollHeight;
+      resourceRecommend.innerHTML = '';
       // 判断是否上传文档
       const requestData = {
           question: question,
           topology_id: currentTopologyId || '',  // 若无则为 ""
       };
 
-      fetch('/api/chat', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(requestData)
-      })
-      .then(res => res.json())
-      .then(data => {
-        // 隐藏“正在思考中……”
+      // 流式回答：按SSE事件增量渲染
+      let answerText = '';
+      let answerBody = null;
+      let sourceLabel = null;
+      const renderer = createIncrementalRenderer();
+
+      function removeThinking() {
         if (thinkingMsg) {
           thinkingMsg.remove();
           thinkingMsg = null;
         }
+      }
 
-        if (data.status === 'success') {
-          // 显示AI回答，后跟来源
-          let sourceText = '';
-          if (data.source === 'document') {
-            sourceText = `<br><span style="color:#888;font-size:13px;font-style:italic;">来源：文档</span>`;
-          } else if (data.source === 'web') {
-            sourceText = `<br><span style="color:#888;font-size:13px;font-style:italic;">来源：网络</span>`;
-          }
-          const aiMsg = `<div class='msg ai-msg'><strong>智能助手：</strong><br>${data.answer}${sourceText}</div>`;
-          qaHistory.innerHTML += aiMsg;
+      function ensureAnswerBubble() {
+        if (answerBody) return;
+        removeThinking();
+        const row = document.createElement('div');
+        row.className = 'msg-row ai';
+        row.innerHTML = `<div class='msg-avatar'><i class='fa fa-robot'></i></div><div class='msg ai-msg'><div class='markdown-body'></div><span class='answer-source' style="color:#888;font-size:13px;font-style:italic;"></span></div>`;
+        qaHistory.appendChild(row);
+        answerBody = row.querySelector('.markdown-body');
+        sourceLabel = row.querySelector('.answer-source');
+      }
 
-          if (data.resources && data.resources.length > 0) {
-            let links = `<div class="resource-list"><h4>📚 推荐学习资源：</h4><ul>`;
-            for (const res of data.resources) {
-              links += `<li><a href='${res.url}' target='_blank'>${res.title}</a> - ${res.snippet}</li>`;
-            }
-            links += `</ul></div>`;
-            resourceRecommend.innerHTML = links;
-          } else {
-            resourceRecommend.innerHTML = '';
-          }
-        } else {
-          qaHistory.innerHTML += `<div class='msg error-msg'>⚠️ 出错：${data.message}</div>`;
+      streamChat(requestData, {
+        source(data) {
+          // 来源切换（文档 -> 网络）时清空已输出内容
+          ensureAnswerBubble();
+          answerText = '';
+          answerBody.innerHTML = '';
+          sourceLabel.innerHTML = data.source === 'document' ? '<br>来源：文档' : '<br>来源：网络';
+        },
+        token(data) {
+          ensureAnswerBubble();
+          answerText += data.text;
+          renderer.render(answerBody, answerText);
+          qaHistory.scrollTop = qaHistory.scrollHeight;
+        },
+        resources(data) {
+          renderResources(data.resources);
+        },
+        done() {
+          removeThinking();
+          if (answerBody) renderer.flush(answerBody, answerText);
+          qaHistory.scrollTop = qaHistory.scrollHeight;
+        },
+        error(data) {
+          removeThinking();
+          qaHistory.insertAdjacentHTML('beforeend', `<div class='msg error-msg'>⚠️ 出错：${data.message}</div>`);
+          qaHistory.scrollTop = qaHistory.scrollHeight;
         }
-        qaHistory.scrollTop = qaHistory.scrollHeight;
-      })
-      .catch(error => {
+      }).catch(error => {
         console.error('聊天请求失败:', error);
-        if (thinkingMsg) {
-          thinkingMsg.remove();
-          thinkingMsg = null;
-        }
-        qaHistory.innerHTML += `<div class='msg error-msg'>⚠️ 网络错误或服务器无响应。</div>`;
+        removeThinking();
+        qaHistory.insertAdjacentHTML('beforeend', `<div class='msg error-msg'>⚠️ 网络错误或服务器无响应。</div>`);
         qaHistory.scrollTop = qaHistory.scrollHeight;
       });
     });
   }
 
+  // 渲染推荐学习资源
+  function renderResources(resources) {
+    if (resources && resources.length > 0) {
+      let links = `<div class="resource-list"><h4>📚 相关学习资源推荐：</h4><ul>`;
+      for (const res of resources) {
+        links += `<li><a href='${res.url}' target='_blank'>${res.title}</a> - ${res.snippet}</li>`;
+      }
+      links += `</ul></div>`;
+      resourceRecommend.innerHTML = links;
+    } else {
+      resourceRecommend.innerHTML = '';
+    }
+  }
+
   // 允许回车发送消息
   if (qaInput) {
     qaInput.addEventListener('keydown', (event) => {
@@ -1844,4 +1962,128 @@ function showNotification(title, message, type = 'info') {
       notification.remove();
     }, 300);
   }, 5000);
-}
\ No newline at end of file
+}
+// 保护所有LaTeX公式，防止被marked破坏
+function protectLatexBlocks(md) {
+  let blocks = [];
+  md = md.replace(/\$\$([\s\S]*?)\$\$/g, function(match, p1) {
+    blocks.push(p1);
+    return `@@LATEX_BLOCK_${blocks.length - 1}@@`;
+  });
+  let inlines = [];
+  md = md.replace(/\$([^\$\n]+?)\$/g, function(match, p1) {
+    inlines.push(p1);
+    return `@@LATEX_INLINE_${inlines.length - 1}@@`;
+  });
+  return {md, blocks, inlines};
+}
+
+function restoreLatexBlocks(html, blocks, inlines) {
+  html = html.replace(/@@LATEX_BLOCK_(\d+)@@/g, function(match, idx) {
+    return `$$${blocks[parseInt(idx)]}$$`;
+  });
+  html = html.replace(/@@LATEX_INLINE_(\d+)@@/g, function(match, idx) {
+    return `$${inlines[parseInt(idx)]}$`;
+  });
+  return html;
+}
+
+// Markdown转HTML（公式原样保留，交给MathJax渲染）
+function renderMarkdownWithLatex(text) {
+  const {md, blocks, inlines} = protectLatexBlocks(text);
+  const html = window.marked ? marked.parse(md) : md.replace(/\n/g, '<br>');
+  return restoreLatexBlocks(html, blocks, inlines);
+}
+
+// 增量渲染器：限制Markdown重绘频率，并串行执行MathJax排版，避免流式输出时反复阻塞页面
+function createIncrementalRenderer(interval = 100) {
+  let lastRender = 0;
+  let timer = null;
+  let typesetting = null;
+  let typesetPending = false;
+
+  function typeset(element) {
+    if (!(window.MathJax && MathJax.typesetPromise)) return;
+    if (typesetting) {
+      typesetPending = true;
+      return;
+    }
+    typesetting = MathJax.typesetPromise([element])
+      .catch(err => console.warn('MathJax渲染失败:', err))
+      .then(() => {
+        typesetting = null;
+        if (typesetPending) {
+          typesetPending = false;
+          typeset(element);
+        }
+      });
+  }
+
+  function draw(element, text) {
+    lastRender = Date.now();
+    if (window.MathJax && MathJax.typesetClear) MathJax.typesetClear([element]);
+    element.innerHTML = renderMarkdownWithLatex(text);
+    if (text.indexOf('$') !== -1) typeset(element);
+  }
+
+  return {
+    render(element, text) {
+      clearTimeout(timer);
+      const wait = interval - (Date.now() - lastRender);
+      if (wait <= 0) {
+        draw(element, text);
+      } else {
+        timer = setTimeout(() => draw(element, text), wait);
+      }
+    },
+    flush(element, text) {
+      clearTimeout(timer);
+      draw(element, text);
+    }
+  };
+}
+
+// 调用流式问答接口，按SSE事件名分发给 handlers 中的同名回调
+async function streamChat(requestData, handlers) {
+  const response = await fetch('/api/chat/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(requestData)
+  });
+
+  if (!response.ok || !response.body) {
+    const data = await response.json().catch(() => ({ message: `HTTP ${response.status}` }));
+    handlers.error && handlers.error({ message: data.message || '请求失败' });
+    return;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder('utf-8');
+  let buffer = '';
+
+  function dispatch(frame) {
+    let event = 'message';
+    const dataLines = [];
+    for (const line of frame.split('\n')) {
+      if (line.startsWith('event:')) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        dataLines.push(line.slice(5).replace(/^ /, ''));
+      }
+    }
+    if (!dataLines.length || !handlers[event]) return;
+    handlers[event](JSON.parse(dataLines.join('\n')));
+  }
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      dispatch(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+    }
+  }
+  if (buffer.trim()) dispatch(buffer);
+}
@@ -0,0 +1,17 @@
+import os
+import sys
+
+# 测试直接导入 Knowledge_graph 目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import pytest
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """以测试配置导入 app 模块（在临时目录中导入，避免写入仓库内的日志和上传目录）"""
+    monkeypatch.setenv('FLASK_CONFIG', 'testing')
+    monkeypatch.chdir(tmp_path)
+    import app
+    return app
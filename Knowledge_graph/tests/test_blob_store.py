@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+import blob_store
+from blob_store import acquire_blob, open_document, release_blob, replace_blob, text_digest
+from migrations import run_migrations
+
+
+@pytest.fixture
+def db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "kg.db"))
+    run_migrations(conn)
+    return conn
+
+
+def blob_rows(db):
+    return db.execute("SELECT hash, refcount FROM document_blobs").fetchall()
+
+
+def test_identical_documents_share_one_compressed_blob(db):
+    text = "知识图谱" * 5000
+    first, second = acquire_blob(db, text), acquire_blob(db, text)
+    assert first == second == text_digest(text)
+    assert blob_rows(db) == [(first, 2)]
+    stored = db.execute("SELECT length(data), length FROM document_blobs").fetchone()
+    assert stored[0] < len(text.encode("utf-8")) / 10 and stored[1] == len(text)
+
+    release_blob(db, first)
+    assert blob_rows(db) == [(first, 1)]
+    release_blob(db, first)
+    assert blob_rows(db) == []
+
+
+def test_replacing_document_moves_the_reference(db):
+    old = acquire_blob(db, "旧文档")
+    assert replace_blob(db, old, "旧文档") == old
+    assert blob_rows(db) == [(old, 1)]
+    new = replace_blob(db, old, "新文档")
+    assert blob_rows(db) == [(new, 1)]
+
+
+def test_lazy_document_decompresses_only_when_text_is_read(db, monkeypatch):
+    text = "第一章 知识点" * 100
+    db.execute("INSERT INTO topologies (id, content_hash) VALUES ('t1', ?)", (acquire_blob(db, text),))
+    calls = []
+    original = blob_store.decompress_text
+    monkeypatch.setattr(blob_store, "decompress_text", lambda *args: calls.append(1) or original(*args))
+
+    document = open_document(db, "t1")
+    assert len(document) == len(text) and document.preview == text[:blob_store.PREVIEW_CHARS]
+    assert calls == []
+    assert document.text == text and document.text == text
+    assert calls == [1]
+    assert open_document(db, "missing") is None
+
+
+def test_legacy_inline_content_is_moved_into_blobs(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "kg.db"))
+    db.executescript("""
+        CREATE TABLE topologies (id TEXT PRIMARY KEY, content TEXT NOT NULL, max_nodes INTEGER DEFAULT 0, created_at TEXT);
+        INSERT INTO topologies (id, content) VALUES ('t1', '同一份文档'), ('t2', '同一份文档'), ('t3', '另一份');
+    """)
+    run_migrations(db)
+    assert "content" not in [row[1] for row in db.execute("PRAGMA table_info(topologies)")]
+    assert open_document(db, "t2").text == "同一份文档"
+    assert sorted(refcount for _, refcount in blob_rows(db)) == [1, 2]
@@ -0,0 +1,106 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from chat_fanout import ChatFanOut, collect_stream
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_branches_run_concurrently_with_partial_results(executor):
+    def slow(cancel_event, value):
+        time.sleep(0.2)
+        return value
+
+    def broken(cancel_event):
+        raise RuntimeError("上游错误")
+
+    branches = ChatFanOut(executor)
+    start = time.perf_counter()
+    branches.submit("a", slow, 5, "A")
+    branches.submit("b", slow, 5, "B")
+    branches.submit("c", broken, 5)
+    assert branches.result("a").value == "A" and branches.result("b").value == "B"
+    failed = branches.result("c")
+    assert not failed.ok and "上游错误" in failed.error
+    assert time.perf_counter() - start < 0.35
+
+
+def test_timed_out_stream_branch_is_cancelled_and_closed(executor):
+    closed = threading.Event()
+
+    def deltas():
+        try:
+            while True:
+                time.sleep(0.01)
+                yield "片段"
+        finally:
+            closed.set()
+
+    branches = ChatFanOut(executor)
+    branches.submit("web", lambda cancel_event: collect_stream(deltas(), cancel_event), 0.1)
+    result = branches.result("web")
+    assert (result.ok, result.error) == (False, "timeout")
+    assert closed.wait(1)
+    assert branches.stats["web_timeouts"] == 1 and branches.stats["web_cancelled"] == 1
+
+
+@pytest.fixture
+def chat_app(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DATABASE", str(tmp_path / "kg.db"))
+    app_module.init_db()
+    with app_module.app.app_context():
+        db = app_module.get_db()
+        with db:
+            app_module.index_document(db, "t1", "梯度下降是一种优化算法，沿负梯度方向迭代更新参数。")
+    return app_module
+
+
+def test_doc_answer_accepted_cancels_speculative_web(chat_app, monkeypatch):
+    web_closed = threading.Event()
+
+    def fake_stream(messages, max_tokens, call_site, user_id=None):
+        if call_site == "doc_answer":
+            time.sleep(0.1)
+            yield "梯度下降是一种优化算法。"
+            return
+        try:
+            while True:
+                time.sleep(0.02)
+                yield "网络"
+        finally:
+            web_closed.set()
+
+    monkeypatch.setattr(chat_app, "stream_chat_completion", fake_stream)
+    monkeypatch.setattr(chat_app, "recommend_resources_based_on_question",
+                        lambda question, user_id=None: time.sleep(0.1) or [{"title": "t"}])
+    start = time.perf_counter()
+    body = chat_app.app.test_client().post("/api/chat", json={"question": "什么是梯度下降", "topology_id": "t1"}).get_json()
+    assert body["source"] == "document" and body["answer"] == "梯度下降是一种优化算法。"
+    assert body["resources"] == [{"title": "t"}] and "errors" not in body
+    assert time.perf_counter() - start < 0.5
+    assert web_closed.wait(1)
+
+
+def test_failed_branches_return_partial_results(chat_app, monkeypatch):
+    def fake_stream(messages, max_tokens, call_site, user_id=None):
+        if call_site == "doc_answer":
+            raise RuntimeError("文档回答失败")
+        yield "网络回答"
+
+    def broken_resources(question, user_id=None):
+        raise RuntimeError("推荐失败")
+
+    monkeypatch.setattr(chat_app, "stream_chat_completion", fake_stream)
+    monkeypatch.setattr(chat_app, "recommend_resources_based_on_question", broken_resources)
+    body = chat_app.app.test_client().post("/api/chat", json={"question": "什么是梯度下降", "topology_id": "t1"}).get_json()
+    assert body["status"] == "success"
+    assert (body["source"], body["answer"], body["resources"]) == ("web", "网络回答", [])
+    assert set(body["errors"]) == {"doc", "resources"}
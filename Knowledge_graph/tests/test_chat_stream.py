@@ -0,0 +1,103 @@
+import json
+import types
+
+import pytest
+
+
+class FakeStream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.closed = False
+        self.response = types.SimpleNamespace(close=self._close)
+
+    def _close(self):
+        self.closed = True
+
+    def __iter__(self):
+        for piece in self.pieces:
+            delta = types.SimpleNamespace(content=piece)
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+
+def _fake_client(answers, streams):
+    """answers: 按系统提示词关键字选择的流式回复片段"""
+    def create(model, messages, max_tokens, stream=False):
+        system = messages[0]["content"]
+        key = "doc" if "文档检索" in system else "web"
+        stream_obj = FakeStream(answers[key])
+        streams.append((key, stream_obj))
+        return stream_obj
+
+    return types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+
+
+def _events(body):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = frame.split("\n")
+        event = lines[0][len("event: "):]
+        data = json.loads(lines[1][len("data: "):])
+        events.append((event, data))
+    return events
+
+
+@pytest.fixture
+def stream_app(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "recommend_resources_based_on_question",
+                        lambda question, user_id=None: [{"title": "t", "url": "u", "snippet": "s"}])
+    monkeypatch.setattr(app_module, "DATABASE", str(tmp_path / "kg.db"))
+    app_module.init_db()
+    with app_module.app.app_context():
+        db = app_module.get_db()
+        with db:
+            app_module.index_document(db, "t1", "文档内容：梯度下降是一种优化算法。动量法可以加速收敛。")
+    return app_module
+
+
+def test_document_answer_is_streamed_token_by_token(stream_app, monkeypatch):
+    streams = []
+    pieces = ["梯度下降", "是一种通过沿负梯度方向", "迭代更新参数的", "优化算法。"]
+    monkeypatch.setattr(stream_app, "get_openai_client", lambda: _fake_client({"doc": pieces}, streams))
+    response = stream_app.app.test_client().post("/api/chat/stream", json={"question": "什么是梯度下降", "topology_id": "t1"})
+    assert response.mimetype == "text/event-stream"
+    events = _events(response.get_data(as_text=True))
+    assert events[0] == ("source", {"source": "document"})
+    tokens = [data["text"] for event, data in events if event == "token"]
+    assert "".join(tokens) == "".join(pieces)
+    assert len(tokens) > 1
+    assert events[-2][0] == "resources"
+    assert events[-1] == ("done", {"source": "document"})
+
+
+def test_doc_prompt_contains_only_retrieved_passages(stream_app, monkeypatch):
+    prompts = []
+
+    def fake_stream(messages, *args, **kwargs):
+        prompts.append(messages[1]["content"])
+        yield "答"
+
+    monkeypatch.setattr(stream_app, "stream_chat_completion", fake_stream)
+    response = stream_app.app.test_client().post("/api/chat/stream",
+                                                 json={"question": "什么是梯度下降", "topology_id": "t1"})
+    assert _events(response.get_data(as_text=True))[0] == ("source", {"source": "document"})
+    assert "梯度下降是一种优化算法" in prompts[0]
+
+
+def test_low_retrieval_score_goes_straight_to_web(stream_app, monkeypatch):
+    streams = []
+    answers = {"doc": ["不应调用"], "web": ["网络", "回答"]}
+    monkeypatch.setattr(stream_app, "get_openai_client", lambda: _fake_client(answers, streams))
+    response = stream_app.app.test_client().post("/api/chat/stream",
+                                                 json={"question": "量子计算的原理", "topology_id": "t1"})
+    events = _events(response.get_data(as_text=True))
+    assert ("source", {"source": "document"}) not in events
+    assert events[0] == ("source", {"source": "web"})
+    assert "".join(d["text"] for e, d in events if e == "token") == "网络回答"
+    assert events[-1] == ("done", {"source": "web"})
+    # 检索覆盖率不足：不发起文档问答调用
+    assert [key for key, _ in streams] == ["web"]
+
+
+def test_empty_question_is_rejected(stream_app):
+    response = stream_app.app.test_client().post("/api/chat/stream", json={"question": " "})
+    assert response.status_code == 400
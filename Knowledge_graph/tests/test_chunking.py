@@ -0,0 +1,57 @@
+from chunking import estimate_tokens, split_text_into_chunks, _split_sentences
+
+
+def _overlap(a, b):
+    return a.end - b.start
+
+
+def test_estimate_tokens_counts_cjk_per_char_and_ascii_per_four_chars():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("知识图谱") == 4
+    assert estimate_tokens("abcdefgh") == 2
+
+
+def test_short_text_is_single_chunk():
+    chunks = split_text_into_chunks("短文本。", 100, 10)
+    assert len(chunks) == 1
+    assert chunks[0].text == "短文本。"
+    assert split_text_into_chunks("   ", 100) == []
+
+
+def test_english_sentences_split_on_period_but_not_decimals_or_abbreviations():
+    text = "Pi is 3.14 roughly. See e.g. this example. Next one! Last"
+    sentences = [text[s:e] for s, e in _split_sentences(text)]
+    assert sentences == ["Pi is 3.14 roughly. ", "See e.g. this example. ", "Next one! ", "Last"]
+
+
+def test_chunks_respect_token_budget_and_cover_text():
+    text = "机器学习是人工智能的分支。" * 300 + "Deep learning uses neural nets. " * 200
+    chunks = split_text_into_chunks(text, 500, 50)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c.text) <= 500 for c in chunks)
+    assert chunks[0].start == 0 and chunks[-1].end == len(text)
+    assert all(c.text == text[c.start:c.end] for c in chunks)
+    assert all(_overlap(a, b) >= 0 for a, b in zip(chunks, chunks[1:]))
+
+
+def test_consecutive_chunks_overlap_including_hard_split_pieces():
+    text = "第一句话。" * 5000 + "English sentence here. " * 2000
+    chunks = split_text_into_chunks(text, 6000, 300)
+    assert all(estimate_tokens(c.text) <= 6000 for c in chunks)
+    assert all(_overlap(a, b) > 0 for a, b in zip(chunks, chunks[1:]))
+
+
+def test_hard_split_of_long_sentence_keeps_overlap():
+    text = "字" * 2000
+    chunks = split_text_into_chunks(text, 300, 30)
+    assert all(estimate_tokens(c.text) <= 300 for c in chunks)
+    assert all(_overlap(a, b) == 30 for a, b in zip(chunks, chunks[1:]))
+
+
+def test_hard_split_does_not_cut_english_words():
+    text = "word " * 3000
+    chunks = split_text_into_chunks(text, 300, 30)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.text.strip().split(" ")[0] == "word"
+        assert chunk.text.strip().split(" ")[-1] == "word"
@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+
+from compact_graph import CompactGraph
+from graph_core import GraphIndex
+
+
+def _random_triples(seed, n_nodes=60, n_edges=120):
+    rng = random.Random(seed)
+    triples = []
+    for _ in range(n_edges):
+        a, b = rng.randrange(n_nodes), rng.randrange(n_nodes)
+        if a != b:
+            triples.append([f"n{a}", rng.choice(["包含", "属于"]), f"n{b}"])
+    return triples
+
+
+def test_levels_and_roots_match_graph_index():
+    for seed in range(20):
+        triples = _random_triples(seed)
+        index = GraphIndex.from_triples(triples)
+        graph = CompactGraph.from_triples(triples)
+        assert graph.labels == index.labels
+        assert graph.roots().tolist() == index.roots()
+        assert graph.level.tolist() == index.levels()
+        assert graph.root_label() == index.root_label()
+
+
+def test_cycle_fed_by_another_cycle_is_not_a_root():
+    graph = CompactGraph.from_triples([["C", "包含", "D"], ["A", "包含", "B"], ["B", "包含", "A"],
+                                       ["D", "包含", "C"], ["B", "包含", "C"]])
+    assert [graph.labels[node] for node in graph.roots()] == ["A"]
+    assert dict(zip(graph.labels, graph.level.tolist())) == {"C": 2, "D": 3, "A": 0, "B": 1}
+
+
+def test_degree_and_pagerank():
+    graph = CompactGraph.from_triples([["根", "包含", "A"], ["根", "包含", "B"], ["A", "包含", "C"], ["B", "包含", "C"]])
+    assert graph.value.tolist() == [2, 2, 2, 2]
+    assert np.isclose(graph.centrality.sum(), 1.0)
+    assert graph.centrality.argmax() == graph.index["C"]
+
+
+def test_relations_are_interned_and_rows_round_trip():
+    triples = [["根", "包含", "A"], ["根", "包含", "B"], ["A", "属于", "B"]]
+    graph = CompactGraph.from_triples(triples)
+    assert graph.relations == ["包含", "属于"]
+    assert [[src, rel, tgt] for src, tgt, rel in graph.edge_rows()] == triples
+    graph.set_snippets({"A": "……A……"})
+    graph.apply_mastery({"B": {"mastered": 1, "mastery_score": 80, "consecutive_correct": 2}, "X": {}})
+    rows = {row[0]: row for row in graph.node_rows()}
+    assert rows["A"][7] == "……A……"
+    assert rows["B"][4:7] == (1, 80.0, 2)
+
+
+def test_to_vis_matches_frontend_format():
+    vis = CompactGraph.from_triples([["根", "包含", "A"]]).to_vis()
+    assert vis["root"] == "根"
+    assert vis["edges"] == [{"from": "根", "to": "A", "label": "包含", "title": "包含",
+                             "arrows": "to", "font": {"align": "middle"}}]
+    node = vis["nodes"][1]
+    assert node["id"] == "A" and node["level"] == 1 and node["value"] == 1 and node["mastered"] is False
+    assert isinstance(node["level"], int) and isinstance(node["centrality"], float)
@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db_pool import PoolTimeoutError, SQLitePool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLitePool(str(tmp_path / "kg.db"), max_connections=2, acquire_timeout=0.2)
+    with pool.connection() as db:
+        db.execute("CREATE TABLE answers (id INTEGER PRIMARY KEY, worker INTEGER)")
+        db.commit()
+    yield pool
+    pool.close_all()
+
+
+def test_connections_use_wal_and_tuned_pragmas(pool):
+    with pool.connection() as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert db.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert db.execute("PRAGMA cache_size").fetchone()[0] == -16384
+
+
+def test_readonly_connection_rejects_writes(pool):
+    with pool.connection(readonly=True) as db:
+        assert db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 0
+        with pytest.raises(sqlite3.OperationalError):
+            db.execute("INSERT INTO answers (worker) VALUES (1)")
+
+
+def test_nested_acquire_in_same_thread_reuses_connection(pool):
+    outer = pool.acquire()
+    inner = pool.acquire()
+    assert inner is outer
+    pool.release(inner)
+    assert pool.stats()["in_use"] == 1
+    pool.release(outer)
+    assert pool.stats()["in_use"] == 0 and pool.stats()["idle"] == 1
+
+
+def test_pool_is_bounded_and_times_out(pool):
+    held = []
+    ready = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        conn = pool.acquire()
+        held.append(conn)
+        ready.set()
+        done.wait()
+        pool.release(conn)
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        ready.wait()
+        ready.clear()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    done.set()
+    for thread in threads:
+        thread.join()
+    assert pool.stats()["timeouts"] == 1
+    with pool.connection() as db:
+        assert db in held
+
+
+def test_release_rolls_back_uncommitted_work(pool):
+    with pool.connection() as db:
+        db.execute("INSERT INTO answers (worker) VALUES (1)")
+    with pool.connection() as db:
+        assert db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 0
+    assert pool.stats()["rollbacks"] == 1
+
+
+def test_concurrent_writers_and_readers_do_not_hit_locks(pool):
+    errors = []
+
+    def write(worker):
+        try:
+            for _ in range(50):
+                with pool.connection() as db:
+                    db.execute("SELECT COUNT(*) FROM answers WHERE worker = ?", (worker,)).fetchone()
+                    db.execute("INSERT INTO answers (worker) VALUES (?)", (worker,))
+                    db.commit()
+                with pool.connection(readonly=True) as db:
+                    db.execute("SELECT COUNT(*) FROM answers").fetchone()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with pool.connection(readonly=True) as db:
+        assert db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 300
@@ -0,0 +1,104 @@
+import sqlite3
+
+import pytest
+
+from doc_search import (assemble_passages, build_match_query, index_document, index_unindexed_documents,
+                        retrieval_terms, retrieve_passages, search_document, segment, term_coverage)
+from migrations import run_migrations
+
+DOCUMENT = (
+    "机器学习是人工智能的一个分支。"
+    "深度学习使用多层神经网络学习特征表示。"
+    "知识图谱以三元组表示实体之间的关系。"
+    "Transformer models use self-attention <b>layers</b>."
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "kg.db"))
+    run_migrations(conn)
+    return conn
+
+
+def test_chinese_words_of_any_length_are_searchable(db):
+    assert segment("学习AI") == "学\u200b习\u200bAI"
+    index_document(db, "t1", DOCUMENT, max_tokens=20)
+    results = search_document(db, "t1", "什么是神经网络")
+    assert results and "<mark>神经网络</mark>" in results[0]["highlight"]
+    top = results[0]
+    assert "神经网络" in DOCUMENT[top["start"]:top["end"]]
+    assert search_document(db, "t1", "图谱")[0]["highlight"].count("<mark>") == 1
+
+
+def test_results_are_ranked_and_highlights_escaped(db):
+    index_document(db, "t1", DOCUMENT, max_tokens=20)
+    results = search_document(db, "t1", "深度学习")
+    assert "深度学习" in results[0]["highlight"].replace("<mark>", "").replace("</mark>", "")
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+    english = search_document(db, "t1", "attention layers")[0]["highlight"]
+    assert "&lt;b&gt;<mark>layers</mark>&lt;/b&gt;" in english
+
+
+def test_search_is_scoped_to_topology_and_reindex_replaces(db):
+    index_document(db, "t-1", DOCUMENT)
+    index_document(db, "t-2", "操作系统负责进程调度。")
+    assert search_document(db, "t-1", "进程调度") == []
+    assert search_document(db, "t-2", "进程调度")
+    index_document(db, "t-2", "数据库使用索引加速查询。")
+    assert search_document(db, "t-2", "进程调度") == []
+    assert build_match_query("t-1", "？！") is None
+
+
+def test_search_endpoint_returns_passages(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DATABASE", str(tmp_path / "kg.db"))
+    app_module.init_db()
+    with app_module.app.app_context():
+        db = app_module.get_db()
+        with db:
+            index_document(db, "t1", DOCUMENT, max_tokens=20)
+
+    client = app_module.app.test_client()
+    body = client.get("/api/topology/t1/search?q=知识图谱&limit=1").get_json()
+    assert body["status"] == "success" and len(body["results"]) == 1
+    assert "<mark>知识图谱</mark>" in body["results"][0]["highlight"]
+    assert client.get("/api/topology/t1/search?q=").status_code == 400
+
+
+def test_retrieval_coverage_ignores_question_words(db):
+    index_document(db, "t1", DOCUMENT, max_tokens=20)
+    assert retrieval_terms("什么是神经网络？") == {"神经", "经网", "网络"}
+    assert term_coverage(retrieve_passages(db, "t1", "什么是神经网络？"), "什么是神经网络？") == 1.0
+    assert term_coverage(retrieve_passages(db, "t1", "量子计算的原理"), "量子计算的原理") == 0.0
+
+
+def test_assembled_passages_fit_budget_in_document_order(db):
+    index_document(db, "t1", DOCUMENT, max_tokens=20)
+    passages = retrieve_passages(db, "t1", "知识图谱 深度学习 机器学习")
+    context = assemble_passages(passages, budget_tokens=200)
+    assert context.index("机器学习") < context.index("深度学习") < context.index("知识图谱")
+    assert len(assemble_passages(passages, budget_tokens=25)) <= 25
+
+
+def test_documents_uploaded_before_the_index_are_backfilled(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    conn.executescript("""
+        CREATE TABLE topologies (id TEXT PRIMARY KEY, content TEXT NOT NULL, max_nodes INTEGER DEFAULT 0, created_at TEXT);
+        INSERT INTO topologies (id, content) VALUES ('old', '知识图谱以三元组表示实体之间的关系。');
+    """)
+    run_migrations(conn)
+    assert search_document(conn, "old", "三元组") == []
+    with conn:
+        assert index_unindexed_documents(conn) == 1
+    assert search_document(conn, "old", "三元组")
+    assert index_unindexed_documents(conn) == 0
+
+
+def test_scores_use_statistics_of_the_topology_only(db):
+    index_document(db, "t1", DOCUMENT, max_tokens=20)
+    before = [(r["chunk_index"], r["score"]) for r in search_document(db, "t1", "深度学习 知识图谱")]
+    for i in range(5):
+        index_document(db, f"other-{i}", "深度学习深度学习深度学习。" * 20 + "知识图谱。", max_tokens=20)
+    after = [(r["chunk_index"], r["score"]) for r in search_document(db, "t1", "深度学习 知识图谱")]
+    assert before and after == before
+    assert db.execute("SELECT chunk_count FROM document_index_stats WHERE topology_id = 't1'").fetchone()[0] == 4
@@ -0,0 +1,59 @@
+from entity_index import EntityIndex, canonical_key, normalize_label, split_alias
+
+
+def test_normalize_label_handles_width_punctuation_and_enumeration():
+    assert normalize_label("ＣＮＮ") == "CNN"
+    assert normalize_label("“机器学习”。") == "机器学习"
+    assert normalize_label("1. 神经网络 ") == "神经网络"
+    assert normalize_label("《算法导论》") == "算法导论"
+    assert normalize_label("C++") == "C++"
+
+
+def test_canonical_key_folds_case_spacing_and_plurals():
+    assert canonical_key("Neural Networks") == canonical_key("neural network")
+    assert canonical_key("Python 编程") == canonical_key("python编程")
+    assert canonical_key("Classes") == canonical_key("class")
+    assert canonical_key("Analysis") == "analysis"
+    assert canonical_key("Categories") == canonical_key("category")
+    assert canonical_key("Caches") == canonical_key("cache")
+
+
+def test_canonical_key_does_not_merge_false_plurals():
+    for word in ("news", "physics", "series", "mathematics", "species", "bias", "statistics"):
+        assert canonical_key(word) == word
+    assert canonical_key("new") != canonical_key("news")
+    assert canonical_key("Movies") == canonical_key("movie")
+    index = EntityIndex()
+    assert index.canonicalize([["news", "包含", "new"], ["Physics", "包含", "physic"]]) == [
+        ["news", "包含", "new"], ["Physics", "包含", "physic"]]
+
+
+def test_split_alias_only_for_cross_language_parentheses():
+    assert split_alias("机器学习(Machine Learning)") == ("机器学习", "Machine Learning")
+    assert split_alias("Machine Learning(机器学习)") == ("Machine Learning", "机器学习")
+    assert split_alias("栈(数据结构)") == ("栈(数据结构)", None)
+
+
+def test_canonicalize_merges_variants_and_rewrites_edges():
+    index = EntityIndex()
+    edges = index.canonicalize([
+        ["机器学习（Machine Learning）", "包含", "监督学习"],
+        ["machine learning", "包含", "监督学习。"],
+        ["Machine Learnings", "包含", "无监督学习"],
+        ["监督学习", "属于", "“监督学习”"],
+    ])
+    assert edges == [["机器学习", "包含", "监督学习"], ["机器学习", "包含", "无监督学习"]]
+
+
+def test_persisted_aliases_keep_node_ids_stable():
+    first = EntityIndex()
+    first.canonicalize([["深度学习(Deep Learning)", "包含", "CNN"]])
+    later = EntityIndex(first.aliases)
+    assert later.canonicalize([["deep learning", "包含", "ＣＮＮ"]]) == [["深度学习", "包含", "CNN"]]
+    assert later.added == {}
+
+
+def test_seeded_node_ids_take_precedence():
+    index = EntityIndex()
+    index.seed(["神经网络。"])
+    assert index.resolve("神经网络") == "神经网络。"
@@ -0,0 +1,63 @@
+import pytest
+
+from chunking import Chunk
+from extraction import merge_knowledge_edges, map_reduce_extract
+
+
+def test_merge_deduplicates_pairs_and_drops_invalid_items():
+    merged = merge_knowledge_edges([
+        [["A", "包含", "B"], [" A ", "属于", "B "], ["A", "包含", "A"], ["", "包含", "C"], ["bad"]],
+        [["B", "包含", "C"]],
+    ])
+    assert merged == [["A", "包含", "B"], ["B", "包含", "C"]]
+
+
+def test_merge_trims_to_most_frequent_nodes():
+    partial = [
+        [["根", "包含", "常见"], ["根", "包含", "罕见"]],
+        [["根", "包含", "常见"], ["常见", "包含", "次常见"]],
+        [["次常见", "包含", "常见"]],
+    ]
+    merged = merge_knowledge_edges(partial, max_nodes=3)
+    nodes = {label for edge in merged for label in (edge[0], edge[2])}
+    assert nodes == {"根", "常见", "次常见"}
+    assert ["根", "包含", "罕见"] not in merged
+
+
+def _chunks(n):
+    return [Chunk(i, i, i + 1, str(i)) for i in range(n)]
+
+
+def test_map_reduce_merges_in_chunk_order_and_reports_progress():
+    progress = []
+    result = map_reduce_extract(
+        _chunks(3),
+        lambda chunk: [["根", "包含", f"子{chunk.index}"]],
+        max_workers=3,
+        progress_callback=lambda done, total: progress.append((done, total)),
+    )
+    assert result == [["根", "包含", "子0"], ["根", "包含", "子1"], ["根", "包含", "子2"]]
+    assert progress[-1] == (3, 3)
+    assert len(progress) == 3
+
+
+def test_map_reduce_skips_failed_chunks():
+    def extract(chunk):
+        if chunk.index == 1:
+            raise RuntimeError("boom")
+        return [["根", "包含", f"子{chunk.index}"]]
+
+    result = map_reduce_extract(_chunks(3), extract, max_workers=2)
+    assert result == [["根", "包含", "子0"], ["根", "包含", "子2"]]
+
+
+def test_map_reduce_raises_when_all_chunks_fail():
+    def extract(chunk):
+        raise RuntimeError(f"boom {chunk.index}")
+
+    with pytest.raises(RuntimeError):
+        map_reduce_extract(_chunks(2), extract)
+
+
+def test_map_reduce_with_no_chunks_returns_empty():
+    assert map_reduce_extract([], lambda chunk: []) == []
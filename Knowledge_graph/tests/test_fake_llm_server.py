@@ -0,0 +1,83 @@
+import json
+import threading
+
+import openai
+import pytest
+from werkzeug.serving import make_server
+
+from fake_llm_server import create_fake_llm_app, fake_reply, truncate_to_tokens
+from llm_client import OpenAIClientManager
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(**options):
+        server = make_server("127.0.0.1", 0, create_fake_llm_app(**options), threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        manager = OpenAIClientManager("sk-fake", f"http://127.0.0.1:{server.server_port}", max_retries=0)
+        return manager.get_client()
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+EXTRACT_MESSAGES = [
+    {"role": "system", "content": "你是一个知识图谱构建专家，能够从文本中提取知识点并构建树形结构。"},
+    {"role": "user", "content": "请从下面文本中提取知识点及其层级关系：\n机器学习包括监督学习和无监督学习，监督学习包括回归与分类。"},
+]
+
+
+def test_replies_are_deterministic_and_prompt_shaped():
+    import random
+    first = fake_reply(EXTRACT_MESSAGES, random.Random(0))
+    assert first == fake_reply(EXTRACT_MESSAGES, random.Random(1))
+    edges = json.loads(first)
+    assert edges and all(len(edge) == 3 for edge in edges)
+    doc = [{"role": "system", "content": "你是一个文档检索助手。"},
+           {"role": "user", "content": "文档片段：天空是蓝色的。梯度下降是一种优化算法。\n用户问题：什么是梯度下降\n请用文档原文回答："}]
+    assert fake_reply(doc, random.Random(0)) == "梯度下降是一种优化算法。"
+
+
+def test_doc_answer_uses_passages_from_the_real_prompt_builder(app_module, tmp_path):
+    import random
+    import sqlite3
+    from doc_search import assemble_passages, index_document, retrieve_passages
+    from migrations import run_migrations
+
+    db = sqlite3.connect(str(tmp_path / "kg.db"))
+    run_migrations(db)
+    index_document(db, "t1", "梯度下降是一种优化算法，沿负梯度方向更新参数。" * 3 + "学习率决定每一步的步长。" * 3,
+                   max_tokens=20)
+    question = "学习率的作用是什么"
+    context = assemble_passages(retrieve_passages(db, "t1", question), 200)
+    messages = app_module.build_doc_search_messages(context, question)
+    assert fake_reply(messages, random.Random(0)) == "学习率决定每一步的步长。"
+    # 片段中没有句子与问题共享候选词时仍用片段回答（是否回退到网络回答由应用的覆盖率阈值决定）
+    messages = app_module.build_doc_search_messages(context, "请解释")
+    assert fake_reply(messages, random.Random(0)) in context
+
+
+def test_truncates_to_max_tokens():
+    text, finish_reason = truncate_to_tokens("知识" * 100, 10)
+    assert text == "知识" * 5 and finish_reason == "length"
+
+
+def test_completion_and_stream_through_openai_sdk(fake_server):
+    client = fake_server()
+    response = client.chat.completions.create(model="deepseek-chat", messages=EXTRACT_MESSAGES, max_tokens=1500)
+    content = response.choices[0].message.content
+    stream = client.chat.completions.create(model="deepseek-chat", messages=EXTRACT_MESSAGES,
+                                            max_tokens=1500, stream=True)
+    streamed = "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+    assert streamed == content
+    assert json.loads(content)
+
+
+def test_error_rate_injects_rate_limit_and_server_errors(fake_server):
+    client = fake_server(error_rate=1.0)
+    with pytest.raises((openai.RateLimitError, openai.InternalServerError)):
+        client.chat.completions.create(model="deepseek-chat", messages=EXTRACT_MESSAGES, max_tokens=100)
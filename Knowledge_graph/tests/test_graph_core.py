@@ -0,0 +1,39 @@
+from graph_core import GraphIndex
+
+
+def _levels(triples):
+    graph = GraphIndex.from_triples(triples)
+    return dict(zip(graph.labels, graph.levels()))
+
+
+def test_levels_are_shortest_distance_from_any_root():
+    levels = _levels([["根", "包含", "A"], ["A", "包含", "B"], ["B", "包含", "C"], ["根", "包含", "C"],
+                      ["另一根", "包含", "D"]])
+    assert levels == {"根": 0, "A": 1, "B": 2, "C": 1, "另一根": 0, "D": 1}
+
+
+def test_pure_cycle_and_cycle_below_root_get_levels():
+    levels = _levels([["X", "包含", "Y"], ["Y", "包含", "X"], ["Y", "包含", "Z"],
+                      ["根", "包含", "A"], ["A", "包含", "B"], ["B", "包含", "A"]])
+    assert levels == {"X": 0, "Y": 1, "Z": 2, "根": 0, "A": 1, "B": 2}
+
+
+def test_cycle_fed_by_another_cycle_is_not_a_root():
+    graph = GraphIndex.from_triples([["C", "包含", "D"], ["A", "包含", "B"], ["B", "包含", "A"],
+                                     ["D", "包含", "C"], ["B", "包含", "C"]])
+    assert [graph.labels[node] for node in graph.roots()] == ["A"]
+    assert dict(zip(graph.labels, graph.levels())) == {"A": 0, "B": 1, "C": 2, "D": 3}
+
+
+def test_deep_chain_does_not_recurse():
+    chain = [[f"n{i}", "包含", f"n{i + 1}"] for i in range(20000)]
+    graph = GraphIndex.from_triples(chain)
+    assert graph.levels()[-1] == 20000
+    assert graph.root_label() == "n0"
+
+
+def test_degrees_and_root_label():
+    graph = GraphIndex.from_triples([["A", "包含", "B"], ["A", "包含", "C"], ["B", "包含", "C"]])
+    assert [graph.degree(label) for label in "ABC"] == [2, 2, 2]
+    assert graph.root_label() == "A"
+    assert GraphIndex.from_triples([["A", "包含", "B"], ["B", "包含", "A"]]).root_label() == "A"
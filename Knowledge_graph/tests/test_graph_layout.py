@@ -0,0 +1,65 @@
+import sqlite3
+
+import numpy as np
+
+from compact_graph import CompactGraph
+from graph_layout import NODE_SPACING, LEVEL_SEPARATION
+
+
+def _positions(triples):
+    graph = CompactGraph.from_triples(triples)
+    x, y = graph.layout()
+    return graph, {label: (x[node], y[node]) for node, label in enumerate(graph.labels)}
+
+
+def test_parents_centered_over_subtrees_and_levels_stacked():
+    _, pos = _positions([["R", "包含", "A"], ["R", "包含", "B"], ["A", "包含", "C"], ["A", "包含", "D"],
+                         ["B", "包含", "E"], ["D", "相关", "E"]])
+    assert pos["A"][0] == (pos["C"][0] + pos["D"][0]) / 2
+    assert pos["R"][0] == (pos["C"][0] + pos["E"][0]) / 2
+    assert pos["C"][0] < pos["D"][0] < pos["E"][0]
+    assert {label: y for label, (_, y) in pos.items()} == {
+        "R": 0, "A": LEVEL_SEPARATION, "B": LEVEL_SEPARATION,
+        "C": 2 * LEVEL_SEPARATION, "D": 2 * LEVEL_SEPARATION, "E": 2 * LEVEL_SEPARATION}
+
+
+def test_nodes_on_a_level_never_overlap_and_forest_is_centered():
+    triples = [[f"n{i // 3}", "包含", f"n{i}"] for i in range(1, 200)] + [["另一根", "包含", "叶"]]
+    graph, pos = _positions(triples)
+    for depth in set(graph.level.tolist()):
+        xs = np.sort([pos[label][0] for node, label in enumerate(graph.labels) if graph.level[node] == depth])
+        assert np.all(np.diff(xs) >= NODE_SPACING)
+    assert pos["n0"][0] < pos["另一根"][0]
+    leaves = [x for x, _ in pos.values()]
+    assert np.isclose(min(leaves) + max(leaves), 0)
+
+
+def test_layout_computed_once_and_returned_with_nodes():
+    graph = CompactGraph.from_triples([["根", "包含", "A"]])
+    assert graph.layout() is graph.layout()
+    node = graph.to_vis()["nodes"][1]
+    assert (node["x"], node["y"]) == (0.0, LEVEL_SEPARATION)
+
+
+def test_saved_layout_served_from_database(app_module, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "kg.db")
+    conn = sqlite3.connect(db_path)
+    # 布局坐标列加入之前的旧表结构
+    conn.executescript("""
+        CREATE TABLE topologies (id TEXT PRIMARY KEY, content TEXT, max_nodes INTEGER, created_at TEXT, user_id TEXT);
+        CREATE TABLE nodes (id TEXT, topology_id TEXT, label TEXT, level INTEGER, value REAL, mastered INTEGER,
+                            mastery_score REAL, consecutive_correct INTEGER, content_snippet TEXT,
+                            PRIMARY KEY (topology_id, id));
+        CREATE TABLE edges (topology_id TEXT, from_node TEXT, to_node TEXT, label TEXT,
+                            PRIMARY KEY (topology_id, from_node, to_node));
+    """)
+    conn.close()
+    monkeypatch.setattr(app_module, "DATABASE", db_path)
+    graph = CompactGraph.from_triples([["根", "包含", "A"], ["根", "包含", "B"]])
+    app_module.save_to_database("t1", graph, "根 A B")
+
+    body = app_module.app.test_client().get("/api/topology/t1").get_json()
+    nodes = {node["id"]: node for node in body["data"]["nodes"]}
+    assert (nodes["A"]["x"], nodes["A"]["y"]) == (-NODE_SPACING / 2, LEVEL_SEPARATION)
+    assert nodes["根"]["x"] == 0
+    assert body["data"]["edges"][0]["from"] == "根"
@@ -0,0 +1,80 @@
+import time
+import sqlite3
+
+from compact_graph import CompactGraph
+from job_store import JobStore, COMPLETED, ERROR, PROCESSING
+from migrations import run_migrations
+
+
+def _connect(path):
+    db = sqlite3.connect(path)
+    run_migrations(db)
+    return db
+
+
+def test_job_state_is_shared_between_stores(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    # 两个 JobStore 各用自己的连接，相当于两个 worker 进程
+    worker_a, worker_b = JobStore(cache_ttl=0), JobStore(cache_ttl=0.2)
+    db_a, db_b = _connect(path), _connect(path)
+
+    worker_a.start(db_a, "t1", "开始处理文档...", max_nodes=20, user_id="alice")
+    worker_a.update(db_a, "t1", progress=60, message="提取中", node_count=5)
+    job = worker_b.get(db_b, "t1")
+    assert (job["status"], job["progress"], job["node_count"], job["max_nodes"]) == (PROCESSING, 60, 5, 20)
+
+    worker_a.finish(db_a, "t1", COMPLETED, "处理完成", node_count=9, edge_count=8, processing_time=1.5)
+    assert worker_b.get(db_b, "t1")["status"] == PROCESSING  # 读缓存未过期
+    time.sleep(0.25)
+    job = worker_b.get(db_b, "t1")
+    assert (job["status"], job["progress"], job["result_id"], job["processing_time"]) == (COMPLETED, 100, "t1", 1.5)
+    assert worker_b.get(db_b, "missing") is None
+    worker_a.update(db_a, "missing", progress=10, message="忽略")
+    assert worker_a.get(db_a, "missing") is None
+
+
+def test_read_cache_is_bounded_and_invalidated_by_local_writes(tmp_path):
+    store = JobStore(cache_size=2, cache_ttl=60)
+    db = _connect(str(tmp_path / "jobs.db"))
+    for topology_id in ("t1", "t2", "t3"):
+        store.start(db, topology_id, "开始")
+        store.get(db, topology_id)
+    assert store.stats()["cached"] == 2
+    store.update(db, "t3", progress=50, message="进行中")
+    assert store.get(db, "t3")["progress"] == 50
+
+
+def test_purge_expires_finished_and_interrupts_stale_jobs(tmp_path):
+    store = JobStore(retention=100, stale_after=50, purge_interval=0)
+    db = _connect(str(tmp_path / "jobs.db"))
+    store.start(db, "done", "开始")
+    store.finish(db, "done", ERROR, "无法解析文档内容")
+    store.start(db, "running", "开始")
+    finished_at = store.get(db, "done")["finished_at"]
+
+    assert store.purge(db, finished_at + 60) == 0
+    running = store.get(db, "running")
+    assert (running["status"], running["finished_at"]) == (ERROR, finished_at + 60)
+    assert store.purge(db, finished_at + 101) == 1
+    assert store.get(db, "done") is None and store.get(db, "running") is not None
+    assert store.stats()["interrupted"] == 1
+
+
+def test_status_and_topology_served_by_another_worker(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DATABASE", str(tmp_path / "kg.db"))
+    app_module.init_db()
+    with app_module.app.app_context():
+        app_module.job_store.start(app_module.get_db(), "t1", "开始处理文档...", 10, "alice")
+    graph = CompactGraph.from_triples([["根", "包含", "A"]])
+    app_module.save_to_database("t1", graph, "根 A", 10, "alice")
+    app_module.finish_job("t1", app_module.COMPLETED, "处理完成", node_count=2, edge_count=1, processing_time=3.2)
+
+    # 轮询落在另一个进程：新的 JobStore 没有本进程的缓存和部分图谱
+    monkeypatch.setattr(app_module, "job_store", JobStore())
+    client = app_module.app.test_client()
+    status = client.get("/api/topology/status/t1").get_json()["data"]
+    assert (status["status"], status["progress"], status["node_count"], status["max_nodes"]) == (COMPLETED, 100, 2, 10)
+    body = client.get("/api/topology/t1").get_json()
+    assert body["status"] == "success" and body["processing_time"] == 3.2
+    assert {node["id"] for node in body["data"]["nodes"]} == {"根", "A"}
+    assert client.get("/api/topology/status/missing").status_code == 404
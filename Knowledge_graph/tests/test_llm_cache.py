@@ -0,0 +1,87 @@
+import types
+
+import pytest
+
+from llm_cache import LLMCache, make_cache_key
+
+
+def test_cache_key_ignores_whitespace_differences_but_not_params():
+    a = make_cache_key("m", [{"role": "user", "content": "你好  世界\n"}], max_tokens=10)
+    b = make_cache_key("m", [{"role": "user", "content": "你好 世界"}], max_tokens=10)
+    c = make_cache_key("m", [{"role": "user", "content": "你好 世界"}], max_tokens=20)
+    assert a == b
+    assert a != c
+
+
+def test_get_set_and_stats(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"))
+    assert cache.get("k", "site") is None
+    cache.set("k", "m", "value", "site")
+    assert cache.get("k", "site") == "value"
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["call_sites"]["site"]["stores"] == 1
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "cache.db"), ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr("llm_cache.time.time", lambda: now[0])
+    cache.set("k", "m", "value")
+    now[0] += 11
+    assert cache.get("k") is None
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_entries=2)
+    now = [1000.0]
+    monkeypatch.setattr("llm_cache.time.time", lambda: now[0])
+    cache.set("a", "m", "1")
+    now[0] += 1
+    cache.set("b", "m", "2")
+    now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.set("c", "m", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def _fake_client(contents):
+    calls = []
+
+    def create(model, messages, max_tokens):
+        calls.append(messages)
+        content = contents[min(len(calls), len(contents)) - 1]
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))])
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    return client, calls
+
+
+@pytest.fixture
+def cached_app(app_module, tmp_path, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'LLM_CACHE_ENABLED', True)
+    monkeypatch.setattr(app_module, '_llm_cache', LLMCache(str(tmp_path / "llm_cache.db")))
+    return app_module
+
+
+def test_testing_config_disables_cache(app_module):
+    assert app_module.get_llm_cache() is None
+
+
+def test_invalid_response_is_not_cached(cached_app, monkeypatch):
+    client, calls = _fake_client(["not json", '[["A", "包含", "B"]]'])
+    monkeypatch.setattr(cached_app, 'get_openai_client', lambda: client)
+    messages = [{"role": "user", "content": "提取"}]
+
+    with pytest.raises(Exception):
+        cached_app.chat_completion(messages, 100, "extract_knowledge", parse=cached_app.parse_knowledge_edges)
+    assert cached_app.get_llm_cache().stats()["entries"] == 0
+
+    edges = cached_app.chat_completion(messages, 100, "extract_knowledge", parse=cached_app.parse_knowledge_edges)
+    assert edges == [["A", "包含", "B"]]
+    again = cached_app.chat_completion(messages, 100, "extract_knowledge", parse=cached_app.parse_knowledge_edges)
+    assert again == edges
+    assert len(calls) == 2
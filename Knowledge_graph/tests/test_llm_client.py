@@ -0,0 +1,36 @@
+import threading
+
+from llm_client import OpenAIClientManager
+
+
+def _manager():
+    return OpenAIClientManager(api_key="sk-test", base_url="http://127.0.0.1:9", connect_timeout=0.5, read_timeout=0.5)
+
+
+def test_client_is_shared_across_threads():
+    manager = _manager()
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(manager.get_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(client) for client in clients}) == 1
+    manager.close()
+
+
+def test_close_and_reset_recreate_client():
+    manager = _manager()
+    first = manager.get_client()
+    second = manager.reset()
+    assert first is not second
+    assert manager.get_client() is second
+    manager.close()
+
+
+def test_health_check_reports_unreachable_service():
+    manager = _manager()
+    health = manager.health_check()
+    assert health["healthy"] is False
+    assert health["error"]
+    manager.close()
@@ -0,0 +1,137 @@
+import time
+import asyncio
+import threading
+
+import httpx
+import openai
+import pytest
+
+import llm_gateway
+from llm_gateway import LLMGateway, TokenBucket, backoff_delay, get_retry_after
+
+
+def _rate_limit_error(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    request = httpx.Request("POST", "http://llm.test/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+@pytest.fixture
+def gateway():
+    gw = LLMGateway(max_concurrency=2, per_user_concurrency=1, requests_per_minute=0,
+                    max_retries=3, backoff_base=0.01, backoff_max=0.05)
+    yield gw
+    gw.shutdown()
+
+
+def test_backoff_delay_grows_with_jitter_and_is_capped():
+    for attempt in range(1, 6):
+        delay = backoff_delay(attempt, 1, 2, 5)
+        cap = min(5, 2 ** (attempt - 1))
+        assert cap / 2 <= delay <= cap
+
+
+def test_retry_after_header_is_read():
+    assert get_retry_after(_rate_limit_error(3)) == 3
+    assert get_retry_after(_rate_limit_error()) == 0
+    assert get_retry_after(ValueError("x")) == 0
+
+
+def test_token_bucket_waits_for_refill():
+    async def run():
+        bucket = TokenBucket(600)  # 10 tokens per second
+        await bucket.acquire(600)
+        start = time.monotonic()
+        await bucket.acquire(2)
+        return time.monotonic() - start
+
+    assert 0.15 <= asyncio.run(run()) < 1
+
+
+def test_sync_facade_returns_result(gateway):
+    assert gateway.call(lambda: 42) == 42
+    assert gateway.stats()["requests"] == 1
+
+
+def test_rate_limit_errors_are_retried_honoring_retry_after(gateway, monkeypatch):
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(llm_gateway.asyncio, "sleep", fake_sleep)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _rate_limit_error(0.2)
+        return "ok"
+
+    assert gateway.call(flaky) == "ok"
+    assert len(attempts) == 3
+    assert sleeps and all(delay >= 0.2 for delay in sleeps)
+    assert gateway.stats()["rate_limited"] == 2
+
+
+def test_non_retryable_errors_propagate_immediately(gateway):
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise KeyError("bad")
+
+    with pytest.raises(KeyError):
+        gateway.call(broken)
+    assert len(attempts) == 1
+
+
+def test_retry_on_adds_retryable_types_and_gives_up(gateway):
+    attempts = []
+
+    def unparsable():
+        attempts.append(1)
+        raise ValueError("bad json")
+
+    with pytest.raises(ValueError):
+        gateway.call(unparsable, retry_on=(ValueError,), max_retries=2)
+    assert len(attempts) == 2
+
+
+def test_per_user_concurrency_is_limited(gateway):
+    active = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.05)
+        with lock:
+            active["now"] -= 1
+        return True
+
+    threads = [threading.Thread(target=lambda: gateway.call(work, user_id="alice")) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert active["max"] == 1
+
+
+def test_idle_user_semaphores_are_released(gateway):
+    for user_id in ("alice", "bob", "carol"):
+        assert gateway.call(lambda: True, user_id=user_id)
+    assert list(gateway.stream(lambda: iter(["a", "b"]), user_id="dave")) == ["a", "b"]
+    partial = gateway.stream(lambda: iter(["a", "b"]), user_id="erin")
+    assert next(partial) == "a"
+    assert gateway.stats()["tracked_users"] == 1
+    partial.close()
+    deadline = time.time() + 1
+    while gateway.stats()["tracked_users"] and time.time() < deadline:
+        time.sleep(0.01)
+    stats = gateway.stats()
+    assert (stats["tracked_users"], stats["in_flight"], stats["requests"]) == (0, 0, 5)
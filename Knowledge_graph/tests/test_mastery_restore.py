@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def graph_app(app_module, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "kg.db")
+    monkeypatch.setattr(app_module, "DATABASE", db_path)
+    app_module.init_db()
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO nodes (topology_id, id, label, mastered, mastery_score, consecutive_correct) VALUES (?, ?, ?, ?, ?, ?)",
+        [("t1", "A", "A", 1, 90, 3), ("t1", "B", "B", 0, 40, 1), ("t2", "A", "A", 1, 100, 5)]
+    )
+    conn.commit()
+    conn.close()
+    saved = []
+    monkeypatch.setattr(app_module, "save_to_database", lambda *args, **kwargs: saved.append((args, kwargs)))
+    app_module.saved_graphs = saved
+    return app_module
+
+
+def test_load_mastery_states_reads_whole_topology(graph_app):
+    states = graph_app.load_mastery_states("t1")
+    assert set(states) == {"A", "B"}
+    assert states["A"]["mastery_score"] == 90
+
+
+def test_build_tree_structure_restores_states_with_one_query(graph_app, monkeypatch):
+    calls = []
+    original = graph_app.load_mastery_states
+    monkeypatch.setattr(graph_app, "load_mastery_states", lambda topology_id: calls.append(topology_id) or original(topology_id))
+    graph = graph_app.build_tree_structure([["A", "包含", "B"], ["A", "包含", "C"]], "t1", "A B C")
+    nodes = {node["id"]: node for node in graph.to_vis()["nodes"]}
+    assert calls == ["t1"]
+    assert nodes["A"]["mastered"] is True and nodes["A"]["consecutive_correct"] == 3
+    assert nodes["B"]["mastery_score"] == 40
+    assert nodes["C"]["mastered"] is False and nodes["C"]["mastery_score"] == 0
+
+
+def test_build_tree_structure_uses_states_passed_in(graph_app, monkeypatch):
+    def fail(topology_id):
+        raise AssertionError("不应再次读取掌握状态")
+
+    monkeypatch.setattr(graph_app, "load_mastery_states", fail)
+    states = {"B": {"mastered": 1, "mastery_score": 80, "consecutive_correct": 2}}
+    graph = graph_app.build_tree_structure([["A", "包含", "B"]], "t1", "A B", mastery_states=states)
+    nodes = {node["id"]: node for node in graph.to_vis()["nodes"]}
+    assert nodes["B"]["mastered"] is True and nodes["A"]["mastered"] is False
+
+
+def test_build_tree_structure_merges_aliases_onto_existing_nodes(graph_app):
+    graph = graph_app.build_tree_structure([["a。", "包含", "B"], ["A", "包含", "b"], ["A", "包含", "Ｃ"]], "t1", "A B C")
+    nodes = {node["id"]: node for node in graph.to_vis()["nodes"]}
+    assert set(nodes) == {"A", "B", "C"}
+    assert [(edge["from"], edge["to"]) for edge in graph.to_vis()["edges"]] == [("A", "B"), ("A", "C")]
+    assert nodes["A"]["mastery_score"] == 90
+    _, kwargs = graph_app.saved_graphs[-1]
+    assert kwargs["aliases"]["c"] == "C"
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+from migrations import MIGRATIONS, run_migrations
+
+LEGACY_SCHEMA = """
+CREATE TABLE topologies (id TEXT PRIMARY KEY, content TEXT NOT NULL, max_nodes INTEGER DEFAULT 0, created_at TEXT);
+CREATE TABLE nodes (id TEXT PRIMARY KEY, topology_id TEXT, label TEXT NOT NULL, level INTEGER DEFAULT 0,
+                    value REAL DEFAULT 1, mastered INTEGER DEFAULT 0, mastery_score REAL DEFAULT 0,
+                    consecutive_correct INTEGER DEFAULT 0, content_snippet TEXT);
+CREATE TABLE edges (topology_id TEXT, from_node TEXT, to_node TEXT, label TEXT,
+                    PRIMARY KEY (topology_id, from_node, to_node), FOREIGN KEY (from_node) REFERENCES nodes (id));
+CREATE TABLE quiz_sessions (id TEXT PRIMARY KEY, topology_id TEXT, node_id TEXT, created_at TEXT,
+                            consecutive_correct INTEGER DEFAULT 0, mastered INTEGER DEFAULT 0);
+INSERT INTO topologies (id, content) VALUES ('t1', '文档');
+INSERT INTO nodes (id, topology_id, label, mastery_score) VALUES ('A', 't1', 'A', 90);
+INSERT INTO edges VALUES ('t1', 'A', 'B', '包含');
+INSERT INTO quiz_sessions (id, topology_id, node_id) VALUES ('s1', 't1', 'A');
+"""
+
+
+def _plan(db, sql):
+    return " ".join(row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql).fetchall())
+
+
+def test_fresh_database_gets_every_migration_once(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "kg.db"))
+    assert run_migrations(db) == [version for version, _, _ in MIGRATIONS]
+    assert run_migrations(db) == []
+    db.execute("INSERT INTO nodes (topology_id, id, label) VALUES ('t1', 'A', 'A')")
+    db.execute("INSERT INTO nodes (topology_id, id, label) VALUES ('t2', 'A', 'A')")
+    assert db.execute("SELECT COUNT(*) FROM nodes").fetchone()[0] == 2
+
+
+def test_legacy_database_is_repaired_and_keeps_data(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "kg.db"))
+    db.executescript(LEGACY_SCHEMA)
+    run_migrations(db)
+    assert db.execute("SELECT mastery_score FROM nodes WHERE topology_id = 't1' AND id = 'A'").fetchone()[0] == 90
+    assert db.execute("SELECT label FROM edges WHERE topology_id = 't1'").fetchone()[0] == "包含"
+    db.execute("UPDATE quiz_sessions SET questions_answered = questions_answered + 1 WHERE id = 's1'")
+    assert db.execute("SELECT questions_answered FROM quiz_sessions").fetchone()[0] == 1
+    assert db.execute("SELECT user_id FROM topologies").fetchone()[0] == "anonymous"
+    db.execute("INSERT INTO nodes (topology_id, id, label) VALUES ('t2', 'A', 'A')")
+    assert "nodes_new" not in {row[0] for row in db.execute("SELECT name FROM sqlite_master")}
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "kg.db"))
+    run_migrations(db)
+    assert "USING COVERING INDEX idx_nodes_mastery" in _plan(
+        db, "SELECT id, mastered, mastery_score, consecutive_correct FROM nodes WHERE topology_id = 't1'")
+    assert "USING PRIMARY KEY" in _plan(db, "SELECT from_node, to_node, label FROM edges WHERE topology_id = 't1'")
+    assert "idx_questions_session" in _plan(db, "SELECT id FROM questions WHERE session_id = 's1'")
+    plan = _plan(db, "SELECT id, created_at FROM topologies WHERE user_id = 'u' ORDER BY created_at DESC")
+    assert "idx_topologies_user_created" in plan and "TEMP B-TREE" not in plan
+
+
+def test_failed_migration_is_rolled_back_and_not_recorded(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "kg.db"))
+
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        run_migrations(db, [(1, "broken", broken)])
+    assert db.execute("SELECT COUNT(*) FROM schema_migrations").fetchone()[0] == 0
+    assert db.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'half_done'").fetchone()[0] == 0
+
+
+def test_aliases_from_old_plural_rule_are_dropped(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "kg.db"))
+    run_migrations(db, [migration for migration in MIGRATIONS if migration[0] < 10])
+    db.executemany("INSERT INTO entity_aliases VALUES ('t1', ?, ?)", [
+        ("new", "news"), ("physic", "Physics"), ("news", "news"), ("machine learning", "机器学习"), ("栈", "Stacks")])
+    db.commit()
+    run_migrations(db)
+    assert sorted(db.execute("SELECT alias_key FROM entity_aliases").fetchall()) == [
+        ("machine learning",), ("news",), ("栈",)]
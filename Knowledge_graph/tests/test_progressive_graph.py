@@ -0,0 +1,87 @@
+import types
+
+from progressive_graph import ProgressiveGraph
+from triple_stream import IncrementalTripleParser
+
+
+def _feed_all(parser, pieces):
+    triples = []
+    for piece in pieces:
+        triples.extend(parser.feed(piece))
+    return triples
+
+
+def test_parser_emits_triples_as_soon_as_they_complete():
+    parser = IncrementalTripleParser()
+    assert parser.feed('```json\n[["机器学习", "包含", "监') == []
+    assert parser.feed('督学习"], ["监督') == [["机器学习", "包含", "监督学习"]]
+    assert parser.feed('学习", "包含", "回归"]]\n```') == [["监督学习", "包含", "回归"]]
+
+
+def test_parser_handles_brackets_and_escapes_inside_strings():
+    text = '[["数组[下标]", "包含", "转义\\"引号\\""], ["A\\\\", "包含", "B]"]]'
+    triples = _feed_all(IncrementalTripleParser(), list(text))
+    assert triples == [["数组[下标]", "包含", '转义"引号"'], ["A\\", "包含", "B]"]]
+
+
+def test_parser_skips_malformed_elements_and_continues():
+    parser = IncrementalTripleParser()
+    triples = parser.feed('[["A", "包含"], ["B", "包含", "C",], ["C", 属于, "D"], ["D", "包含", ["E"]]]')
+    assert triples == [["B", "包含", "C"], ["C", "属于", "D"]]
+    assert parser.skipped == 2
+
+
+def test_progressive_graph_snapshot_levels_and_dedup():
+    graph = ProgressiveGraph()
+    for triple in [["根", "包含", "A"], ["A", "包含", "B"], ["根", "属于", "A"], ["B", "包含", "B"],
+                   ["另一根", "包含", "C"]]:
+        graph.add_triple(triple)
+    snapshot = graph.snapshot()
+    levels = {node["id"]: node["level"] for node in snapshot["nodes"]}
+    assert levels == {"根": 0, "A": 1, "B": 2, "另一根": 0, "C": 1}
+    assert [(e["from"], e["to"], e["label"]) for e in snapshot["edges"]] == [
+        ("根", "A", "包含"), ("A", "B", "包含"), ("另一根", "C", "包含")]
+    assert snapshot["root"] == "根"
+    assert graph.snapshot() is snapshot
+    graph.add_triple(["C", "包含", "D"])
+    assert graph.snapshot() is not snapshot
+
+
+def test_processing_topology_returns_partial_graph(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DATABASE", str(tmp_path / "kg.db"))
+    app_module.init_db()
+    graph = ProgressiveGraph()
+    graph.add_triple(["根", "包含", "A"])
+    with app_module.app.app_context():
+        app_module.job_store.start(app_module.get_db(), "t-partial", "提取中")
+    app_module.update_progress("t-partial", 60, "提取中")
+    app_module.job_store.attach_partial("t-partial", graph)
+    try:
+        data = app_module.app.test_client().get("/api/topology/t-partial").get_json()
+    finally:
+        app_module.finish_job("t-partial", app_module.ERROR, "已取消")
+    assert data["status"] == "processing"
+    assert data["node_count"] == 2 and data["edge_count"] == 1
+    assert {node["id"] for node in data["partial_data"]["nodes"]} == {"根", "A"}
+
+
+class _FakeStream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.response = types.SimpleNamespace(close=lambda: None)
+
+    def __iter__(self):
+        for piece in self.pieces:
+            delta = types.SimpleNamespace(content=piece)
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+
+def test_streamed_extraction_reports_triples_incrementally(app_module, monkeypatch):
+    pieces = ['[["根", "包含", "A"],', ' ["A", "包含", "B"]]']
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(
+        create=lambda **kwargs: _FakeStream(pieces))))
+    monkeypatch.setattr(app_module, "get_openai_client", lambda: client)
+    seen = []
+    edges = app_module.extract_knowledge_from_chunk("足够长的文本内容", on_triple=seen.append)
+    assert seen == [["根", "包含", "A"], ["A", "包含", "B"]]
+    assert edges == [["根", "包含", "A"], ["A", "包含", "B"]]
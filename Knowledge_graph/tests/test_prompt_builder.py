@@ -0,0 +1,60 @@
+from chunking import estimate_tokens
+from prompt_builder import SPAN_SEPARATOR, compact_text, fit_document, query_terms
+
+
+def test_compact_text_drops_boilerplate_and_keeps_quotes_unescaped():
+    # PDF 各页以换页符分隔
+    text = "\f".join(f"机器学习讲义\n第{i}章 \"引言\"   介绍  C:\\path\n\n\n\n目录........12\n-----\n第 {i} 页\n"
+                      for i in range(1, 4))
+    compacted = compact_text(text)
+    assert "第 1 页" not in compacted and "目录" not in compacted and "-----" not in compacted
+    assert "机器学习讲义" not in compacted  # 重复出现的页眉
+    assert '第1章 "引言" 介绍 C:\\path' in compacted
+    assert "\n\n\n" not in compacted
+
+
+def test_compact_text_keeps_numeric_and_repeated_body_lines():
+    text = "解：\n1\n2\n3\n解：\nx=1\n解：\ny=2\n"
+    assert compact_text(text) == text.strip()
+    # 分页文本中只去掉页边的页码和多页重复的页眉，页中的数字行和重复行保留
+    pages = [f"讲义\n第{i}节\n{i}\n42\n解：\nx={i}\n正文{i}\n{i}" for i in range(1, 4)]
+    compacted = compact_text("\f".join(pages))
+    assert "讲义" not in compacted
+    assert compacted.split("\n")[:7] == ["第1节", "1", "42", "解：", "x=1", "正文1", "第2节"]
+    assert compacted.count("解：") == 3 and compacted.count("42") == 3
+
+
+def test_fit_document_returns_compacted_text_within_budget():
+    text, report = fit_document("  短文档。  ", 100)
+    assert text == "短文档。"
+    assert report["selected_passages"] is None
+
+
+def test_fit_document_selects_relevant_passages_in_original_order():
+    filler = "天气晴朗，适合出门散步。" * 30
+    text = "\n".join([filler, "梯度下降是一种优化算法，沿负梯度方向更新参数。", filler,
+                      "学习率决定梯度下降每一步的步长。", filler])
+    fitted, report = fit_document(text, 120, query="梯度下降的学习率", passage_tokens=40)
+    assert estimate_tokens(fitted) <= 120 + estimate_tokens(SPAN_SEPARATOR) * report["selected_passages"]
+    assert fitted.index("梯度下降是一种优化算法") < fitted.index("学习率决定")
+    assert report["selected_passages"] < report["total_passages"]
+
+
+def test_fit_document_without_query_keeps_document_head():
+    text = "。".join(f"第{i}句内容" for i in range(200))
+    fitted, report = fit_document(text, 50, passage_tokens=20)
+    assert fitted.startswith("第0句内容")
+    assert report["document_tokens"] <= 50
+
+
+def test_query_terms_use_chinese_bigrams_and_lowercase_words():
+    assert query_terms("什么是SGD") == {"什么", "么是", "sgd"}
+
+
+def test_extraction_chunks_the_compacted_document(app_module, monkeypatch):
+    seen = []
+    monkeypatch.setattr(app_module, "extract_knowledge_from_chunk",
+                        lambda text, *args, **kwargs: seen.append(text) or [["A", "包含", "B"]])
+    pages = "\f".join(f"讲义\n第{i}节 内容\n{i}" for i in range(1, 4))
+    assert app_module.extract_knowledge_from_text(pages) == [["A", "包含", "B"]]
+    assert seen == ["第1节 内容\n第2节 内容\n第3节 内容"]
@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+from compact_graph import CompactGraph
+
+
+@pytest.fixture
+def db_app(app_module, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "kg.db")
+    monkeypatch.setattr(app_module, "DATABASE", db_path)
+    app_module.init_db()
+    app_module.db_path = db_path
+    return app_module
+
+
+def query(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def test_regenerated_graph_replaces_stale_nodes_and_edges(db_app):
+    db_app.save_to_database("t1", CompactGraph.from_triples([["A", "包含", "B"], ["B", "包含", "C"]]), "doc", 5, "u1")
+    db_app.save_to_database("t2", CompactGraph.from_triples([["X", "包含", "Y"]]), "doc2", 0, "u1")
+    db_app.save_to_database("t1", CompactGraph.from_triples([["A", "包含", "D"]]), "doc", 8)
+
+    assert query(db_app.db_path, "SELECT id FROM nodes WHERE topology_id = 't1' ORDER BY id") == [("A",), ("D",)]
+    assert query(db_app.db_path, "SELECT from_node, to_node FROM edges WHERE topology_id = 't1'") == [("A", "D")]
+    assert len(query(db_app.db_path, "SELECT id FROM nodes WHERE topology_id = 't2'")) == 2
+    # 重新生成时未传入用户ID：保留原所属用户，更新节点数量限制
+    assert query(db_app.db_path, "SELECT max_nodes, user_id FROM topologies WHERE id = 't1'") == [(8, "u1")]
+
+
+def test_failed_save_leaves_previous_graph_intact(db_app):
+    db_app.save_to_database("t1", CompactGraph.from_triples([["A", "包含", "B"]]), "doc", 5, "u1")
+
+    class BrokenGraph(CompactGraph):
+        def edge_rows(self):
+            yield ("A", "C", "包含")
+            raise RuntimeError("中途失败")
+
+    with pytest.raises(RuntimeError):
+        db_app.save_to_database("t1", BrokenGraph.from_triples([["A", "包含", "C"]]), "new doc", 9, "u2")
+
+    assert query(db_app.db_path, "SELECT id FROM nodes WHERE topology_id = 't1' ORDER BY id") == [("A",), ("B",)]
+    assert query(db_app.db_path, "SELECT max_nodes, user_id FROM topologies") == [(5, "u1")]
+    assert query(db_app.db_path, "SELECT preview, refcount FROM document_blobs") == [("doc", 1)]
+
+
+def test_centrality_is_saved_and_served(db_app):
+    graph = CompactGraph.from_triples([["根", "包含", "A"], ["根", "包含", "B"], ["A", "包含", "C"], ["B", "包含", "C"]])
+    db_app.save_to_database("t1", graph, "doc")
+    body = db_app.app.test_client().get("/api/topology/t1").get_json()
+    served = {node["id"]: node["centrality"] for node in body["data"]["nodes"]}
+    assert served == {node["id"]: node["centrality"] for node in graph.to_vis()["nodes"]}
+    assert max(served, key=served.get) == "C"
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from semantic_cache import SemanticAnswerCache, normalize_question
+
+
+def test_reworded_questions_hit_and_different_topics_miss():
+    cache = SemanticAnswerCache(threshold=0.7)
+    cache.set("t1", "什么是梯度下降？", "沿负梯度方向更新参数", "document", [{"title": "r"}], "h1")
+    assert normalize_question("请问，梯度下降是什么呢") == normalize_question("什么是梯度下降？") == "梯度下降"
+    hit = cache.get("t1", "请问，梯度下降是什么呢", "h1")
+    assert hit["answer"] == "沿负梯度方向更新参数" and hit["resources"] == [{"title": "r"}]
+    assert cache.get("t1", "梯度下降法是什么", "h1")["similarity"] >= 0.7
+    assert cache.get("t1", "什么是随机梯度下降", "h1") is None
+    assert cache.get("t2", "什么是梯度下降", "h1") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 2, 0.5)
+
+
+def test_document_change_ttl_and_lru_bounds():
+    cache = SemanticAnswerCache(ttl=60, max_entries=2)
+    cache.set("t1", "什么是栈", "后进先出", "document", content_hash="h1")
+    assert cache.get("t1", "栈是什么", "h2") is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["entries"] == 0
+
+    for question in ("什么是栈", "什么是队列", "什么是链表"):
+        cache.set("t1", question, "回答", "document", content_hash="h2")
+    assert cache.get("t1", "栈是什么", "h2") is None  # 最早的条目被LRU淘汰
+    assert cache.stats()["evictions"] == 1
+
+    cache.ttl = -1
+    assert cache.get("t1", "什么是链表", "h2") is None
+    assert cache.stats()["expired"] == 1
+
+
+@pytest.fixture
+def cached_chat_app(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DATABASE", str(tmp_path / "kg.db"))
+    monkeypatch.setitem(app_module.app.config, "CHAT_CACHE_ENABLED", True)
+    monkeypatch.setattr(app_module, "_answer_cache", None)
+    app_module.init_db()
+    with app_module.app.app_context():
+        db = app_module.get_db()
+        with db:
+            app_module.index_document(db, "t1", "梯度下降是一种优化算法，沿负梯度方向迭代更新参数。")
+    return app_module
+
+
+def test_chat_reuses_answer_for_reworded_question(cached_chat_app, monkeypatch):
+    calls = []
+
+    def fake_stream(messages, max_tokens, call_site, user_id=None):
+        calls.append(call_site)
+        yield "梯度下降是一种优化算法。"
+
+    monkeypatch.setattr(cached_chat_app, "CHAT_SPECULATIVE_WEB", False)
+    monkeypatch.setattr(cached_chat_app, "stream_chat_completion", fake_stream)
+    monkeypatch.setattr(cached_chat_app, "recommend_resources_based_on_question",
+                        lambda question, user_id=None: calls.append("resources") or [{"title": "t"}])
+    client = cached_chat_app.app.test_client()
+    first = client.post("/api/chat", json={"question": "什么是梯度下降", "topology_id": "t1"}).get_json()
+    second = client.post("/api/chat", json={"question": "请问梯度下降是什么？", "topology_id": "t1"}).get_json()
+    assert "cached" not in first and second["cached"] is True
+    assert second["answer"] == first["answer"] and second["resources"] == [{"title": "t"}]
+    assert sorted(calls) == ["doc_answer", "resources"]
+    assert cached_chat_app.get_answer_cache().stats()["hit_rate"] == 0.5
@@ -0,0 +1,114 @@
+import threading
+import time
+import types
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def _run_concurrently(n, target):
+    results, errors = [], []
+    barrier = threading.Barrier(n)
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "结果"
+
+    results, errors = _run_concurrently(5, lambda: flight.do("k", slow))
+    assert not errors
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(value == "结果" for value, _ in results)
+    stats = flight.stats()
+    assert stats["executions"] == 1 and stats["collapsed"] == 4 and stats["in_flight"] == 0
+
+
+def test_errors_propagate_to_all_waiters_and_key_is_released():
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError("上游错误")
+
+    results, errors = _run_concurrently(3, lambda: flight.do("k", failing))
+    assert not results
+    assert len(errors) == 3 and all(isinstance(e, ValueError) for e in errors)
+    assert flight.do("k", lambda: "恢复") == ("恢复", False)
+
+
+def test_waiters_time_out():
+    flight = SingleFlight(timeout=0.05)
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.3)
+        return 1
+
+    leader = threading.Thread(target=lambda: flight.do("k", slow))
+    leader.start()
+    started.wait()
+    with pytest.raises(TimeoutError):
+        flight.do("k", slow)
+    leader.join()
+    assert flight.stats()["timeouts"] == 1
+
+
+def test_chat_completion_collapses_identical_requests(app_module, monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.2)
+        message = types.SimpleNamespace(content='{"correct": true}')
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    monkeypatch.setattr(app_module, "get_openai_client", lambda: client)
+    messages = [{"role": "user", "content": "同一个问题"}]
+    results, errors = _run_concurrently(
+        4, lambda: app_module.chat_completion(messages, 100, "evaluate_answer", parse=app_module.json.loads))
+    assert not errors
+    assert len(calls) == 1
+    assert results == [{"correct": True}] * 4
+    assert len({id(result) for result in results}) == 4
+
+
+def test_chat_completion_does_not_collapse_cache_bypassing_requests(app_module, monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        content = f"问题{len(calls)}"
+        time.sleep(0.2)
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    monkeypatch.setattr(app_module, "get_openai_client", lambda: client)
+    results, errors = _run_concurrently(
+        3, lambda: app_module.generate_question("梯度下降", "沿负梯度方向更新参数", bypass_cache=True))
+    assert not errors
+    assert len(calls) == 3
+    assert len(set(results)) == 3
@@ -0,0 +1,41 @@
+from snippet_engine import AhoCorasick, SnippetEngine
+
+
+def legacy_snippet(content, topic):
+    index = content.lower().find(topic.lower())
+    if index == -1:
+        return ""
+    start = max(0, index - 200)
+    end = min(len(content), index + len(topic) + 200)
+    snippet = content[start:end]
+    if start > 0:
+        snippet = "..." + snippet
+    if end < len(content):
+        snippet = snippet + "..."
+    return snippet
+
+
+def test_automaton_finds_overlapping_patterns():
+    matches = sorted(AhoCorasick(["he", "she", "his", "hers"]).finditer("ushers"))
+    assert matches == [(1, 1), (2, 0), (2, 3)]
+
+
+def test_single_occurrence_matches_legacy_format():
+    content = "前言" * 150 + "Gradient Descent 是一种优化算法。" + "后记" * 150
+    snippets = SnippetEngine(content).snippets(["gradient descent", "优化算法"])
+    assert snippets["gradient descent"] == legacy_snippet(content, "gradient descent")
+    assert snippets["优化算法"] == legacy_snippet(content, "优化算法")
+
+
+def test_prefers_occurrence_surrounded_by_other_labels():
+    content = "反向传播。" + "无关内容。" * 100 + "神经网络通过反向传播和梯度下降训练。"
+    snippets = SnippetEngine(content, window=30).snippets(["反向传播", "神经网络", "梯度下降"])
+    assert "神经网络通过反向传播" in snippets["反向传播"]
+    assert not snippets["反向传播"].startswith("反向传播。")
+
+
+def test_fuzzy_fallback_for_paraphrased_labels():
+    content = "无关内容。" * 50 + "卷积神经网络常用于图像识别任务。" + "无关内容。" * 50
+    snippets = SnippetEngine(content, window=10).snippets(["卷积神经网络模型", "量子纠缠"])
+    assert "卷积神经网络" in snippets["卷积神经网络模型"]
+    assert snippets["量子纠缠"] == ""
@@ -0,0 +1,41 @@
+import os
+import json
+
+import pytest
+
+from triple_repair import parse_triples
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "benchmarks", "malformed_outputs.jsonl")
+
+with open(CORPUS_PATH, encoding="utf-8") as f:
+    CORPUS = [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[case["name"] for case in CORPUS])
+def test_recovers_expected_triples_from_malformed_outputs(case):
+    triples, _ = parse_triples(case["output"])
+    assert triples == case["expected"]
+
+
+def test_apostrophes_in_content_are_preserved():
+    triples, stats = parse_triples('[["物理", "包含", "Newton\'s law"]]')
+    assert triples == [["物理", "包含", "Newton's law"]]
+    assert not stats.repaired
+
+
+def test_stats_report_skipped_and_repaired_elements():
+    triples, stats = parse_triples('[["A", "包含", "B"] ["A", "包含"], ["B", "包含", "C"')
+    assert triples == [["A", "包含", "B"], ["B", "包含", "C"]]
+    assert stats.as_dict() == {
+        "elements": 3,
+        "recovered": 2,
+        "skipped": 1,
+        "repairs": {"missing_commas": 1, "unclosed_brackets": 1}
+    }
+
+
+def test_parse_knowledge_edges_skips_bad_elements_and_rejects_empty(app_module):
+    assert app_module.parse_knowledge_edges('[["A", "包含", "B"], ["bad"]]') == [["A", "包含", "B"]]
+    with pytest.raises(ValueError):
+        app_module.parse_knowledge_edges("抱歉，我无法提取知识点。")
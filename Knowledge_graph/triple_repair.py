@@ -0,0 +1,176 @@
+import re
+from collections import Counter
+
+# 字符串的起止引号：标准双引号之外，兼容模型常见的单引号和中文引号
+_QUOTE_PAIRS = {'"': '"', "'": "'", '“': '”'}
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '/': '/', '\\': '\\', '"': '"', "'": "'"}
+_NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?$')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class RepairStats:
+    """一次解析的修复统计：元素总数、恢复/跳过的元素数及各类修复次数"""
+
+    def __init__(self):
+        self.elements = 0
+        self.recovered = 0
+        self.skipped = 0
+        self.repairs = Counter()
+
+    @property
+    def repaired(self) -> bool:
+        return self.skipped > 0 or sum(self.repairs.values()) > 0
+
+    def as_dict(self) -> dict:
+        return {
+            "elements": self.elements,
+            "recovered": self.recovered,
+            "skipped": self.skipped,
+            "repairs": dict(self.repairs)
+        }
+
+
+class _Frame:
+    __slots__ = ("kind", "values", "nested", "need_sep", "last_comma", "truncated")
+
+    def __init__(self, kind):
+        self.kind = kind            # '[' 或 '{'
+        self.values = []
+        self.nested = False
+        self.need_sep = False       # 上一个值之后尚未出现逗号
+        self.last_comma = False
+        self.truncated = False
+
+
+def _read_string(text: str, start: int, close: str, delimiters: str, stats: RepairStats):
+    """
+    读取引号字符串，返回 (内容, 结束位置, 是否完整)。
+    只有后面紧跟分隔符（或文本结束）的引号才视为结束引号，否则按未转义的内容引号处理。
+    """
+    n = len(text)
+    parts = []
+    j = start
+    while j < n:
+        char = text[j]
+        if char == '\\' and j + 1 < n:
+            escaped = text[j + 1]
+            if escaped == 'u' and j + 6 <= n:
+                try:
+                    parts.append(chr(int(text[j + 2:j + 6], 16)))
+                    j += 6
+                    continue
+                except ValueError:
+                    pass
+            parts.append(_ESCAPES.get(escaped, escaped))
+            j += 2
+            continue
+        if char == close:
+            k = j + 1
+            while k < n and text[k] in ' \t\r\n':
+                k += 1
+            if k >= n or text[k] in delimiters:
+                return ''.join(parts), j + 1, True
+            stats.repairs["unescaped_quotes"] += 1
+        parts.append(char)
+        j += 1
+    return ''.join(parts), n, False
+
+
+def parse_triples(text: str):
+    """
+    单遍容错解析模型输出中的 [父知识点, 关系, 子知识点] 数组，返回 (三元组列表, RepairStats)。
+    线性时间扫描，可处理：前后多余文字、单引号/中文引号、未加引号的值、内容中未转义的引号、
+    缺失或多余的逗号、对象形式的元素以及输出被截断。无法恢复的元素被跳过并计入统计，不影响其他元素。
+    """
+    stats = RepairStats()
+    triples = []
+    stack = []
+
+    def append_value(frame, value):
+        if frame.need_sep:
+            stats.repairs["missing_commas"] += 1
+        frame.values.append(value)
+        frame.need_sep = True
+        frame.last_comma = False
+
+    def finish(frame):
+        if frame.truncated:
+            stats.elements += 1
+            stats.skipped += 1
+            stats.repairs["truncated"] += 1
+            return
+        if not frame.values:
+            return  # 外层容器或空数组
+        stats.elements += 1
+        if frame.nested or len(frame.values) != 3:
+            stats.skipped += 1
+            return
+        triples.append([_WHITESPACE_PATTERN.sub(' ', value).strip() for value in frame.values])
+        stats.recovered += 1
+
+    i, n = 0, len(text)
+    while i < n:
+        char = text[i]
+        if not stack:
+            # 第一个括号之前（及最外层闭合之后）的说明文字全部忽略
+            if char in '[{':
+                stack.append(_Frame(char))
+            i += 1
+            continue
+
+        frame = stack[-1]
+        if char in ' \t\r\n':
+            i += 1
+        elif char in '[{':
+            if frame.need_sep:
+                stats.repairs["missing_commas"] += 1
+            frame.nested = True
+            stack.append(_Frame(char))
+            i += 1
+        elif char in ']}':
+            if frame.last_comma:
+                stats.repairs["trailing_commas"] += 1
+            if (char == ']') != (frame.kind == '['):
+                stats.repairs["mismatched_brackets"] += 1
+            stack.pop()
+            finish(frame)
+            if stack:
+                stack[-1].need_sep = True
+                stack[-1].last_comma = False
+            i += 1
+        elif char == ',':
+            frame.need_sep = False
+            frame.last_comma = True
+            i += 1
+        elif char == ':' and frame.kind == '{':
+            # 对象元素只保留值，丢弃前面的键
+            if frame.values:
+                frame.values.pop()
+            frame.need_sep = False
+            frame.last_comma = False
+            i += 1
+        else:
+            delimiters = ',]}:' if frame.kind == '{' else ',]}'
+            if char in _QUOTE_PAIRS:
+                if char != '"':
+                    stats.repairs["non_standard_quotes"] += 1
+                value, i, complete = _read_string(text, i + 1, _QUOTE_PAIRS[char], delimiters, stats)
+                if not complete:
+                    frame.truncated = True
+                    break
+            else:
+                j = i
+                while j < n and text[j] not in delimiters and text[j] not in '[{\n':
+                    j += 1
+                value = text[i:j].strip()
+                if not _NUMBER_PATTERN.match(value):
+                    stats.repairs["unquoted_values"] += 1
+                i = j
+            append_value(frame, value)
+
+    if stack:
+        stats.repairs["unclosed_brackets"] += 1
+        while stack:
+            finish(stack.pop())
+
+    return triples, stats
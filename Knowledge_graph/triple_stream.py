@@ -0,0 +1,73 @@
+import json
+import logging
+
+from triple_repair import parse_triples
+
+logger = logging.getLogger("KnowledgeGraphGenerator")
+
+
+class IncrementalTripleParser:
+    """
+    增量JSON数组解析器：逐段输入模型的流式输出，
+    每当一个 [父知识点, 关系, 子知识点] 元素完整到达时立即返回该三元组。
+    解析失败的元素会被跳过并计数，不影响后续元素。
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.element = []
+        self.collecting = False
+        self.emitted = 0
+        self.skipped = 0
+
+    def feed(self, text: str) -> list:
+        """输入一段文本，返回其中新完成的三元组列表"""
+        triples = []
+        for char in text:
+            if self.collecting:
+                self.element.append(char)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"' and self.depth >= 1:
+                self.in_string = True
+            elif char == '[':
+                self.depth += 1
+                if self.depth == 2:
+                    self.collecting = True
+                    self.element = ['[']
+            elif char == ']':
+                if self.depth == 2 and self.collecting:
+                    triple = self._parse_element(''.join(self.element))
+                    if triple is not None:
+                        triples.append(triple)
+                    self.collecting = False
+                    self.element = []
+                self.depth = max(0, self.depth - 1)
+        return triples
+
+    def _parse_element(self, element_text: str):
+        """解析单个数组元素，必须是由三个标量组成的数组"""
+        try:
+            item = json.loads(element_text)
+        except json.JSONDecodeError:
+            # 标准JSON解析失败时用容错解析器恢复（单引号、缺少引号等）
+            triples, _ = parse_triples(element_text)
+            if len(triples) != 1:
+                self.skipped += 1
+                logger.debug(f"跳过无法解析的三元组: {element_text[:100]}")
+                return None
+            item = triples[0]
+        if not (isinstance(item, list) and len(item) == 3 and
+                all(isinstance(v, (str, int, float)) for v in item)):
+            self.skipped += 1
+            return None
+        self.emitted += 1
+        return [str(v).strip() for v in item]